@@ -1,7 +1,13 @@
 from flask import Blueprint
 from .endpoints.auth import auth_bp
+from .endpoints.appointments import appointments_bp
+from .endpoints.admin import admin_bp
+from .endpoints.users import users_bp
 
 api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
 
 # Register auth endpoints
-api_v1.register_blueprint(auth_bp, url_prefix='/auth') 
\ No newline at end of file
+api_v1.register_blueprint(auth_bp, url_prefix='/auth')
+api_v1.register_blueprint(appointments_bp, url_prefix='/appointments')
+api_v1.register_blueprint(admin_bp, url_prefix='/admin')
+api_v1.register_blueprint(users_bp, url_prefix='/users') 
\ No newline at end of file
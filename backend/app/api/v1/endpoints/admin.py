@@ -0,0 +1,158 @@
+from functools import wraps
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.core import config
+from app.core.cache import response_cache
+from app.core.recurrence import get_zone
+from app.db.session import get_session
+from app.db.models import Organization, User
+from app.crud.organization import assign_organization, create_organization
+from app.crud.export import users_export_query
+from app.crud.user import create_users_bulk, list_users, normalize_email
+from .appointments import delivery_stats_response, export_response, page_args
+from .auth import is_valid_email, unknown_emails
+
+admin_bp = Blueprint('admin', __name__)
+
+
+def admin_required(view):
+    """Allow the view only for authenticated administrators."""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        user = get_session().get(User, int(get_jwt_identity()))
+        if user is None or not user.is_admin:
+            return jsonify({'error': 'Administrator access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@admin_bp.route('/users/bulk', methods=['POST'])
+@admin_required
+def bulk_create_users():
+    """Provision many user accounts in one request."""
+    data = request.get_json()
+    users = data.get('users') if isinstance(data, dict) else None
+    if not isinstance(users, list) or not users:
+        return jsonify({'error': 'Missing required field: users'}), 400
+    if len(users) > config.BULK_USERS_MAX:
+        return jsonify({'error': f'At most {config.BULK_USERS_MAX} users per request'}), 413
+
+    # Validate every row up front; only valid rows reach the database
+    results, valid = [], []
+    for entry in users:
+        entry = entry if isinstance(entry, dict) else {}
+        missing = [field for field in ('email', 'password', 'name') if not entry.get(field)]
+        if missing:
+            results.append({'email': entry.get('email'), 'status': 'invalid',
+                            'error': f'Missing required field: {missing[0]}'})
+        elif not is_valid_email(entry['email']):
+            results.append({'email': entry['email'], 'status': 'invalid', 'error': 'Invalid email format'})
+        else:
+            results.append(None)
+            valid.append(entry)
+
+    created = iter(create_users_bulk(get_session(), valid))
+    results = [result or next(created) for result in results]
+    for result in results:
+        if result['status'] == 'created':
+            unknown_emails.discard(normalize_email(result['email']))
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({'summary': summary, 'results': results}), 200
+
+
+# Accounts returned by one listing request
+DEFAULT_USERS_PAGE_SIZE = 100
+MAX_USERS_PAGE_SIZE = 1000
+
+
+def user_to_dict(user):
+    return {
+        'id': user.id,
+        'email': user.email,
+        'name': user.name,
+        'is_active': user.is_active,
+        'is_admin': user.is_admin,
+        'organization_id': user.organization_id,
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+    }
+
+
+@admin_bp.route('/users', methods=['GET'])
+@admin_required
+def get_users():
+    """List accounts, newest first, a page at a time; ?cursor= takes the previous page's next_cursor."""
+    try:
+        limit, cursor = page_args(DEFAULT_USERS_PAGE_SIZE, MAX_USERS_PAGE_SIZE)
+        page = list_users(get_session(), limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'users': [user_to_dict(u) for u in page.items], 'next_cursor': page.next_cursor}), 200
+
+
+@admin_bp.route('/users/export', methods=['GET'])
+@admin_required
+def export_users():
+    """Download every account as CSV or NDJSON (?format=), streamed from the database."""
+    return export_response(get_session(), users_export_query(), 'users')
+
+
+def organization_to_dict(organization):
+    return {
+        'id': organization.id,
+        'name': organization.name,
+        'reminders_per_minute': organization.reminders_per_minute,
+        'timezone': organization.timezone,
+    }
+
+
+@admin_bp.route('/organizations', methods=['POST'])
+@admin_required
+def add_organization():
+    """Create an organization, optionally with its own reminder quota and time zone."""
+    data = request.get_json()
+    data = data if isinstance(data, dict) else {}
+    if not data.get('name'):
+        return jsonify({'error': 'Missing required field: name'}), 400
+    quota = data.get('reminders_per_minute')
+    if quota is not None and (not isinstance(quota, int) or isinstance(quota, bool) or quota < 0):
+        return jsonify({'error': 'reminders_per_minute must be a non-negative integer'}), 400
+    zone = data.get('timezone') or 'UTC'
+    try:
+        get_zone(str(zone))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    organization = create_organization(get_session(), data['name'], quota, str(zone))
+    return jsonify(organization_to_dict(organization)), 201
+
+
+@admin_bp.route('/organizations/<int:organization_id>/delivery-stats', methods=['GET'])
+@admin_required
+def get_organization_delivery_stats(organization_id):
+    """Reminders sent, failed and retried per day and channel for an organization (?days=, default 30)."""
+    db = get_session()
+    if db.get(Organization, organization_id) is None:
+        return jsonify({'error': 'Organization not found'}), 404
+    return delivery_stats_response(db, organization_id)
+
+
+@admin_bp.route('/users/<int:user_id>/organization', methods=['PUT'])
+@admin_required
+def set_user_organization(user_id):
+    """Move a user into an organization, or out of any with {"organization_id": null}."""
+    data = request.get_json()
+    if not isinstance(data, dict) or 'organization_id' not in data:
+        return jsonify({'error': 'Missing required field: organization_id'}), 400
+    db = get_session()
+    user = db.get(User, user_id)
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
+    organization_id = data['organization_id']
+    if organization_id is not None and db.get(Organization, organization_id) is None:
+        return jsonify({'error': 'Organization not found'}), 404
+    assign_organization(db, user, organization_id)
+    response_cache.invalidate(user.id)
+    return jsonify({'id': user.id, 'organization_id': user.organization_id}), 200
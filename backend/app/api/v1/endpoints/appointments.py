@@ -0,0 +1,353 @@
+import json
+import threading
+import time
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.core import config
+from app.core.cache import cached_response, response_cache
+from app.db.changefeed import change_feed
+from app.db.session import get_session
+from app.db.models import AppointmentSeries, ImportJob
+from app.db.routing import read_from_replica, use_primary
+from app.crud.export import EXPORT_FORMATS, export, reminders_export_query
+from app.crud.imports import iter_csv_rows, iter_ndjson_rows, run_import
+from app.crud.pagination import cursor_of
+from app.crud.reminder import REMINDER_HISTORY_ORDER, list_appointments, reminder_history, utcnow
+from app.crud.stats import delivery_stats
+from app.crud.series import create_series, delete_series, update_series, window_occurrences
+from app.core.serialization import json_array_stream
+from app.schemas.appointment import parse_series
+
+appointments_bp = Blueprint('appointments', __name__)
+
+# Accepted upload formats, by Content-Type
+IMPORT_FORMATS = {
+    'text/csv': ('csv', iter_csv_rows),
+    'application/x-ndjson': ('ndjson', iter_ndjson_rows),
+    'application/ndjson': ('ndjson', iter_ndjson_rows),
+}
+
+
+# Appointments returned by one listing request
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Reminder history pages are streamed, so they can be much larger
+DEFAULT_HISTORY_PAGE_SIZE = 500
+MAX_HISTORY_PAGE_SIZE = 5000
+
+
+# Event streams open in this process, capped at SSE_MAX_STREAMS
+_streams = {'open': 0}
+_streams_lock = threading.Lock()
+
+
+def _open_stream() -> bool:
+    with _streams_lock:
+        if _streams['open'] >= config.SSE_MAX_STREAMS:
+            return False
+        _streams['open'] += 1
+        return True
+
+
+def _close_stream():
+    with _streams_lock:
+        _streams['open'] -= 1
+
+
+def page_args(default_limit: int, max_limit: int):
+    """(limit, cursor) from the query string; ValueError with a message for the client."""
+    try:
+        limit = min(int(request.args.get('limit', default_limit)), max_limit)
+    except ValueError:
+        raise ValueError('limit must be an integer') from None
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return limit, request.args.get('cursor')
+
+
+def delivery_stats_response(db, tenant_id: int):
+    """Delivery stats of tenant_id for the last ?days= days (30 by default), read from the daily rollups."""
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    if not 1 <= days <= config.DELIVERY_STATS_MAX_DAYS:
+        return jsonify({'error': f'days must be between 1 and {config.DELIVERY_STATS_MAX_DAYS}'}), 400
+    return jsonify(delivery_stats(db, tenant_id, days, utcnow().date())), 200
+
+
+def export_response(db, statement, filename: str):
+    """Stream statement's rows in the ?format= requested (csv by default) as a download."""
+    format_name = request.args.get('format', 'csv')
+    if format_name not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    response = Response(stream_with_context(export(db, statement, format_name)),
+                        mimetype=EXPORT_FORMATS[format_name])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{format_name}"'
+    return response
+
+
+def appointment_to_dict(appointment):
+    return {
+        'id': appointment.id,
+        'title': appointment.title,
+        'starts_at': appointment.starts_at.isoformat(),
+        'client_name': appointment.client_name,
+        'client_email': appointment.client_email,
+        'client_phone': appointment.client_phone,
+        'reminders': [
+            {'id': r.id, 'channel': r.channel, 'due_at': r.due_at.isoformat(), 'status': r.status}
+            for r in appointment.reminders
+        ],
+    }
+
+
+def reminder_to_dict(reminder):
+    return {
+        'id': reminder.id,
+        'appointment_id': reminder.appointment_id,
+        'channel': reminder.channel,
+        'recipient': reminder.recipient,
+        'due_at': reminder.due_at.isoformat(),
+        'status': reminder.status,
+        'attempts': reminder.attempts,
+        'sent_at': reminder.sent_at.isoformat() if reminder.sent_at else None,
+    }
+
+
+def series_to_dict(series):
+    now = utcnow()
+    upcoming = window_occurrences(series, now.date(), config.RECURRENCE_WINDOW_DAYS + 1)
+    return {
+        'id': series.id,
+        'title': series.title,
+        'starts_at': series.starts_at_local.isoformat(),
+        'timezone': series.timezone,
+        'rrule': series.rrule,
+        'client_name': series.client_name,
+        'client_email': series.client_email,
+        'client_phone': series.client_phone,
+        'version': series.version,
+        'upcoming': [instant.isoformat() for instant in upcoming if instant >= now],
+    }
+
+
+def import_job_to_dict(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'format': job.format,
+        'rows_total': job.rows_total,
+        'rows_imported': job.rows_imported,
+        'rows_failed': job.rows_failed,
+        'errors': json.loads(job.errors),
+    }
+
+
+@appointments_bp.route('', methods=['GET'])
+@jwt_required()
+@cached_response()
+def get_appointments():
+    """List the user's appointments, newest first, a page at a time (from a replica when one is configured).
+
+    Pass the returned next_cursor as ?cursor= for the following page; it is null on the last.
+    """
+    try:
+        limit, cursor = page_args(DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        page = list_appointments(get_session(), int(get_jwt_identity()), limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'appointments': [appointment_to_dict(a) for a in page.items],
+        'next_cursor': page.next_cursor,
+    }), 200
+
+
+@appointments_bp.route('/reminders', methods=['GET'])
+@jwt_required()
+def get_reminder_history():
+    """Stream the user's reminders, newest first; pass the returned next_cursor as ?cursor= for older ones."""
+    try:
+        limit, cursor = page_args(DEFAULT_HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE)
+        reminders = reminder_history(get_session(), int(get_jwt_identity()), limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    page = {'count': 0, 'last': None}
+
+    def rows():
+        for reminder in reminders:
+            page['count'] += 1
+            if page['count'] > limit:
+                break  # The extra row only says there is another page
+            page['last'] = reminder
+            yield reminder
+
+    def tail():
+        more = page['count'] > limit
+        return {'next_cursor': cursor_of(page['last'], REMINDER_HISTORY_ORDER) if more else None}
+
+    return Response(json_array_stream({}, 'reminders', rows(), reminder_to_dict, tail), mimetype='application/json')
+
+
+@appointments_bp.route('/changes', methods=['GET'])
+@jwt_required()
+def stream_changes():
+    """Server-Sent Events telling the user when their appointments or reminders change.
+
+    Each "changed" event means listings are worth fetching again; changes that arrive
+    together are sent as one. Between events a comment goes out every
+    SSE_HEARTBEAT_SECONDS. The stream ends after SSE_MAX_SECONDS and EventSource
+    reconnects after the advertised retry delay.
+
+    A stream holds its worker thread (or greenlet) throughout, so each process serves
+    at most SSE_MAX_STREAMS at once and answers 503 with Retry-After beyond that.
+    """
+    if not _open_stream():
+        response = jsonify({'error': 'Too many open event streams, try again later'})
+        response.headers['Retry-After'] = str(max(config.SSE_RETRY_MS // 1000, 1))
+        return response, 503
+    try:
+        subscription = change_feed.subscribe(int(get_jwt_identity()))
+    except Exception:
+        # No response will carry the slot's release, so give it back here
+        _close_stream()
+        raise
+
+    def events():
+        yield f'retry: {config.SSE_RETRY_MS}\n\n'
+        ends_at = time.monotonic() + config.SSE_MAX_SECONDS
+        while True:
+            remaining = ends_at - time.monotonic()
+            if remaining <= 0:
+                return
+            if subscription.wait(min(config.SSE_HEARTBEAT_SECONDS, remaining)):
+                yield f'event: changed\ndata: {json.dumps({"at": utcnow().isoformat()})}\n\n'
+            else:
+                yield ': keep-alive\n\n'
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx holding events back
+    # Runs however the stream ends, even if the client goes before it starts
+    response.call_on_close(subscription.close)
+    response.call_on_close(_close_stream)
+    return response
+
+
+@appointments_bp.route('/reminders/export', methods=['GET'])
+@jwt_required()
+def export_reminders():
+    """Download all of the user's reminders as CSV or NDJSON (?format=), streamed from the database."""
+    user_id = int(get_jwt_identity())
+    return export_response(get_session(), reminders_export_query(user_id), f'reminders-{user_id}')
+
+
+@appointments_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_appointments():
+    """Import appointments from a streamed CSV or NDJSON upload."""
+    if request.mimetype not in IMPORT_FORMATS:
+        return jsonify({'error': f"Unsupported Content-Type, use one of: {', '.join(IMPORT_FORMATS)}"}), 415
+    format_name, iter_rows = IMPORT_FORMATS[request.mimetype]
+
+    db = get_session()
+    job = ImportJob(user_id=int(get_jwt_identity()), format=format_name)
+    db.add(job)
+    db.commit()
+
+    # Read the body line by line so the upload is never held in memory as a whole;
+    # progress is committed per chunk and visible through GET /import/<id> meanwhile
+    try:
+        run_import(db, job, iter_rows(request.stream))
+    finally:
+        # Chunks are committed as they go, so even a failed import may have added appointments
+        response_cache.invalidate(job.user_id)
+
+    response = jsonify(import_job_to_dict(job))
+    response.headers['Location'] = f'{request.path}/{job.id}'
+    return response, 201
+
+
+@appointments_bp.route('/import/<job_id>')
+@jwt_required()
+def get_import_job(job_id):
+    """Report the progress of an import job."""
+    db = get_session()
+    job = db.get(ImportJob, job_id)
+    if job is None and read_from_replica(db):
+        # Jobs are polled right after they are created; the replica may not have it yet
+        job = use_primary(db).get(ImportJob, job_id)
+    if job is None or job.user_id != int(get_jwt_identity()):
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(import_job_to_dict(job)), 200
+
+
+def owned_series(db, series_id: int):
+    """The current user's series series_id, or None."""
+    series = db.get(AppointmentSeries, series_id)
+    return series if series is not None and series.user_id == int(get_jwt_identity()) else None
+
+
+@appointments_bp.route('/series', methods=['POST'])
+@jwt_required()
+def add_series():
+    """Create a recurring appointment; its occurrences become appointments as they come within reach."""
+    data = request.get_json()
+    try:
+        values = parse_series(data if isinstance(data, dict) else {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    user_id = int(get_jwt_identity())
+    series = create_series(get_session(), user_id, values)
+    response_cache.invalidate(user_id)
+    response = jsonify(series_to_dict(series))
+    response.headers['Location'] = f'{request.path}/{series.id}'
+    return response, 201
+
+
+@appointments_bp.route('/series/<int:series_id>', methods=['GET'])
+@jwt_required()
+def get_series(series_id):
+    """A recurring appointment with its occurrences in the coming window."""
+    series = owned_series(get_session(), series_id)
+    if series is None:
+        return jsonify({'error': 'Series not found'}), 404
+    return jsonify(series_to_dict(series)), 200
+
+
+@appointments_bp.route('/series/<int:series_id>', methods=['PATCH'])
+@jwt_required()
+def change_series(series_id):
+    """Change a recurring appointment; its future occurrences are replaced, past ones kept."""
+    db = get_session()
+    series = owned_series(db, series_id)
+    if series is None:
+        return jsonify({'error': 'Series not found'}), 404
+    data = request.get_json()
+    current = {
+        'title': series.title, 'starts_at': series.starts_at_local, 'timezone': series.timezone,
+        'rrule': series.rrule, 'client_name': series.client_name, 'client_email': series.client_email,
+        'client_phone': series.client_phone,
+    }
+    try:
+        changes = parse_series(data if isinstance(data, dict) else {}, current)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    update_series(db, series, changes)
+    response_cache.invalidate(series.user_id)
+    return jsonify(series_to_dict(series)), 200
+
+
+@appointments_bp.route('/series/<int:series_id>', methods=['DELETE'])
+@jwt_required()
+def remove_series(series_id):
+    """Stop a recurring appointment; occurrences already reminded of are kept."""
+    db = get_session()
+    series = owned_series(db, series_id)
+    if series is None:
+        return jsonify({'error': 'Series not found'}), 404
+    user_id = series.user_id
+    delete_series(db, series)
+    response_cache.invalidate(user_id)
+    return '', 204
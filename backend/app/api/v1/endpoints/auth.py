@@ -1,9 +1,15 @@
 import re
 from flask import Blueprint, request, jsonify, redirect, url_for, session
-from app.db.session import get_db
-from app.crud.user import get_user_by_email, create_user
-from app.db import create_tables
-from flask_jwt_extended import create_access_token
+from app.db.session import get_session
+from app.db.routing import read_from_replica, use_primary
+from app.crud.user import get_user_by_email, normalize_email, register_user, schedule_password_rehash
+from flask_jwt_extended import create_access_token, get_jwt, jwt_required
+from app.core import config
+from app.core.ratelimit import RateLimiter, NegativeCache
+from app.core.redis_client import get_redis
+from app.core.tokens import revoked_tokens
+from app.core.http import CircuitOpen, http_client
+from app.core.oauth import GoogleOAuth, JWKSCache, OAuthError
 from requests_oauthlib.oauth2_session import OAuth2Session
 import os
 import json
@@ -13,19 +19,20 @@ GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
 GOOGLE_REDIRECT_URI = os.environ.get("GOOGLE_REDIRECT_URI")
 
-# Google OAuth URLs
-GOOGLE_AUTHORIZATION_URL = "https://accounts.google.com/o/oauth2/auth"
-GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
-GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v3/userinfo"
+# Google OAuth URLs (overridable so benchmarks and tests can point at a local stub)
+GOOGLE_AUTHORIZATION_URL = os.environ.get("GOOGLE_AUTHORIZATION_URL", "https://accounts.google.com/o/oauth2/auth")
+GOOGLE_TOKEN_URL = os.environ.get("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+GOOGLE_JWKS_URL = os.environ.get("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
 
 auth_bp = Blueprint('auth', __name__)
 
-# Initialize tables on first import
-try:
-    create_tables()
-except Exception as e:
-    # Log the error but don't fail the import
-    print(f"Warning: Could not create tables: {e}")
+# Login throttling, checked before any database query or password hash
+login_ip_limiter = RateLimiter('login-ip', config.LOGIN_IP_BURST, config.LOGIN_IP_PER_MINUTE / 60, get_redis())
+login_email_limiter = RateLimiter('login-email', config.LOGIN_EMAIL_BURST, config.LOGIN_EMAIL_PER_MINUTE / 60, get_redis())
+unknown_emails = NegativeCache('login-unknown-email', config.UNKNOWN_EMAIL_TTL, get_redis())
+
+# Google's signing keys, fetched once and shared by every callback in this process
+google_jwks = JWKSCache(GOOGLE_JWKS_URL, http_client, config.JWKS_CACHE_SECONDS)
 
 
 def is_valid_email(email):
@@ -34,6 +41,14 @@ def is_valid_email(email):
     return re.match(pattern, email) is not None
 
 
+def too_many_attempts(retry_after):
+    """Build the 429 response for a throttled login."""
+    response = jsonify({'error': 'Too many login attempts, please retry later.'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user."""
@@ -49,32 +64,27 @@ def register():
     if not is_valid_email(data['email']):
         return jsonify({'error': 'Invalid email format'}), 400
     
-    # Create database session using get_db
-    db = next(get_db())
-    try:
-        # Check if user already exists
-        existing_user = get_user_by_email(db, data['email'])
-        if existing_user:
-            return jsonify({'error': 'Email already registered'}), 400
-        
-        # Create new user
-        user = create_user(
-            db=db,
-            email=data['email'],
-            name=data['name'],
-            password=data['password']
-        )
-        
-        response_data = {
-            'id': user.id,
-            'email': user.email,
-            'name': user.name
-        }
-        
-        return jsonify(response_data), 201
-        
-    finally:
-        db.close()
+    # Request-scoped session, closed when the request ends
+    db = get_session()
+
+    # Create the user in one INSERT; the unique index on lower(email) reports an existing account
+    user = register_user(
+        db=db,
+        email=data['email'],
+        name=data['name'],
+        password=data['password']
+    )
+    if user is None:
+        return jsonify({'error': 'Email already registered'}), 400
+    unknown_emails.discard(normalize_email(user.email))
+    
+    response_data = {
+        'id': user.id,
+        'email': user.email,
+        'name': user.name
+    }
+    
+    return jsonify(response_data), 201
 
 
 @auth_bp.route('/login', methods=['POST'])
@@ -88,18 +98,45 @@ def login():
         if field not in data or not data[field]:
             return jsonify({'error': f'Missing required field: {field}'}), 400
 
-    db = next(get_db())
-    try:
-        # Check if user exists and password is correct
-        user = get_user_by_email(db, data['email'])
-        if user and user.check_password(data['password']):
-            # Create the access token for the user
-            access_token = create_access_token(identity=str(user.id))
-            return jsonify({'message': 'Login successful!', 'access_token': access_token}), 200
-        else:
-            return jsonify({'error': 'Invalid email or password'}), 401
-    finally:
-        db.close()
+    # Throttle per client and per account before touching the database or bcrypt.
+    # Keys use the normalized email, so case variants share one budget.
+    email = normalize_email(data['email'])
+    retry_after = login_ip_limiter.hit(request.remote_addr or 'unknown')
+    if not retry_after:
+        retry_after = login_email_limiter.hit(email)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    if email in unknown_emails:
+        return jsonify({'error': 'Invalid email or password'}), 401
+
+    db = get_session()
+
+    # Check if user exists and password is correct
+    user = get_user_by_email(db, email)
+    if user is None and read_from_replica(db):
+        # A signup moments ago may not have reached the replica; ask the primary before calling it unknown
+        user = get_user_by_email(use_primary(db), email)
+    if user is None:
+        unknown_emails.add(email)
+    password_check = user.check_password(data['password']) if user else None
+    if password_check:
+        if password_check.needs_update:
+            # Upgrade the stored hash to the current cost without delaying the response
+            schedule_password_rehash(user.id, data['password'])
+        # Create the access token for the user
+        access_token = create_access_token(identity=str(user.id))
+        return jsonify({'message': 'Login successful!', 'access_token': access_token}), 200
+    else:
+        return jsonify({'error': 'Invalid email or password'}), 401
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Revoke the access token used for this request."""
+    claims = get_jwt()
+    revoked_tokens.revoke(claims['jti'], claims['exp'])
+    return jsonify({'message': 'Logged out.'}), 200
 
 
 @auth_bp.route('/google-login')
@@ -144,43 +181,56 @@ def google_callback():
     # For now, we proceed without state validation for simplicity, but it's crucial for security.
     print(f"Received state: {state}") # Log received state
 
-    google = OAuth2Session(GOOGLE_CLIENT_ID, redirect_uri=GOOGLE_REDIRECT_URI, state=state)
+    code = request.args.get('code')
+    if not code:
+        return jsonify({'error': 'Missing authorization code.'}), 400
 
-    try:
-        # Fetch the access token
-        token = google.fetch_token(GOOGLE_TOKEN_URL,
-                                 client_secret=GOOGLE_CLIENT_SECRET,
-                                 authorization_response=request.url)
+    # Pooled keep-alive connections, shared keys: one round trip to Google per callback
+    google = GoogleOAuth(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REDIRECT_URI, GOOGLE_TOKEN_URL,
+                         google_jwks, http_client)
 
-        # Fetch user info
-        userinfo = google.get(GOOGLE_USERINFO_URL).json()
+    try:
+        # Exchange the code; the verified ID token carries the profile, so no userinfo call
+        claims = google.sign_in(code)
 
-        user_email = userinfo.get('email')
-        user_name = userinfo.get('name')
+        user_email = claims.get('email')
+        user_name = claims.get('name')
 
         if not user_email:
             return jsonify({'error': 'Could not retrieve email from Google.'}), 500
 
-        db = next(get_db())
-        try:
-            # Check if user exists
-            user = get_user_by_email(db, user_email)
+        db = get_session()
 
-            if user:
-                # Existing user, generate JWT
+        # Check if user exists
+        user = get_user_by_email(db, user_email)
+
+        if user:
+            # Existing user, generate JWT
+            access_token = create_access_token(identity=str(user.id))
+            return jsonify({'message': 'Login successful!', 'access_token': access_token}), 200
+        else:
+            # New user, create in database and generate JWT
+            # For simplicity, generating a random password. In a real app, handle this securely or mark as OAuth user.
+            # You might also want to redirect the user to a profile completion page.
+            new_user = register_user(db=db, email=user_email, name=user_name or user_email, password=os.urandom(16).hex())
+            if new_user is None:
+                # A concurrent callback for the same account created it first
+                user = get_user_by_email(db, user_email)
                 access_token = create_access_token(identity=str(user.id))
                 return jsonify({'message': 'Login successful!', 'access_token': access_token}), 200
-            else:
-                # New user, create in database and generate JWT
-                # For simplicity, generating a random password. In a real app, handle this securely or mark as OAuth user.
-                # You might also want to redirect the user to a profile completion page.
-                new_user = create_user(db=db, email=user_email, name=user_name or user_email, password=os.urandom(16).hex())
-                access_token = create_access_token(identity=str(new_user.id))
-                return jsonify({'message': 'User created and logged in successfully!', 'access_token': access_token}), 201
-
-        finally:
-            db.close()
-
+            unknown_emails.discard(normalize_email(new_user.email))
+            access_token = create_access_token(identity=str(new_user.id))
+            return jsonify({'message': 'User created and logged in successfully!', 'access_token': access_token}), 201
+
+    except CircuitOpen as e:
+        # Google has been failing; answer at once instead of tying up a worker on timeouts
+        response = jsonify({'error': 'Google login is temporarily unavailable.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, int(e.retry_after)))
+        return response
+    except OAuthError as e:
+        print(f"Google login rejected: {e}")
+        return jsonify({'error': 'Failed to process Google login.', 'details': str(e)}), 401
     except Exception as e:
         print(f"Error during Google OAuth callback: {e}")
         return jsonify({'error': 'Failed to process Google login.', 'details': str(e)}), 500 
\ No newline at end of file
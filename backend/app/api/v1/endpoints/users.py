@@ -1,3 +1,42 @@
-# User endpoints (Auth, etc.)
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.core.cache import cached_response
+from app.db.session import get_session
+from app.db.models import User
+from app.db.routing import read_from_replica, use_primary
+from .appointments import delivery_stats_response
 
-# TODO: Implement user authentication and OAuth/Google login 
\ No newline at end of file
+users_bp = Blueprint('users', __name__)
+
+
+@users_bp.route('/me')
+@jwt_required()
+@cached_response()
+def read_current_user():
+    """Return the signed-in user's profile (read from a replica when one is configured)."""
+    db = get_session()
+    user_id = int(get_jwt_identity())
+    user = db.get(User, user_id)
+    if user is None and read_from_replica(db):
+        # Freshly registered accounts may not have replicated yet
+        user = use_primary(db).get(User, user_id)
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify({
+        'id': user.id,
+        'email': user.email,
+        'name': user.name,
+        'is_admin': user.is_admin,
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+    }), 200
+
+
+@users_bp.route('/me/delivery-stats')
+@jwt_required()
+def read_organization_delivery_stats():
+    """Reminders sent, failed and retried per day and channel across the user's organization (?days=)."""
+    db = get_session()
+    organization_id = db.query(User.organization_id).filter(User.id == int(get_jwt_identity())).scalar()
+    if organization_id is None:
+        return jsonify({'error': 'Not a member of any organization'}), 404
+    return delivery_stats_response(db, organization_id)
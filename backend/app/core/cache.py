@@ -0,0 +1,210 @@
+# Per-user response cache for read endpoints, with strong ETags and conditional GET
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from functools import wraps
+import redis
+from flask import Response, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from prometheus_client import Counter
+from app.core import config
+from app.core.redis_client import get_redis
+
+CACHE_REQUESTS = Counter("response_cache_requests_total", "Response cache lookups", ["endpoint", "result"])
+
+CachedResponse = namedtuple("CachedResponse", "etag mimetype body")
+
+
+class ResponseCache:
+    """Rendered responses per user, dropped together when that user's data changes.
+
+    With Redis each user's entries live in one hash, so invalidation is a single DEL
+    that every web process sees. Without it, entries sit in a bounded in-process LRU,
+    and invalidation only reaches this process: other workers serve stale entries
+    until their TTL runs out.
+
+    Every invalidation also moves the user to a new generation. Callers read the
+    generation before rendering and store the entry under it, so a response rendered
+    from data that changed meanwhile is never served.
+    """
+
+    # Outlives any entry, so one stored under an older generation never matches again
+    GENERATION_TTL = 86400
+
+    def __init__(self, name: str, ttl: int, max_entries: int, redis_client=None):
+        self.name = name
+        self.ttl = ttl
+        self._redis = redis_client
+        self._local = OrderedDict()
+        self._generations = {}
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _hash_key(self, user) -> str:
+        return f"respcache:{self.name}:{user}"
+
+    def _generation_key(self, user) -> str:
+        return f"respcache:{self.name}:{user}:generation"
+
+    def generation(self, user) -> str:
+        """user's current generation; read it before rendering an entry for set."""
+        user = str(user)
+        if self._redis is not None:
+            try:
+                generation = self._redis.get(self._generation_key(user))
+                return generation.decode() if generation is not None else ""
+            except redis.RedisError:
+                pass
+        with self._lock:
+            return str(self._generations.get(user, 0))
+
+    def get(self, user, key: str):
+        """The live entry cached for user under key, or None."""
+        # JWT identities are strings while ORM ids are ints; both name the same user
+        user = str(user)
+        if self._redis is not None:
+            try:
+                with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.get(self._generation_key(user))
+                    pipe.hget(self._hash_key(user), key)
+                    generation, raw = pipe.execute()
+                return self._decode(raw, generation.decode() if generation is not None else "") if raw else None
+            except redis.RedisError:
+                pass  # Serve from this process while Redis is unavailable
+        with self._lock:
+            local_key = (user, str(self._generations.get(user, 0)), key)
+            item = self._local.get(local_key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires <= time.monotonic():
+                del self._local[local_key]
+                return None
+            self._local.move_to_end(local_key)
+            return entry
+
+    def set(self, user, key: str, entry: CachedResponse, ttl: int = None, generation: str = None):
+        """Cache entry, rendered in generation (by default the current one), unless user has moved past it."""
+        ttl = ttl or self.ttl
+        user = str(user)
+        if generation is None:
+            generation = self.generation(user)
+        if self._redis is not None:
+            try:
+                # An entry of an older generation may land after the invalidation; get skips it
+                with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(self._hash_key(user), key, self._encode(entry, generation, time.time() + ttl))
+                    pipe.expire(self._hash_key(user), ttl)
+                    pipe.execute()
+                return
+            except redis.RedisError:
+                pass
+        with self._lock:
+            if generation != str(self._generations.get(user, 0)):
+                return
+            local_key = (user, generation, key)
+            self._local.pop(local_key, None)
+            self._local[local_key] = (time.monotonic() + ttl, entry)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def invalidate(self, *users):
+        """Drop everything cached for users, e.g. after writing their data."""
+        if not users:
+            return
+        users = [str(user) for user in users]
+        if self._redis is not None:
+            try:
+                with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.delete(*(self._hash_key(user) for user in users))
+                    for user in users:
+                        pipe.set(self._generation_key(user), uuid.uuid4().hex, ex=self.GENERATION_TTL)
+                    pipe.execute()
+            except redis.RedisError:
+                pass
+        with self._lock:
+            # Bumping the generation orphans the old entries; the LRU ages them out
+            for user in users:
+                self._generations[user] = self._generations.get(user, 0) + 1
+
+    def clear(self):
+        """Forget all in-process entries."""
+        with self._lock:
+            self._local.clear()
+            self._generations.clear()
+
+    @staticmethod
+    def _encode(entry: CachedResponse, generation: str, expires: float) -> bytes:
+        return f"{expires}\n{generation}\n{entry.etag}\n{entry.mimetype}\n".encode() + entry.body
+
+    @staticmethod
+    def _decode(raw: bytes, generation: str):
+        parts = raw.split(b"\n", 4)
+        if len(parts) != 5:
+            return None  # Written before entries carried their generation
+        expires, entry_generation, etag, mimetype, body = parts
+        # The hash's TTL is refreshed by every write, so entries carry their own expiry
+        if float(expires) <= time.time() or entry_generation.decode() != generation:
+            return None
+        return CachedResponse(etag.decode(), mimetype.decode(), body)
+
+
+response_cache = ResponseCache(
+    "api", ttl=config.RESPONSE_CACHE_SECONDS, max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    redis_client=get_redis(),
+)
+
+
+def _matching_tag(etag: str):
+    """The If-None-Match tag naming a representation of etag, if any.
+
+    Compressed representations are tagged "<etag>-<encoding>" (see app.core.compression),
+    so the client's copy is current when its tag is either form.
+    """
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return etag
+    for tag in if_none_match.as_set(include_weak=True):
+        if tag == etag or tag.startswith(f"{etag}-"):
+            return tag
+    return None
+
+
+def cached_response(ttl: int = None, cache: ResponseCache = None):
+    """Cache a JWT-protected GET view's 200 responses per user and answer If-None-Match with 304.
+
+    Apply below @jwt_required(). A hit costs no queries and no serialization; only
+    responses for the same user and full path (query string included) are shared.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            store = cache or response_cache
+            user = get_jwt_identity()
+            key = request.full_path
+            entry = store.get(user, key)
+            CACHE_REQUESTS.labels(request.endpoint, "miss" if entry is None else "hit").inc()
+            response = None
+            if entry is None:
+                # Read first: an invalidation during rendering must not be undone by this entry
+                generation = store.generation(user)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = CachedResponse(hashlib.sha256(body).hexdigest(), response.mimetype, body)
+                store.set(user, key, entry, ttl, generation)
+            # Not make_conditional: a client's tag may name a compressed representation
+            tag = _matching_tag(entry.etag)
+            if tag is not None:
+                response = Response(status=304)
+            elif response is None:
+                response = Response(entry.body, mimetype=entry.mimetype)
+            response.set_etag(tag or entry.etag)
+            # Clients may keep the body but must revalidate it on every use
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator
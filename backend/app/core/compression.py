@@ -0,0 +1,90 @@
+# Response compression: brotli or gzip, negotiated per request, for text payloads
+import zlib
+from flask import request
+from app.core import config
+from app.core.metrics import span
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip alone is used without it
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html"}
+
+
+def choose_encoding(accept_encoding) -> str:
+    """The best encoding both sides support ("br" or "gzip"), or None."""
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compressor(encoding: str):
+    """(process, flush, finish) callables of a new compression stream."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=config.COMPRESS_BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(config.COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    process, _, finish = _compressor(encoding)
+    return process(data) + finish()
+
+
+def compress_stream(chunks, encoding: str):
+    """Compress a streamed body chunk by chunk, flushing each so the client is not kept waiting."""
+    process, flush, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """after_request hook: compress compressible bodies of COMPRESS_MIN_BYTES and up.
+
+    Streamed bodies are always compressed, as their size is not known up front. A
+    compressed representation gets its own strong ETag, the identity one plus
+    "-<encoding>" (see cached_response).
+    """
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code < 200 or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or request.method == "HEAD"
+    ):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        if response.direct_passthrough or response.content_length is None:
+            return response
+        if response.content_length < config.COMPRESS_MIN_BYTES:
+            return response
+        with span("compress"):
+            response.set_data(compress(response.get_data(), encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def init_app(app) -> None:
+    app.after_request(compress_response)
@@ -1 +1,187 @@
-# Project configuration 
\ No newline at end of file
+# Project configuration
+import os
+
+
+def _int_env(name: str, default: int) -> int:
+    """Read an integer from the environment, falling back to a default."""
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+# Number of gunicorn worker processes sharing this host (gunicorn reads the same variable)
+WEB_CONCURRENCY = max(1, _int_env("WEB_CONCURRENCY", 1))
+# Request threads per gunicorn worker
+WEB_THREADS = max(1, _int_env("WEB_THREADS", 4))
+# gunicorn worker class ("gthread" or "gevent") and gevent's connections per worker
+WEB_WORKER_CLASS = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+GEVENT_CONNECTIONS = _int_env("GEVENT_CONNECTIONS", 1000)
+
+# Password hashing pool. Each gunicorn worker owns its own pool, so split the cores between them.
+HASH_POOL_WORKERS = _int_env("HASH_POOL_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))
+HASH_POOL_MAX_PENDING = _int_env("HASH_POOL_MAX_PENDING", max(1, HASH_POOL_WORKERS) * 4)
+HASH_POOL_RETRY_AFTER = _int_env("HASH_POOL_RETRY_AFTER", 1)
+
+# bcrypt cost. With HASH_TIME_BUDGET_MS set, the rounds are calibrated at startup so one hash
+# takes at most that long on a single core; otherwise BCRYPT_ROUNDS is used as is.
+BCRYPT_ROUNDS = _int_env("BCRYPT_ROUNDS", 12)
+BCRYPT_MIN_ROUNDS = _int_env("BCRYPT_MIN_ROUNDS", 10)
+BCRYPT_MAX_ROUNDS = _int_env("BCRYPT_MAX_ROUNDS", 16)
+HASH_TIME_BUDGET_MS = _int_env("HASH_TIME_BUDGET_MS", 0)
+# Most logins with an outdated hash waiting to have it upgraded; past this a login skips
+# the upgrade (each waiting job holds a plaintext password) and a later login schedules it
+REHASH_QUEUE_MAX = _int_env("REHASH_QUEUE_MAX", 16)
+
+# Redis (rate limits and caches fall back to in-process state when unset)
+REDIS_URL = os.environ.get("REDIS_URL")
+# Read timeout of the separate client for blocking commands (the delivery queue's BRPOP);
+# it must exceed the longest block, which the shared client's 0.25s would cut short
+REDIS_BLOCKING_SOCKET_TIMEOUT = _int_env("REDIS_BLOCKING_SOCKET_TIMEOUT", 10)
+# Longest pause of a worker loop after Redis errors, backing off from one second
+WORKER_ERROR_BACKOFF_MAX_SECONDS = _int_env("WORKER_ERROR_BACKOFF_MAX_SECONDS", 30)
+
+# Verified JWT claims cached per token (until the token expires), and how often each
+# process refreshes its copy of the revoked-token list from Redis
+JWT_CACHE_SIZE = _int_env("JWT_CACHE_SIZE", 10000)
+REVOCATION_SYNC_SECONDS = _int_env("REVOCATION_SYNC_SECONDS", 1)
+
+# Login throttling: token buckets per email and per client IP, plus a short-lived
+# cache of emails that have no account
+LOGIN_EMAIL_BURST = _int_env("LOGIN_EMAIL_BURST", 5)
+LOGIN_EMAIL_PER_MINUTE = _int_env("LOGIN_EMAIL_PER_MINUTE", 10)
+LOGIN_IP_BURST = _int_env("LOGIN_IP_BURST", 30)
+LOGIN_IP_PER_MINUTE = _int_env("LOGIN_IP_PER_MINUTE", 60)
+UNKNOWN_EMAIL_TTL = _int_env("UNKNOWN_EMAIL_TTL", 30)
+
+# Database connection pool, per worker process. Every request thread can hold one
+# connection, so size the pool to the thread count; the total across workers
+# (WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW)) must fit max_connections.
+DB_POOL_SIZE = _int_env("DB_POOL_SIZE", WEB_THREADS)
+DB_MAX_OVERFLOW = _int_env("DB_MAX_OVERFLOW", 2)
+DB_POOL_TIMEOUT = _int_env("DB_POOL_TIMEOUT", 5)
+DB_POOL_RECYCLE = _int_env("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") not in ("0", "false", "False")
+DB_STATEMENT_TIMEOUT_MS = _int_env("DB_STATEMENT_TIMEOUT_MS", 5000)
+
+# A forked worker should be ready to serve within this many milliseconds
+WORKER_STARTUP_BUDGET_MS = _int_env("WORKER_STARTUP_BUDGET_MS", 500)
+
+# Lead time of the reminder created for each contact channel of a new appointment
+DEFAULT_REMINDER_LEAD_MINUTES = _int_env("DEFAULT_REMINDER_LEAD_MINUTES", 24 * 60)
+
+# Bulk appointment import: rows validated and written per chunk, and how many row
+# errors a job keeps for the client
+IMPORT_CHUNK_SIZE = _int_env("IMPORT_CHUNK_SIZE", 5000)
+IMPORT_MAX_ERRORS = _int_env("IMPORT_MAX_ERRORS", 100)
+
+# Largest number of accounts one bulk provisioning request may create. Their passwords
+# are hashed a few at a time beside logins, so a full request holds its worker for about
+# BULK_USERS_MAX * hash time / HASH_POOL_WORKERS
+BULK_USERS_MAX = _int_env("BULK_USERS_MAX", 1000)
+
+# Reminder scheduler: how many due reminders one pass claims, how long a claim is
+# leased before another scheduler may take it over, and how long an idle loop sleeps
+SCHEDULER_BATCH_SIZE = _int_env("SCHEDULER_BATCH_SIZE", 500)
+SCHEDULER_LEASE_SECONDS = _int_env("SCHEDULER_LEASE_SECONDS", 60)
+SCHEDULER_POLL_INTERVAL_MS = _int_env("SCHEDULER_POLL_INTERVAL_MS", 500)
+# With the change feed, an idle scheduler sleeps until the next reminder falls due or a
+# change wakes it, but never longer than this (a safety net for lost notifications)
+SCHEDULER_MAX_IDLE_SECONDS = _int_env("SCHEDULER_MAX_IDLE_SECONDS", 30)
+# Default reminder sends per minute for each organization (0 = unlimited); organizations
+# may override it. Accounts outside any organization are not throttled.
+TENANT_REMINDERS_PER_MINUTE = _int_env("TENANT_REMINDERS_PER_MINUTE", 0)
+# Hash partitions of the reminders table on Postgres, fixed when migration 0006 runs
+REMINDER_PARTITIONS = _int_env("REMINDER_PARTITIONS", 16)
+
+# Reminder delivery workers
+DELIVERY_BATCH_SIZE = _int_env("DELIVERY_BATCH_SIZE", 200)
+DELIVERY_MAX_ATTEMPTS = _int_env("DELIVERY_MAX_ATTEMPTS", 5)
+DELIVERY_BACKOFF_BASE_SECONDS = _int_env("DELIVERY_BACKOFF_BASE_SECONDS", 30)
+DELIVERY_BACKOFF_MAX_SECONDS = _int_env("DELIVERY_BACKOFF_MAX_SECONDS", 3600)
+# Longest range of days, up to today, that one delivery stats request may cover
+DELIVERY_STATS_MAX_DAYS = _int_env("DELIVERY_STATS_MAX_DAYS", 366)
+# Claimed reminders go through the outbox table, relayed to the queue this many per transaction
+OUTBOX_BATCH_SIZE = _int_env("OUTBOX_BATCH_SIZE", 500)
+# Idempotency keys: a send in progress holds its key for up to a lease (so a duplicate waits
+# for it), a completed one for IDEMPOTENCY_KEY_SECONDS. Without Redis, keys are kept in
+# process, at most IDEMPOTENCY_LOCAL_MAX_KEYS of them.
+IDEMPOTENCY_PENDING_SECONDS = _int_env("IDEMPOTENCY_PENDING_SECONDS", SCHEDULER_LEASE_SECONDS)
+IDEMPOTENCY_KEY_SECONDS = _int_env("IDEMPOTENCY_KEY_SECONDS", 86400)
+IDEMPOTENCY_LOCAL_MAX_KEYS = _int_env("IDEMPOTENCY_LOCAL_MAX_KEYS", 100000)
+
+# Transports; a channel without settings is not delivered. The concurrency settings
+# cap simultaneous sends (and pooled connections) per provider and worker process.
+SMTP_HOST = os.environ.get("SMTP_HOST")
+SMTP_PORT = _int_env("SMTP_PORT", 25)
+SMTP_SENDER = os.environ.get("SMTP_SENDER", "reminders@localhost")
+SMTP_CONCURRENCY = _int_env("SMTP_CONCURRENCY", 4)
+SMS_API_URL = os.environ.get("SMS_API_URL")
+SMS_API_TOKEN = os.environ.get("SMS_API_TOKEN")
+SMS_CONCURRENCY = _int_env("SMS_CONCURRENCY", 8)
+
+# Outbound HTTP (Google OAuth): keep-alive connections per host, connect/read timeouts,
+# and a circuit breaker that fails fast after consecutive failures to one host
+HTTP_POOL_SIZE = _int_env("HTTP_POOL_SIZE", WEB_THREADS)
+HTTP_CONNECT_TIMEOUT_MS = _int_env("HTTP_CONNECT_TIMEOUT_MS", 2000)
+HTTP_READ_TIMEOUT_MS = _int_env("HTTP_READ_TIMEOUT_MS", 5000)
+HTTP_BREAKER_FAILURES = _int_env("HTTP_BREAKER_FAILURES", 5)
+HTTP_BREAKER_RESET_SECONDS = _int_env("HTTP_BREAKER_RESET_SECONDS", 30)
+# How long Google's signing keys are trusted when the JWKS response carries no max-age
+JWKS_CACHE_SECONDS = _int_env("JWKS_CACHE_SECONDS", 3600)
+
+# Request profiling: requests carrying "X-Profile: <PROFILE_TOKEN>" are run under cProfile
+# (and get a Server-Timing breakdown); PROFILE_SAMPLE_RATE profiles that fraction of all
+# requests. Profiles are written to PROFILE_DIR, one at a time per process, and only the
+# newest PROFILE_MAX_FILES are kept.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE") or 0)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/profiles")
+PROFILE_MAX_FILES = _int_env("PROFILE_MAX_FILES", 100)
+
+# Read replicas: comma-separated database URLs. Read-only statements go to a replica whose
+# replication lag (checked at most every REPLICA_LAG_CHECK_SECONDS) is under
+# REPLICA_MAX_LAG_SECONDS; once a session writes, it stays on the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = _int_env("REPLICA_MAX_LAG_SECONDS", 5)
+REPLICA_LAG_CHECK_SECONDS = _int_env("REPLICA_LAG_CHECK_SECONDS", 5)
+
+# Per-user response cache for polled read endpoints; writes invalidate a user's entries,
+# and the TTL bounds staleness from writers that cannot (e.g. other processes without Redis)
+RESPONSE_CACHE_SECONDS = _int_env("RESPONSE_CACHE_SECONDS", 30)
+RESPONSE_CACHE_MAX_ENTRIES = _int_env("RESPONSE_CACHE_MAX_ENTRIES", 10000)
+
+# Rows fetched per round trip by streaming exports (a server-side cursor on Postgres)
+EXPORT_BATCH_SIZE = _int_env("EXPORT_BATCH_SIZE", 1000)
+
+# JSON encoding: "orjson" (used when installed) or "stdlib"
+JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "orjson")
+# Responses are compressed from this size up; smaller ones gain little for the CPU spent
+COMPRESS_MIN_BYTES = _int_env("COMPRESS_MIN_BYTES", 1024)
+COMPRESS_GZIP_LEVEL = _int_env("COMPRESS_GZIP_LEVEL", 6)
+COMPRESS_BROTLI_QUALITY = _int_env("COMPRESS_BROTLI_QUALITY", 4)
+
+# Recurring series: occurrences are materialized as appointments RECURRENCE_WINDOW_DAYS ahead,
+# topped up once less than RECURRENCE_REFILL_DAYS of that is left. The scheduler runs the
+# expansion every RECURRENCE_EXPAND_SECONDS, RECURRENCE_EXPAND_BATCH series per transaction.
+RECURRENCE_WINDOW_DAYS = _int_env("RECURRENCE_WINDOW_DAYS", 14)
+RECURRENCE_REFILL_DAYS = _int_env("RECURRENCE_REFILL_DAYS", 13)
+RECURRENCE_EXPAND_SECONDS = _int_env("RECURRENCE_EXPAND_SECONDS", 300)
+RECURRENCE_EXPAND_BATCH = _int_env("RECURRENCE_EXPAND_BATCH", 500)
+# Expanded windows kept in memory, one entry per series version and day
+OCCURRENCE_CACHE_SIZE = _int_env("OCCURRENCE_CACHE_SIZE", 10000)
+
+# Change feed: "postgres" (LISTEN/NOTIFY), "redis" (pub/sub), "local" (one process) or
+# "auto", which picks Postgres when the database is Postgres, else Redis when configured
+CHANGE_FEED = os.environ.get("CHANGE_FEED", "auto")
+# Server-Sent Events: a comment every SSE_HEARTBEAT_SECONDS keeps proxies from closing an
+# idle stream; streams end after SSE_MAX_SECONDS and clients reconnect after SSE_RETRY_MS
+SSE_HEARTBEAT_SECONDS = _int_env("SSE_HEARTBEAT_SECONDS", 15)
+SSE_MAX_SECONDS = _int_env("SSE_MAX_SECONDS", 300)
+SSE_RETRY_MS = _int_env("SSE_RETRY_MS", 3000)
+# Event streams open at once per web worker process; more are refused with 503. Each one
+# holds a request thread (gthread) or a greenlet (gevent) for up to SSE_MAX_SECONDS, so by
+# default gthread workers keep half their threads for other requests. That only suits a
+# handful of clients: point EventSource at gevent workers instead (the "events" service in
+# docker-compose.yml, which the frontend gets as REACT_APP_EVENTS_URL).
+SSE_MAX_STREAMS = _int_env(
+    "SSE_MAX_STREAMS", GEVENT_CONNECTIONS // 2 if WEB_WORKER_CLASS == "gevent" else max(WEB_THREADS // 2, 1)
+)
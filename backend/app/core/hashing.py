@@ -0,0 +1,164 @@
+# Bounded process pool for CPU-heavy password hashing
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+class HashingPoolFull(Exception):
+    """Raised when the hashing pool has no free queue slot."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """Run hashing calls on a process pool with a bounded number of pending calls.
+
+    A call that finds every slot taken is rejected straight away with
+    HashingPoolFull instead of queueing behind the others. With workers=0 the
+    calls run inline on the calling thread (useful for tests and debugging).
+    """
+
+    def __init__(self, workers: int, max_pending: int, retry_after: int = 1,
+                 initializer=None, initargs=()):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._initializer = initializer
+        self._initargs = initargs
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._calls = 0
+        self._rejected = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _get_executor(self):
+        # Pools do not survive a fork, so every process (e.g. gunicorn worker) builds its own
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                if self._pid != pid:
+                    self._reset_state()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self._initializer,
+                    initargs=self._initargs,
+                )
+                self._pid = pid
+            return self._executor
+
+    def _enter(self) -> float:
+        # The caller holds a slot; count the call as in flight
+        with self._lock:
+            self._calls += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        return time.perf_counter()
+
+    def _exit(self, start: float):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._in_flight -= 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+        self._slots.release()
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for its result."""
+        if self.workers > 0:
+            executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingPoolFull(self.retry_after)
+
+        start = self._enter()
+        try:
+            if self.workers > 0:
+                return executor.submit(fn, *args).result()
+            return fn(*args)
+        finally:
+            self._exit(start)
+
+    def map(self, fn, items: list) -> list:
+        """Run fn over items in parallel across the workers and return the results in order.
+
+        Meant for batch work: each item takes a queue slot like a call to run, waiting
+        for one rather than being rejected, and at most one item per worker (and never
+        more than half the slots) is pending at a time, so interactive calls still find
+        free slots and queue behind only a few of these items.
+        """
+        if self.workers == 0:
+            results = []
+            for item in items:
+                self._slots.acquire()
+                start = self._enter()
+                try:
+                    results.append(fn(item))
+                finally:
+                    self._exit(start)
+            return results
+
+        executor = self._get_executor()
+        window = max(1, min(self.workers, self.max_pending // 2))
+        futures, pending = [], set()
+        for item in items:
+            if len(pending) >= window:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            self._slots.acquire()
+            start = self._enter()
+            try:
+                future = executor.submit(fn, item)
+            except BaseException:
+                self._exit(start)
+                raise
+            future.add_done_callback(lambda _, start=start: self._exit(start))
+            futures.append(future)
+            pending.add(future)
+        return [future.result() for future in futures]
+
+    def warm_up(self, fn, *args):
+        """Start every worker process by running fn(*args) once per worker."""
+        if self.workers == 0:
+            return
+        executor = self._get_executor()
+        for future in [executor.submit(fn, *args) for _ in range(self.workers)]:
+            future.result()
+
+    def stats(self) -> dict:
+        """Snapshot of call counts, queue depth and latency for this process."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "calls": self._calls,
+                "rejected": self._rejected,
+                "queue_depth": self._in_flight,
+                "peak_queue_depth": self._peak_in_flight,
+                "latency_seconds_total": self._latency_total,
+                "latency_seconds_max": self._latency_max,
+            }
+
+    def reconfigure(self, initargs):
+        """Restart the worker processes with new initializer arguments."""
+        self._initargs = initargs
+        self.shutdown()
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker processes; the next call starts a fresh pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
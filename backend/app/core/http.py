@@ -0,0 +1,138 @@
+# Shared outbound HTTP client: pooled keep-alive connections, strict timeouts, circuit breaking
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from app.core import config
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a host whose circuit is open."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"Circuit open for {host}, retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: opens after `failure_threshold` failures, lets one trial call
+    through once `reset_timeout` seconds have passed, and closes again when that call succeeds."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def before_call(self) -> float:
+        """Return 0 if a call may proceed, else the seconds until the next trial call."""
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                return self.reset_timeout - waited
+            if self._trial_running:
+                return self.reset_timeout
+            self._trial_running = True
+            return 0
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                # A failed trial call restarts the wait
+                self.opened_at = time.monotonic()
+
+
+class HTTPClient:
+    """One requests.Session per process with a bounded keep-alive pool and a breaker per host.
+
+    Connection errors, timeouts and 5xx responses count as failures; 4xx responses are the
+    caller's problem and leave the breaker alone.
+    """
+
+    def __init__(self, pool_size: int, connect_timeout: float, read_timeout: float,
+                 failure_threshold: int = 5, reset_timeout: float = 30):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+    def _get_session(self) -> requests.Session:
+        # Pooled sockets must not be shared across a fork
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session, self._pid = session, os.getpid()
+            return self._session
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        breaker = self.breaker(url)
+        retry_after = breaker.before_call()
+        if retry_after:
+            raise CircuitOpen(urlsplit(url).netloc, retry_after)
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            response = self._get_session().request(method, url, **kwargs)
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+http_client = HTTPClient(
+    config.HTTP_POOL_SIZE,
+    config.HTTP_CONNECT_TIMEOUT_MS / 1000,
+    config.HTTP_READ_TIMEOUT_MS / 1000,
+    config.HTTP_BREAKER_FAILURES,
+    config.HTTP_BREAKER_RESET_SECONDS,
+)
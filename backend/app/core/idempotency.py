@@ -0,0 +1,100 @@
+# Idempotency keys for side effects that must happen at most once, such as sending an SMS
+import threading
+import time
+import redis
+from app.core import config
+from app.core.lru import LRUCache
+
+PENDING = "pending"
+DONE = "done"
+
+
+class IdempotencyStore:
+    """Claims on idempotency keys, so a retried or duplicated message is acted on once.
+
+    begin() claims keys with SET NX EX: a key it returns as None is now this caller's to
+    act on, PENDING means someone else is acting on it, DONE that it has been done.
+    finish() records success for IDEMPOTENCY_KEY_SECONDS; abandon() releases the key
+    for a retry. A caller that dies mid-way loses its claim after the pending TTL.
+
+    Calls for a batch of keys share one pipeline round trip. Without Redis (or while
+    it is unreachable) keys are kept in a bounded in-process LRU, which only dedups
+    within this process.
+    """
+
+    def __init__(self, name: str, redis_client=None, pending_seconds: int = None, done_seconds: int = None,
+                 max_local_keys: int = None):
+        self.name = name
+        self._redis = redis_client
+        self.pending_seconds = pending_seconds or config.IDEMPOTENCY_PENDING_SECONDS
+        self.done_seconds = done_seconds or config.IDEMPOTENCY_KEY_SECONDS
+        self._local = LRUCache(max_local_keys or config.IDEMPOTENCY_LOCAL_MAX_KEYS)
+        self._lock = threading.Lock()
+
+    def _key(self, key: str) -> str:
+        return f"idem:{self.name}:{key}"
+
+    def begin(self, keys) -> list:
+        """Claim keys; for each, None if claimed now, else its current state (PENDING or DONE)."""
+        keys = list(keys)
+        if not keys:
+            return []
+        if self._redis is not None:
+            try:
+                with self._redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.set(self._key(key), PENDING, nx=True, ex=self.pending_seconds)
+                    claimed = pipe.execute()
+                taken = [key for key, ok in zip(keys, claimed) if not ok]
+                states = {}
+                if taken:
+                    with self._redis.pipeline(transaction=False) as pipe:
+                        for key in taken:
+                            pipe.get(self._key(key))
+                        # A key that expired in between reads as None; it is left for the next retry
+                        states = {key: (state.decode() if state else PENDING)
+                                  for key, state in zip(taken, pipe.execute())}
+                return [None if ok else states[key] for key, ok in zip(keys, claimed)]
+            except redis.RedisError:
+                pass  # Dedup within this process while Redis is unavailable
+        now = time.time()
+        with self._lock:
+            states = []
+            for key in keys:
+                state = self._local.get(key)
+                if state is None:
+                    self._local.set(key, PENDING, now + self.pending_seconds)
+                states.append(state)
+            return states
+
+    def finish(self, keys) -> None:
+        """Record keys as done."""
+        keys = list(keys)
+        if not keys:
+            return
+        if self._redis is not None:
+            try:
+                with self._redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.set(self._key(key), DONE, ex=self.done_seconds)
+                    pipe.execute()
+                return
+            except redis.RedisError:
+                pass
+        expires_at = time.time() + self.done_seconds
+        for key in keys:
+            self._local.set(key, DONE, expires_at)
+
+    def abandon(self, keys) -> None:
+        """Release keys whose action failed, so a retry may claim them."""
+        keys = list(keys)
+        if not keys:
+            return
+        if self._redis is not None:
+            try:
+                self._redis.delete(*(self._key(key) for key in keys))
+                return
+            except redis.RedisError:
+                pass
+        for key in keys:
+            self._local.delete(key)
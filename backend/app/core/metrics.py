@@ -0,0 +1,157 @@
+# Prometheus metrics: per-route latency histograms and spans around the hot paths of a request
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ["method", "route", "status"],
+)
+# Spans are mostly sub-millisecond (queries, checkouts), apart from bcrypt
+SPAN_LATENCY = Histogram(
+    "app_span_duration_seconds", "Time spent in instrumented sections of a request",
+    ["span"],
+    buckets=(.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, float("inf")),
+)
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Observe a span, and add it to the current request's breakdown (see Server-Timing)."""
+    SPAN_LATENCY.labels(name).observe(seconds)
+    if has_request_context():
+        spans = g.setdefault("spans", {})
+        count, total = spans.get(name, (0, 0.0))
+        spans[name] = (count + 1, total + seconds)
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with serialization reported as the json_dumps span."""
+
+    def dumps(self, obj, **kwargs):
+        with span("json_dumps"):
+            return super().dumps(obj, **kwargs)
+
+
+class PoolStatsCollector:
+    """Exports the hashing pool, DB pool and replica lag figures of this process at scrape time."""
+
+    def collect(self):
+        from app.core.security import hashing_pool
+        from app.db.pool import pool_metrics
+
+        hashing = hashing_pool.stats()
+        yield GaugeMetricFamily("hashing_pool_queue_depth", "Password hashes queued or running", value=hashing["queue_depth"])
+        yield CounterMetricFamily("hashing_pool_calls", "Password hashes run", value=hashing["calls"])
+        yield CounterMetricFamily("hashing_pool_rejected", "Password hashes shed with 503", value=hashing["rejected"])
+        db = pool_metrics.stats()
+        yield CounterMetricFamily("db_pool_checkouts", "Connections checked out", value=db["checkouts"])
+        yield CounterMetricFamily("db_pool_waits", "Checkouts that waited for a free connection", value=db["waits"])
+        yield CounterMetricFamily("db_pool_overflows", "Checkouts that opened an overflow connection", value=db["overflows"])
+        yield CounterMetricFamily("db_pool_timeouts", "Checkouts that timed out", value=db["timeouts"])
+        from app.db.session import replicas
+        if replicas is not None:
+            lag = GaugeMetricFamily("db_replica_lag_seconds", "Last measured replication lag", labels=["replica"])
+            for replica, seconds in replicas.stats().items():
+                if seconds is not None:
+                    lag.add_metric([replica], seconds)
+            yield lag
+
+
+_pool_stats = PoolStatsCollector()
+_instrumented = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_metrics_start", None)
+    if start is not None:
+        record_span("db_query", time.perf_counter() - start)
+
+
+def instrument() -> None:
+    """Hook query execution and pool checkout (process-wide, once)."""
+    global _instrumented
+    if _instrumented:
+        return
+    from app.db.pool import pool_metrics
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    pool_metrics.add_listener(lambda seconds, waited, overflowed: record_span("db_checkout", seconds))
+    REGISTRY.register(_pool_stats)
+    _instrumented = True
+
+
+def _start_timer():
+    g.spans = {}
+    g.request_started = time.perf_counter()
+
+
+def _observe(status: int) -> None:
+    started = g.pop("request_started", None)
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUEST_LATENCY.labels(request.method, route, str(status)).observe(time.perf_counter() - started)
+
+
+def _after_request(response):
+    _observe(response.status_code)
+    return response
+
+
+def _teardown_request(exc=None):
+    # after_request is skipped when a view raises; still count the request as a 500
+    if exc is not None:
+        _observe(500)
+
+
+def metrics_view():
+    """Prometheus text format. With PROMETHEUS_MULTIPROC_DIR set, histograms cover every worker."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_pool_stats)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app) -> None:
+    instrument()
+    app.before_request(_start_timer)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
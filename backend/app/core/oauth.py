@@ -0,0 +1,102 @@
+# Google sign-in: one authorization-code exchange, then the ID token is verified locally
+import re
+import threading
+import time
+from jose import jwt, JWTError
+from app.core.http import HTTPClient
+
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class OAuthError(Exception):
+    """The provider rejected the code, or its ID token did not verify."""
+
+
+class JWKSCache:
+    """The provider's signing keys by `kid`, refreshed when they expire or an unknown kid shows up.
+
+    Expiry follows the response's Cache-Control max-age, else `ttl`. Unknown kids trigger
+    at most one refetch per `min_refresh_interval` seconds, so forged tokens cannot flood the provider.
+    """
+
+    def __init__(self, url: str, client: HTTPClient, ttl: float, min_refresh_interval: float = 60):
+        self.url = url
+        self.client = client
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._expires_at = 0.0
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid: str) -> dict:
+        now = time.monotonic()
+        if now >= self._expires_at or (kid not in self._keys and self._may_refetch(now)):
+            with self._lock:
+                # Another thread may have refreshed while this one waited
+                if time.monotonic() >= self._expires_at or (kid not in self._keys and self._may_refetch(now)):
+                    self._refresh()
+        if kid not in self._keys:
+            raise OAuthError(f"Unknown signing key {kid!r}")
+        return self._keys[kid]
+
+    def _may_refetch(self, now: float) -> bool:
+        return self._fetched_at is None or now - self._fetched_at >= self.min_refresh_interval
+
+    def _refresh(self) -> None:
+        response = self.client.get(self.url)
+        if response.status_code != 200:
+            raise OAuthError(f"Fetching signing keys failed with {response.status_code}")
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        ttl = int(match.group(1)) if match else self.ttl
+        self._keys = {key["kid"]: key for key in response.json().get("keys", [])}
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + ttl
+
+
+class GoogleOAuth:
+    """Exchange an authorization code and return the verified ID token claims."""
+
+    def __init__(self, client_id: str, client_secret: str, redirect_uri: str, token_url: str,
+                 jwks: JWKSCache, client: HTTPClient, issuers=GOOGLE_ISSUERS):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.token_url = token_url
+        self.jwks = jwks
+        self.client = client
+        self.issuers = issuers
+
+    def exchange_code(self, code: str) -> dict:
+        response = self.client.post(self.token_url, data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "redirect_uri": self.redirect_uri,
+        }, headers={"Accept": "application/json"})
+        if response.status_code != 200:
+            raise OAuthError(f"Token exchange failed with {response.status_code}: {response.text[:200]}")
+        token = response.json()
+        if "id_token" not in token:
+            raise OAuthError("Token response has no id_token; is the openid scope requested?")
+        return token
+
+    def verify_id_token(self, id_token: str, access_token: str = None) -> dict:
+        try:
+            header = jwt.get_unverified_header(id_token)
+            key = self.jwks.get_key(header.get("kid"))
+            claims = jwt.decode(id_token, key, algorithms=[key.get("alg", "RS256")],
+                                audience=self.client_id, issuer=self.issuers, access_token=access_token)
+        except JWTError as e:
+            raise OAuthError(f"Invalid ID token: {e}")
+        if claims.get("email") and claims.get("email_verified") is False:
+            raise OAuthError("Google account email is not verified")
+        return claims
+
+    def sign_in(self, code: str) -> dict:
+        """One round trip to the token endpoint; the claims replace the userinfo call."""
+        token = self.exchange_code(code)
+        return self.verify_id_token(token["id_token"], token.get("access_token"))
@@ -0,0 +1,87 @@
+# Opt-in cProfile runs of single requests, for finding where a slow route spends its time
+import cProfile
+import os
+import random
+import threading
+import time
+from flask import g, request
+from app.core import config
+
+
+class RequestProfiler:
+    """Profile a request when it carries "X-Profile: <token>", or at random with `sample_rate`.
+
+    Profiles are dumped to `output_dir` as pstats files, of which the newest `max_files`
+    are kept. Only one request per process is profiled at a time; others run normally.
+    Requests profiled by token also get a Server-Timing header with the spans recorded
+    while they ran, and are logged.
+    """
+
+    def __init__(self, token: str = None, sample_rate: float = 0.0, output_dir: str = "/tmp/profiles",
+                 max_files: int = 100):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self._busy = threading.Lock()
+
+    def _requested(self) -> bool:
+        return bool(self.token) and request.headers.get("X-Profile") == self.token
+
+    def _start(self):
+        requested = self._requested()
+        if not requested and not (self.sample_rate and random.random() < self.sample_rate):
+            return
+        if not self._busy.acquire(blocking=False):
+            return
+        g.profile_requested = requested
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    def _stop(self, response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            endpoint = (request.endpoint or "unmatched").replace(".", "-")
+            path = os.path.join(self.output_dir, f"{endpoint}-{time.time_ns()}.prof")
+            profiler.dump_stats(path)
+            self._prune()
+        finally:
+            self._busy.release()
+        if g.pop("profile_requested", False):
+            print(f"Profiled {request.method} {request.path} in {path}")
+            spans = g.get("spans", {})
+            response.headers["Server-Timing"] = ", ".join(
+                f"{name};dur={total * 1000:.2f};desc=\"{count}x\"" for name, (count, total) in spans.items()
+            )
+            response.headers["X-Profile-File"] = os.path.basename(path)
+        return response
+
+    def _prune(self):
+        # Sampling runs for as long as the process does, so keep the directory bounded
+        profiles = sorted((entry for entry in os.scandir(self.output_dir) if entry.name.endswith(".prof")),
+                          key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in profiles[:max(len(profiles) - self.max_files, 0)]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # Pruned by another worker
+
+    def _teardown(self, exc=None):
+        # A view that raised skips after_request; do not leave the profiler running
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            self._busy.release()
+
+    def init_app(self, app) -> None:
+        app.before_request(self._start)
+        app.after_request(self._stop)
+        app.teardown_request(self._teardown)
+
+
+request_profiler = RequestProfiler(config.PROFILE_TOKEN, config.PROFILE_SAMPLE_RATE, config.PROFILE_DIR,
+                                   config.PROFILE_MAX_FILES)
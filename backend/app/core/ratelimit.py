@@ -0,0 +1,213 @@
+# Token-bucket rate limiting and short-lived negative caching
+import threading
+import time
+from collections import OrderedDict
+import redis
+
+# Atomically refill and take one token; returns the seconds to wait (0 when allowed).
+# The clock comes from Redis so every app server agrees on it.
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+# Atomically refill and take up to ARGV[3] whole tokens; returns how many were granted.
+_TOKEN_BUCKET_TAKE_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(wanted, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return granted
+"""
+
+# Atomically refill and put back ARGV[3] tokens taken but not used, up to capacity.
+_TOKEN_BUCKET_GIVE_BACK_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local returned = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate + returned)
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return 1
+"""
+
+
+class RateLimiter:
+    """Token bucket per key: `capacity` requests in a burst, refilled at `per_second`.
+
+    Buckets live in Redis when a client is given so limits hold across workers and
+    hosts. When Redis is missing or unreachable, a bounded in-process table is used.
+    """
+
+    def __init__(self, name: str, capacity: int, per_second: float, redis_client=None,
+                 max_local_keys: int = 100_000):
+        self.name = name
+        self.capacity = capacity
+        self.per_second = per_second
+        self._redis = redis_client
+        self._script = redis_client.register_script(_TOKEN_BUCKET_LUA) if redis_client is not None else None
+        self._take_script = redis_client.register_script(_TOKEN_BUCKET_TAKE_LUA) if redis_client is not None else None
+        self._give_back_script = (
+            redis_client.register_script(_TOKEN_BUCKET_GIVE_BACK_LUA) if redis_client is not None else None
+        )
+        self._local = OrderedDict()
+        self._max_local_keys = max_local_keys
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> float:
+        """Take a token for key; return 0 when allowed, else the seconds until retry."""
+        if self._script is not None:
+            try:
+                return float(self._script(keys=[f"ratelimit:{self.name}:{key}"],
+                                          args=[self.capacity, self.per_second]))
+            except redis.RedisError:
+                pass  # Degrade to per-process limits while Redis is unavailable
+        return self._hit_local(key)
+
+    def _hit_local(self, key: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._local.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - ts) * self.per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.per_second
+            self._local[key] = (tokens, now)
+            if len(self._local) > self._max_local_keys:
+                self._local.popitem(last=False)
+            return wait
+
+    def take(self, key: str, wanted: int, capacity: int = None, per_second: float = None) -> int:
+        """Take up to `wanted` tokens for key and return how many were granted (possibly 0).
+
+        capacity and per_second override the limiter's own, for keys with their own limits.
+        """
+        capacity = capacity or self.capacity
+        per_second = per_second or self.per_second
+        if self._take_script is not None:
+            try:
+                return int(self._take_script(keys=[f"ratelimit:{self.name}:{key}"],
+                                             args=[capacity, per_second, wanted]))
+            except redis.RedisError:
+                pass
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._local.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * per_second)
+            granted = min(wanted, int(tokens))
+            self._local[key] = (tokens - granted, now)
+            if len(self._local) > self._max_local_keys:
+                self._local.popitem(last=False)
+            return granted
+
+    def give_back(self, key: str, tokens: int, capacity: int = None, per_second: float = None):
+        """Return tokens taken with take but not used; the bucket never exceeds its capacity."""
+        capacity = capacity or self.capacity
+        per_second = per_second or self.per_second
+        if self._give_back_script is not None:
+            try:
+                self._give_back_script(keys=[f"ratelimit:{self.name}:{key}"], args=[capacity, per_second, tokens])
+                return
+            except redis.RedisError:
+                pass
+        now = time.monotonic()
+        with self._lock:
+            level, ts = self._local.pop(key, (capacity, now))
+            self._local[key] = (min(capacity, level + (now - ts) * per_second + tokens), now)
+            if len(self._local) > self._max_local_keys:
+                self._local.popitem(last=False)
+
+    def reset(self):
+        """Forget all in-process buckets."""
+        with self._lock:
+            self._local.clear()
+
+
+class NegativeCache:
+    """Remember keys known to be absent for `ttl` seconds (e.g. emails with no account)."""
+
+    def __init__(self, name: str, ttl: int, redis_client=None, max_local_keys: int = 100_000):
+        self.name = name
+        self.ttl = ttl
+        self._redis = redis_client
+        self._local = OrderedDict()
+        self._max_local_keys = max_local_keys
+        self._lock = threading.Lock()
+
+    def _key(self, key: str) -> str:
+        return f"negcache:{self.name}:{key}"
+
+    def __contains__(self, key: str) -> bool:
+        if self._redis is not None:
+            try:
+                return bool(self._redis.exists(self._key(key)))
+            except redis.RedisError:
+                pass
+        with self._lock:
+            expires = self._local.get(key)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                del self._local[key]
+                return False
+            return True
+
+    def add(self, key: str):
+        """Mark key as absent."""
+        if self._redis is not None:
+            try:
+                self._redis.set(self._key(key), 1, ex=self.ttl)
+                return
+            except redis.RedisError:
+                pass
+        with self._lock:
+            self._local.pop(key, None)
+            self._local[key] = time.monotonic() + self.ttl
+            if len(self._local) > self._max_local_keys:
+                self._local.popitem(last=False)
+
+    def discard(self, key: str):
+        """Drop key, e.g. once it has been created."""
+        if self._redis is not None:
+            try:
+                self._redis.delete(self._key(key))
+            except redis.RedisError:
+                pass
+        with self._lock:
+            self._local.pop(key, None)
+
+    def clear(self):
+        """Forget all in-process entries."""
+        with self._lock:
+            self._local.clear()
@@ -0,0 +1,210 @@
+# Recurrence rules (a subset of RFC 5545 RRULE), expanded lazily into UTC instants
+#
+#     FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;COUNT=10
+#
+# Rules are expanded in local wall time, so a 09:00 appointment stays at 09:00 across
+# DST changes, then converted to UTC with an offset table computed once per zone and
+# window rather than a timezone lookup per occurrence.
+import calendar
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# freq: one of FREQUENCIES; byday: weekday numbers (Monday 0) for WEEKLY; bymonthday: days
+# of the month for MONTHLY, negative ones counting from the end; until: local wall time
+Rule = namedtuple("Rule", "freq interval byday bymonthday count until")
+
+# initial: UTC offset at the start of the window; transitions: (utc, before, after) for
+# each change of offset inside it, with utc a naive UTC datetime
+OffsetTable = namedtuple("OffsetTable", "initial transitions")
+
+
+def _positive_int(name: str, value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"{name} must be a positive integer")
+    return int(value)
+
+
+def parse_rrule(text: str, zone: ZoneInfo = None) -> Rule:
+    """Parse an RRULE (with or without the "RRULE:" prefix); ValueError with a client-facing message.
+
+    Supported: FREQ (DAILY, WEEKLY, MONTHLY), INTERVAL, BYDAY (WEEKLY), BYMONTHDAY
+    (MONTHLY), COUNT and UNTIL. A UTC UNTIL (ending in Z) is converted to zone's wall time.
+    """
+    text = text.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    parts = {}
+    for part in filter(None, text.upper().split(";")):
+        name, _, value = part.partition("=")
+        if not value or name in parts:
+            raise ValueError(f"Invalid RRULE part: {part}")
+        parts[name] = value
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of: {', '.join(FREQUENCIES)}")
+    interval = _positive_int("INTERVAL", parts.pop("INTERVAL", "1"))
+    byday = bymonthday = count = until = None
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        days = parts.pop("BYDAY").split(",")
+        if not set(days) <= set(WEEKDAYS):
+            raise ValueError(f"BYDAY takes weekdays: {','.join(WEEKDAYS)}")
+        byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+    if "BYMONTHDAY" in parts:
+        if freq != "MONTHLY":
+            raise ValueError("BYMONTHDAY is only supported with FREQ=MONTHLY")
+        try:
+            bymonthday = tuple(sorted({int(day) for day in parts.pop("BYMONTHDAY").split(",")}))
+        except ValueError:
+            raise ValueError("BYMONTHDAY takes days of the month") from None
+        if not all(1 <= abs(day) <= 31 for day in bymonthday):
+            raise ValueError("BYMONTHDAY takes days of the month")
+    if "COUNT" in parts:
+        count = _positive_int("COUNT", parts.pop("COUNT"))
+    if "UNTIL" in parts:
+        value = parts.pop("UNTIL")
+        if count is not None:
+            raise ValueError("COUNT and UNTIL cannot be combined")
+        try:
+            until = (datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S") if "T" in value
+                     else datetime.strptime(value, "%Y%m%d").replace(hour=23, minute=59, second=59))
+        except ValueError:
+            raise ValueError("UNTIL must look like 20301231 or 20301231T235959Z") from None
+        if value.endswith("Z") and zone is not None:
+            until = until.replace(tzinfo=timezone.utc).astimezone(zone).replace(tzinfo=None)
+    if parts:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(parts))}")
+    return Rule(freq, interval, byday, bymonthday, count, until)
+
+
+def _months_between(start: date, end: date) -> int:
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def _candidates(rule: Rule, dtstart: datetime, start: datetime):
+    """Candidate wall times in ascending order, one period at a time, from the period holding start.
+
+    Periods before start are skipped arithmetically unless COUNT needs them counted.
+    """
+    skip = rule.count is None and start is not None and start > dtstart
+    if rule.freq == "DAILY":
+        n = (start - dtstart).days // rule.interval if skip else 0
+        while True:
+            yield dtstart + timedelta(days=n * rule.interval)
+            n += 1
+    elif rule.freq == "WEEKLY":
+        first_week = dtstart.date() - timedelta(days=dtstart.weekday())
+        days = rule.byday or (dtstart.weekday(),)
+        n = (start.date() - first_week).days // 7 // rule.interval if skip else 0
+        while True:
+            week = first_week + timedelta(weeks=n * rule.interval)
+            for day in days:
+                yield datetime.combine(week + timedelta(days=day), dtstart.time())
+            n += 1
+    else:
+        days = rule.bymonthday or (dtstart.day,)
+        n = _months_between(dtstart.date(), start.date()) // rule.interval if skip else 0
+        while True:
+            year, month = divmod(dtstart.month - 1 + n * rule.interval, 12)
+            year, month = dtstart.year + year, month + 1
+            last = calendar.monthrange(year, month)[1]
+            # Days the month does not have (the 31st of April) are skipped, as RFC 5545 says
+            for day in sorted({day if day > 0 else last + 1 + day for day in days}):
+                if 1 <= day <= last:
+                    yield datetime.combine(date(year, month, day), dtstart.time())
+            n += 1
+
+
+def occurrences(rule: Rule, dtstart: datetime, start: datetime, end: datetime):
+    """Lazily yield rule's occurrences (naive local wall times) in [start, end).
+
+    dtstart starts the series and sets the time of day; COUNT counts from it whatever start is.
+    """
+    emitted = 0
+    for when in _candidates(rule, dtstart, start):
+        if when >= end or (rule.until is not None and when > rule.until):
+            return
+        if when < dtstart:
+            continue
+        emitted += 1
+        if rule.count is not None and emitted > rule.count:
+            return
+        if when >= start:
+            yield when
+
+
+def finished_by(rule: Rule, dtstart: datetime, end: datetime) -> bool:
+    """Whether rule has no occurrences at or after end."""
+    if rule.until is not None and rule.until < end:
+        return True
+    if rule.count is None:
+        return False
+    return sum(1 for _ in occurrences(rule, dtstart, dtstart, end)) >= rule.count
+
+
+def get_zone(name: str) -> ZoneInfo:
+    """The IANA time zone called name; ValueError if there is none."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {name}") from None
+
+
+def _offset_at(zone: ZoneInfo, utc: datetime) -> timedelta:
+    return utc.replace(tzinfo=timezone.utc).astimezone(zone).utcoffset()
+
+
+@lru_cache(maxsize=1024)
+def offset_table(zone_name: str, start: datetime, end: datetime) -> OffsetTable:
+    """The UTC offsets of zone_name between the naive UTC datetimes start and end.
+
+    Offsets are sampled hourly and each change is narrowed down to the second, once per
+    zone and window; every occurrence in the window is then converted by to_utc without
+    consulting the zone again.
+    """
+    zone = get_zone(zone_name)
+    initial = previous = _offset_at(zone, start)
+    transitions = []
+    low = start
+    while low < end:
+        high = min(low + timedelta(hours=1), end)
+        offset = _offset_at(zone, high)
+        if offset != previous:
+            lo, hi = low, high
+            while hi - lo > timedelta(seconds=1):
+                middle = lo + (hi - lo) / 2
+                if _offset_at(zone, middle) == previous:
+                    lo = middle
+                else:
+                    hi = middle
+            transitions.append((hi.replace(microsecond=0), previous, offset))
+            previous = offset
+        low = high
+    return OffsetTable(initial, tuple(transitions))
+
+
+def to_utc(local: datetime, table: OffsetTable) -> datetime:
+    """Convert a naive wall time to an aware UTC datetime with table.
+
+    Matches zoneinfo with fold=0: a time repeated when clocks go back takes its first
+    instance, and a time skipped when they go forward takes the offset from before.
+    """
+    offset = table.initial
+    for at, before, after in table.transitions:
+        if local < at + max(before, after):
+            break
+        offset = after
+    return (local - offset).replace(tzinfo=timezone.utc)
+
+
+def window_table(zone_name: str, day: date, days: int) -> OffsetTable:
+    """The offset table of a window of days starting on day (UTC), padded for any zone's offset."""
+    start = datetime.combine(day, datetime.min.time()) - timedelta(days=1)
+    return offset_table(zone_name, start, start + timedelta(days=days + 2))
@@ -0,0 +1,39 @@
+# Shared Redis connection
+import threading
+import redis
+from app.core import config
+
+_client = None
+_blocking_client = None
+_lock = threading.Lock()
+
+
+def get_redis():
+    """Return the process-wide Redis client, or None when REDIS_URL is not set."""
+    global _client
+    if not config.REDIS_URL:
+        return None
+    with _lock:
+        if _client is None:
+            # Fail fast: callers fall back to in-process state rather than wait on Redis
+            _client = redis.Redis.from_url(
+                config.REDIS_URL, socket_connect_timeout=0.25, socket_timeout=0.25
+            )
+        return _client
+
+
+def get_blocking_redis():
+    """Return the process-wide Redis client for blocking commands, or None when REDIS_URL is not set.
+
+    Its reads wait up to REDIS_BLOCKING_SOCKET_TIMEOUT, so blocks shorter than that
+    (BRPOP with a timeout) end with their own reply instead of a socket timeout.
+    """
+    global _blocking_client
+    if not config.REDIS_URL:
+        return None
+    with _lock:
+        if _blocking_client is None:
+            _blocking_client = redis.Redis.from_url(
+                config.REDIS_URL, socket_connect_timeout=0.25, socket_timeout=config.REDIS_BLOCKING_SOCKET_TIMEOUT
+            )
+        return _blocking_client
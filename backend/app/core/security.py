@@ -1,12 +1,110 @@
+import math
+import time
+from typing import NamedTuple
 from passlib.context import CryptContext
+from app.core import config
+from app.core.hashing import HashingPool
+from app.core.metrics import traced
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+
+class PasswordCheck(NamedTuple):
+    """Result of checking a password; truthy when the password is valid."""
+    valid: bool
+    needs_update: bool
+
+    def __bool__(self):
+        return self.valid
+
+
+def _init_hashing_worker(context_config: str):
+    # Worker processes start with the module defaults, so load the parent's settings
+    pwd_context.load(context_config)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _check(plain_password: str, hashed_password: str) -> PasswordCheck:
+    valid = pwd_context.verify(plain_password, hashed_password)
+    return PasswordCheck(valid, valid and pwd_context.needs_update(hashed_password))
+
+
+# bcrypt is CPU-bound, so keep it off the request thread and cap how much work can queue up
+hashing_pool = HashingPool(
+    workers=config.HASH_POOL_WORKERS,
+    max_pending=config.HASH_POOL_MAX_PENDING,
+    retry_after=config.HASH_POOL_RETRY_AFTER,
+    initializer=_init_hashing_worker,
+    initargs=(pwd_context.to_string(),),
+)
+
+
+def calibrate_bcrypt_rounds(budget_ms: int, min_rounds: int = 10, max_rounds: int = 16) -> int:
+    """Pick the highest bcrypt rounds whose hash time on this core fits the budget."""
+    bcrypt = pwd_context.handler("bcrypt")
+
+    def measure(rounds):
+        start = time.perf_counter()
+        bcrypt.using(rounds=rounds).hash("calibration-password")
+        return (time.perf_counter() - start) * 1000
+
+    # Each extra round doubles the cost, so one sample is enough to extrapolate
+    rounds = min_rounds
+    elapsed = measure(rounds)
+    if elapsed < budget_ms:
+        rounds = min(max_rounds, min_rounds + int(math.log2(budget_ms / elapsed)))
+        # Step back if the extrapolation overshot on this machine
+        while rounds > min_rounds and measure(rounds) > budget_ms:
+            rounds -= 1
+    return rounds
+
+
+def configure_password_context(rounds: int):
+    """Use the given bcrypt rounds for new hashes and flag hashes with any other cost."""
+    pwd_context.update(
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+    hashing_pool.reconfigure((pwd_context.to_string(),))
+
+
+def init_password_hashing() -> int:
+    """Startup step: settle the bcrypt cost for this deployment and return it."""
+    if config.HASH_TIME_BUDGET_MS > 0:
+        rounds = calibrate_bcrypt_rounds(
+            config.HASH_TIME_BUDGET_MS, config.BCRYPT_MIN_ROUNDS, config.BCRYPT_MAX_ROUNDS
+        )
+        print(f"Calibrated bcrypt rounds: {rounds} (budget {config.HASH_TIME_BUDGET_MS} ms)")
+    else:
+        rounds = config.BCRYPT_ROUNDS
+    configure_password_context(rounds)
+    return rounds
+
+
+@traced("hash_password")
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    return pwd_context.hash(password)
+    return hashing_pool.run(_hash, password)
+
+def get_password_hashes(passwords: list) -> list:
+    """Hash many passwords in parallel across the hashing pool."""
+    return hashing_pool.map(_hash, passwords)
 
+@traced("verify_password")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return hashing_pool.run(_verify, plain_password, hashed_password)
+
+@traced("verify_password")
+def check_password_hash(plain_password: str, hashed_password: str) -> PasswordCheck:
+    """Verify a password and report whether its hash should be upgraded."""
+    return hashing_pool.run(_check, plain_password, hashed_password)
@@ -0,0 +1,91 @@
+# JSON providers (orjson when available, stdlib otherwise) and streamed JSON arrays
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from app.core import config
+from app.core.metrics import TimedJSONProvider, span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, decoding to the same values as the stdlib one.
+
+    Dates still go through Flask's default (HTTP dates), keys are sorted when sort_keys
+    is set, and responses are built from bytes without a str round trip. Serialization
+    is reported as the json_dumps span. The bytes differ from Flask's in two ways:
+    non-ASCII text is sent as UTF-8 rather than \\u escapes, and some floats are
+    spelled differently (1e20 rather than 1e+20).
+    """
+
+    def _options(self, indent: bool = False) -> int:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumpb(self, obj, indent: bool = False) -> bytes:
+        with span("json_dumps"):
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Callers asking for stdlib-only options (cls, separators, ...) get the stdlib encoder
+        if set(kwargs) - {"indent"}:
+            return super().dumps(obj, **kwargs)
+        return self.dumpb(obj, indent=bool(kwargs.get("indent"))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s) if not kwargs else super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumpb(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def json_provider_class():
+    """The provider JSON_PROVIDER selects, falling back to the stdlib one without orjson."""
+    if config.JSON_PROVIDER == "orjson" and orjson is not None:
+        return OrjsonProvider
+    return TimedJSONProvider
+
+
+def dumpb(obj) -> bytes:
+    """Serialize obj to compact JSON bytes with the application's provider."""
+    provider = current_app.json
+    if isinstance(provider, OrjsonProvider):
+        return provider.dumpb(obj)
+    return provider.dumps(obj, separators=(",", ":")).encode()
+
+
+def json_array_stream(head: dict, key: str, items, encode, tail=None, batch_size: int = 200):
+    """Stream {**head, key: [encode(item), ...], **tail()} without holding the array in memory.
+
+    Items are encoded batch_size at a time, so a large listing is serialized with few
+    calls and sent as it is read. tail, if given, is called after the last item (e.g. to
+    report a cursor for the next page). Keep the request context with the generator so
+    the database session stays open until the last row.
+    """
+    def generate():
+        opening = dumpb(head)
+        yield opening[:-1] + (b"," if head else b"") + dumpb(key) + b":["
+        batch, first = [], True
+        for item in items:
+            batch.append(encode(item))
+            if len(batch) >= batch_size:
+                yield (b"" if first else b",") + dumpb(batch)[1:-1]
+                batch, first = [], False
+        if batch:
+            yield (b"" if first else b",") + dumpb(batch)[1:-1]
+        closing = dumpb(tail() if tail is not None else {})
+        yield b"]" + (b"," + closing[1:] if len(closing) > 2 else b"}") + b"\n"
+    return stream_with_context(generate())
+
+
+def init_app(app) -> None:
+    app.json_provider_class = json_provider_class()
+    app.json = app.json_provider_class(app)
@@ -0,0 +1,118 @@
+# JWT verification with a claims cache and an in-process revocation list
+import os
+import threading
+import time
+import redis
+from flask_jwt_extended import JWTManager
+from app.core import config
+from app.core.lru import LRUCache
+from app.core.redis_client import get_redis
+
+
+class RevocationList:
+    """Revoked token ids (jti), checked with a local set lookup.
+
+    Revocations are stored in a Redis sorted set scored by token expiry. Each
+    process keeps a copy that a background thread refreshes every sync_seconds,
+    so checks never wait on the network; a revocation made in another process
+    takes effect here within one sync interval. Entries leave the set once the
+    token would have expired anyway, which keeps it small. Without Redis the
+    list is per-process; while Redis is unreachable a revocation applies here
+    at once and is pushed by the next sync that reaches it.
+    """
+
+    KEY = "jwt:revoked"
+
+    def __init__(self, redis_client=None, sync_seconds: float = 1):
+        self._redis = redis_client
+        self.sync_seconds = sync_seconds
+        self._revoked = {}
+        self._unpushed = {}
+        self._lock = threading.Lock()
+        self._sync_pid = None
+
+    def is_revoked(self, jti: str) -> bool:
+        self._ensure_syncing()
+        return jti in self._revoked
+
+    def revoke(self, jti: str, expires_at: float):
+        """Revoke jti until expires_at (epoch seconds)."""
+        with self._lock:
+            self._revoked[jti] = expires_at
+        if self._redis is not None:
+            try:
+                self._push({jti: expires_at})
+            except redis.RedisError as e:
+                print(f"Could not store token revocation in Redis, will retry on sync: {e}")
+                with self._lock:
+                    self._unpushed[jti] = expires_at
+
+    def _push(self, revocations: dict):
+        pipeline = self._redis.pipeline()
+        pipeline.zadd(self.KEY, revocations)
+        pipeline.zremrangebyscore(self.KEY, "-inf", time.time())
+        pipeline.execute()
+
+    def sync(self):
+        """Push revocations Redis missed, then replace the local copy with the unexpired ones from Redis."""
+        now = time.time()
+        with self._lock:
+            unpushed = {jti: exp for jti, exp in self._unpushed.items() if exp > now}
+        if unpushed:
+            self._push(unpushed)
+        with self._lock:
+            self._unpushed = {jti: exp for jti, exp in self._unpushed.items() if exp > now and jti not in unpushed}
+        revoked = {
+            member.decode() if isinstance(member, bytes) else member: score
+            for member, score in self._redis.zrangebyscore(self.KEY, now, "+inf", withscores=True)
+        }
+        with self._lock:
+            # Keep local revocations that have not reached Redis yet
+            revoked.update((jti, exp) for jti, exp in self._revoked.items() if exp > now and jti not in revoked)
+            self._revoked = revoked
+
+    def _ensure_syncing(self):
+        # One sync thread per process; threads do not survive a fork
+        if self._redis is None or self._sync_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sync_pid == os.getpid():
+                return
+            self._sync_pid = os.getpid()
+        threading.Thread(target=self._sync_forever, name="jwt-revocation-sync", daemon=True).start()
+
+    def _sync_forever(self):
+        while True:
+            try:
+                self.sync()
+            except redis.RedisError:
+                pass  # Keep serving from the last good copy
+            time.sleep(self.sync_seconds)
+
+
+revoked_tokens = RevocationList(get_redis(), config.REVOCATION_SYNC_SECONDS)
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that verifies each token's signature once and reuses its claims until expiry.
+
+    Revocation is still checked on every request, against revoked_tokens.
+    """
+
+    def __init__(self, app=None, cache_size: int = config.JWT_CACHE_SIZE):
+        self._verified = LRUCache(cache_size)
+        super().__init__(app)
+        self.token_in_blocklist_loader(
+            lambda jwt_header, jwt_payload: revoked_tokens.is_revoked(jwt_payload["jti"])
+        )
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        if allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        key = (encoded_token, csrf_value)
+        claims = self._verified.get(key)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value)
+            # The cache entry lapses with the token, after which a full decode raises the expiry error
+            self._verified.set(key, claims, expires_at=claims.get("exp"))
+        return claims
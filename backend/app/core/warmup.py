@@ -0,0 +1,42 @@
+# Per-worker warmup, run by gunicorn right after a worker is forked
+import time
+from sqlalchemy import exc
+from app.core import config
+from app.core.security import hashing_pool, pwd_context, _verify
+from app.db.session import engine, replicas
+
+# Cheap bcrypt hash (minimum cost) used to load the bcrypt backend in each hashing process
+_PRIME_HASH = pwd_context.handler("bcrypt").using(rounds=4).hash("warmup")
+
+
+def warm_up_worker(log=None) -> float:
+    """Preconnect the pool and start the hashing processes; return the elapsed milliseconds."""
+    start = time.perf_counter()
+
+    # Connections inherited from the preloading master belong to it; drop them without closing
+    engine.dispose(close=False)
+    if replicas is not None:
+        replicas.dispose(close=False)
+    if engine.dialect.name != 'sqlite':
+        connections = []
+        try:
+            for _ in range(config.DB_POOL_SIZE):
+                connections.append(engine.connect())
+        except exc.OperationalError as e:
+            # Serve anyway; the pool connects lazily once the database is back
+            if log is not None:
+                log.warning(f"Could not preconnect the database pool: {e}")
+        finally:
+            for connection in connections:
+                connection.close()
+
+    hashing_pool.warm_up(_verify, "warmup", _PRIME_HASH)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if log is not None:
+        message = f"Worker warm in {elapsed_ms:.0f} ms (budget {config.WORKER_STARTUP_BUDGET_MS} ms)"
+        if elapsed_ms > config.WORKER_STARTUP_BUDGET_MS:
+            log.warning(message)
+        else:
+            log.info(message)
+    return elapsed_ms
@@ -0,0 +1,157 @@
+# Bulk appointment import
+import csv
+import io
+import json
+from datetime import timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core import config
+from app.crud.organization import tenant_of
+from app.crud.reminder import new_appointment, utcnow
+from app.db import session as db_session
+from app.db.changefeed import notify
+from app.db.models import ImportJob
+from app.schemas.appointment import APPOINTMENT_FIELDS, parse_appointment
+
+
+def iter_csv_rows(lines):
+    """Yield dict rows from an iterable of CSV byte lines with a header row."""
+    return csv.DictReader(line.decode('utf-8-sig') for line in lines)
+
+
+def iter_ndjson_rows(lines):
+    """Yield one parsed object per non-blank NDJSON byte line; bad lines yield a ValueError."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield ValueError(f'Invalid JSON: {e}')
+            continue
+        yield row if isinstance(row, dict) else ValueError('Each line must be a JSON object')
+
+
+def _copy_into_appointments(db: Session, user_id: int, rows: list, tenant_id: int):
+    """Write rows with one COPY into a temp staging table and one merging statement."""
+    connection = db.connection()
+    # Staging rows vanish at every commit, and each chunk commits after merging
+    connection.execute(text(
+        'CREATE TEMP TABLE IF NOT EXISTS appointment_import_staging ('
+        ' title text, starts_at timestamptz, client_name text, client_email text, client_phone text'
+        ') ON COMMIT DELETE ROWS'
+    ))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row['starts_at'].isoformat() if field == 'starts_at' else row[field]
+                         for field in APPOINTMENT_FIELDS])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY appointment_import_staging ({', '.join(APPOINTMENT_FIELDS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+    # Insert the appointments and their reminders in a single round trip
+    connection.execute(text(
+        'WITH inserted AS ('
+        '  INSERT INTO appointments (user_id, title, starts_at, client_name, client_email, client_phone, created_at)'
+        '  SELECT :user_id, title, starts_at, client_name, client_email, client_phone, now()'
+        '  FROM appointment_import_staging'
+        '  RETURNING id, starts_at, client_email, client_phone'
+        ') '
+        'INSERT INTO reminders (appointment_id, tenant_id, channel, recipient, due_at, status, attempts, created_at) '
+        "SELECT id, :tenant_id, 'email', client_email, starts_at - :lead, 'pending', 0, now() FROM inserted"
+        ' WHERE client_email IS NOT NULL '
+        'UNION ALL '
+        "SELECT id, :tenant_id, 'sms', client_phone, starts_at - :lead, 'pending', 0, now() FROM inserted"
+        ' WHERE client_phone IS NOT NULL'
+    ), {'user_id': user_id, 'tenant_id': tenant_id,
+        'lead': timedelta(minutes=config.DEFAULT_REMINDER_LEAD_MINUTES)})
+
+
+def _add_appointments(db: Session, user_id: int, rows: list, tenant_id: int):
+    """Portable fallback: let the unit of work batch the inserts."""
+    db.add_all([new_appointment(user_id=user_id, tenant_id=tenant_id, **row) for row in rows])
+    db.flush()
+
+
+def write_appointments(db: Session, user_id: int, rows: list, tenant_id: int = 0):
+    """Insert a chunk of validated rows for user_id in the current transaction."""
+    if not rows:
+        return
+    lead = timedelta(minutes=config.DEFAULT_REMINDER_LEAD_MINUTES)
+    notify(db, [user_id], min(row['starts_at'] for row in rows) - lead)
+    if db.get_bind().dialect.name == 'postgresql':
+        _copy_into_appointments(db, user_id, rows, tenant_id)
+    else:
+        _add_appointments(db, user_id, rows, tenant_id)
+
+
+def _fail_job(job_id: str, errors: list) -> None:
+    # A fresh session: the import's own may have lost its connection
+    db = db_session.SessionLocal()
+    try:
+        db.query(ImportJob).filter(ImportJob.id == job_id).update(
+            {ImportJob.status: ImportJob.FAILED, ImportJob.errors: json.dumps(errors),
+             ImportJob.finished_at: utcnow()},
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_import(db: Session, job: ImportJob, rows, chunk_size: int = None) -> ImportJob:
+    """Validate and write rows in chunks, committing the job's progress with each chunk.
+
+    rows may contain ValueError items for records that could not be parsed at all.
+    Memory use is bounded by the chunk size, whatever the size of the upload. A database
+    error marks the job failed (in a session of its own) and is re-raised.
+    """
+    chunk_size = chunk_size or config.IMPORT_CHUNK_SIZE
+    job_id = job.id
+    errors = json.loads(job.errors)
+    tenant_id = tenant_of(db, job.user_id)
+    chunk = []
+
+    def flush():
+        write_appointments(db, job.user_id, chunk, tenant_id)
+        job.rows_imported += len(chunk)
+        job.errors = json.dumps(errors)
+        db.commit()
+        chunk.clear()
+
+    try:
+        for number, row in enumerate(rows, start=1):
+            job.rows_total += 1
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                chunk.append(parse_appointment(row))
+            except ValueError as e:
+                job.rows_failed += 1
+                if len(errors) < config.IMPORT_MAX_ERRORS:
+                    errors.append({'row': number, 'error': str(e)})
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+        job.status = ImportJob.COMPLETED
+    except (csv.Error, UnicodeDecodeError) as e:
+        db.rollback()
+        errors.append({'row': job.rows_total, 'error': f'Unreadable upload: {e}'})
+        job.errors = json.dumps(errors)
+        job.status = ImportJob.FAILED
+    except SQLAlchemyError as e:
+        row = job.rows_total
+        db.rollback()
+        errors.append({'row': row, 'error': f'Database error: {str(getattr(e, "orig", None) or e).splitlines()[0]}'})
+        _fail_job(job_id, errors)
+        raise
+    job.finished_at = utcnow()
+    db.commit()
+    return job
@@ -0,0 +1,34 @@
+# Organization (tenant) CRUD operations
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.db.models import Appointment, Organization, Reminder, User
+
+
+def create_organization(db: Session, name: str, reminders_per_minute: int = None,
+                        timezone: str = "UTC") -> Organization:
+    """Create an organization; reminders_per_minute overrides the default send quota."""
+    organization = Organization(name=name, reminders_per_minute=reminders_per_minute, timezone=timezone)
+    db.add(organization)
+    db.commit()
+    db.refresh(organization)
+    return organization
+
+
+def tenant_of(db: Session, user_id: int) -> int:
+    """The tenant id reminders of user_id are filed under: their organization, or 0."""
+    return db.query(User.organization_id).filter(User.id == user_id).scalar() or 0
+
+
+def assign_organization(db: Session, user: User, organization_id: int = None):
+    """Move user into organization_id (None to remove them), taking their unsent reminders along."""
+    user.organization_id = organization_id
+    # Sent and failed reminders stay with the tenant that was charged for them
+    (
+        db.query(Reminder)
+        .filter(
+            Reminder.appointment_id.in_(select(Appointment.id).where(Appointment.user_id == user.id)),
+            Reminder.status == Reminder.PENDING,
+        )
+        .update({Reminder.tenant_id: organization_id or 0}, synchronize_session=False)
+    )
+    db.commit()
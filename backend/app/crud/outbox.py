@@ -0,0 +1,64 @@
+# Transactional outbox: messages are written in the transaction that produces them and
+# relayed to their queue afterwards, so a crash can delay a message but never lose it
+import json
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from app.core import config
+from app.db.models import OutboxEvent
+
+# Topic of reminder delivery messages; relayed to the "reminders" delivery queue
+REMINDER_TOPIC = "reminders"
+
+
+def reminder_message(reminder) -> dict:
+    """Render a claimed reminder into a delivery message.
+
+    The idempotency key names the reminder, so however often the message is relayed or
+    the reminder re-claimed, it is sent once.
+    """
+    appointment = reminder.appointment
+    return {
+        "id": reminder.id,
+        "idempotency_key": f"reminder:{reminder.id}",
+        "user_id": appointment.user_id,
+        "channel": reminder.channel,
+        "recipient": reminder.recipient,
+        "attempts": reminder.attempts,
+        "subject": f"Reminder: {appointment.title}",
+        "body": (
+            f"Hi {appointment.client_name}, this is a reminder of {appointment.title} "
+            f"on {appointment.starts_at:%Y-%m-%d %H:%M %Z}."
+        ),
+    }
+
+
+def add_events(db: Session, topic: str, messages) -> None:
+    """Stage messages for topic in db's transaction; they are relayed once it commits."""
+    db.add_all([OutboxEvent(topic=topic, payload=json.dumps(message)) for message in messages])
+
+
+def relay_outbox(db: Session, publish, batch_size: int = None) -> int:
+    """Hand the oldest batch of events to publish(topic, messages), then delete them; return how many.
+
+    Rows are locked with SKIP LOCKED, so concurrent relays take disjoint batches. A relay
+    that dies after publishing and before committing publishes the batch again, so
+    consumers must be idempotent (see reminder_message's idempotency key).
+    """
+    events = (
+        db.query(OutboxEvent)
+        .order_by(OutboxEvent.id)
+        .limit(batch_size or config.OUTBOX_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not events:
+        db.rollback()
+        return 0
+    by_topic = defaultdict(list)
+    for event in events:
+        by_topic[event.topic].append(json.loads(event.payload))
+    for topic, messages in by_topic.items():
+        publish(topic, messages)
+    db.query(OutboxEvent).filter(OutboxEvent.id.in_([event.id for event in events])).delete(synchronize_session=False)
+    db.commit()
+    return len(events)
@@ -0,0 +1,71 @@
+# Keyset (cursor) pagination: pages start after the last row seen, never at an OFFSET
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import bindparam, tuple_
+
+Page = namedtuple("Page", "items next_cursor")
+
+
+def encode_cursor(values) -> str:
+    """An opaque, URL-safe cursor for the sort key values of the last row on a page."""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """The sort key values in cursor, converted back for columns; ValueError if it is malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    converted = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        if value is not None and python_type is datetime:
+            value = datetime.fromisoformat(value) if isinstance(value, str) else None
+        if value is None or not isinstance(value, python_type) or isinstance(value, bool):
+            raise ValueError("Invalid cursor")
+        converted.append(value)
+    return converted
+
+
+def _after(columns, values, descending: bool):
+    # A row-value comparison, which Postgres and SQLite both plan as one range scan on the index
+    key = tuple_(*columns)
+    bound = tuple_(*(bindparam(None, value, type_=column.type) for column, value in zip(columns, values)))
+    return key < bound if descending else key > bound
+
+
+def keyset(query, columns, limit: int, cursor: str = None, descending: bool = True):
+    """query ordered by columns, starting after cursor, fetching one row more than limit.
+
+    columns must end in a unique column (usually id) and match an index, e.g.
+    (created_at, id), so each page is one index range scan however deep it is. The
+    extra row only tells whether another page follows; see page_of.
+    """
+    if cursor is not None:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return query.order_by(*order).limit(limit + 1)
+
+
+def cursor_of(row, columns) -> str:
+    """The cursor pointing after row."""
+    return encode_cursor([getattr(row, column.key) for column in columns])
+
+
+def page_of(rows, columns, limit: int) -> Page:
+    """Split the rows of a keyset() query into a page and the cursor of the next one."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return Page(rows, None)
+    return Page(rows[:limit], cursor_of(rows[limit - 1], columns))
+
+
+def paginate(query, columns, limit: int, cursor: str = None, descending: bool = True) -> Page:
+    """One page of query in keyset order, with the cursor for the next page (None on the last)."""
+    return page_of(keyset(query, columns, limit, cursor, descending).all(), columns, limit)
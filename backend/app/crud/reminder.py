@@ -0,0 +1,203 @@
+# Appointment and reminder CRUD operations
+import random
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import exists, func, literal
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.core import config
+from app.db.changefeed import notify
+from app.db.models import Appointment, Organization, Reminder
+from .organization import tenant_of
+from .outbox import REMINDER_TOPIC, add_events, reminder_message
+from .pagination import Page, keyset, paginate
+
+DEFAULT_REMIND_BEFORE = (timedelta(minutes=config.DEFAULT_REMINDER_LEAD_MINUTES),)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def new_appointment(user_id: int, title: str, starts_at: datetime, client_name: str,
+                    client_email: str = None, client_phone: str = None, remind_before=DEFAULT_REMIND_BEFORE,
+                    tenant_id: int = 0):
+    """Build an unsaved appointment with one reminder per contact channel and lead time."""
+    appointment = Appointment(
+        user_id=user_id,
+        title=title,
+        starts_at=starts_at,
+        client_name=client_name,
+        client_email=client_email,
+        client_phone=client_phone,
+    )
+    for channel, recipient in (("email", client_email), ("sms", client_phone)):
+        if recipient:
+            for lead_time in remind_before:
+                appointment.reminders.append(
+                    Reminder(channel=channel, recipient=recipient, due_at=starts_at - lead_time, tenant_id=tenant_id)
+                )
+    return appointment
+
+
+def create_appointment(db: Session, user_id: int, title: str, starts_at: datetime, client_name: str,
+                       client_email: str = None, client_phone: str = None, remind_before=DEFAULT_REMIND_BEFORE):
+    """Create an appointment with one reminder per contact channel and lead time."""
+    appointment = new_appointment(user_id, title, starts_at, client_name, client_email, client_phone, remind_before,
+                                  tenant_of(db, user_id))
+    db.add(appointment)
+    notify(db, [user_id], min((r.due_at for r in appointment.reminders), default=None))
+    db.commit()
+    db.refresh(appointment)
+    return appointment
+
+
+# Sort keys of the listings below; each matches an index
+APPOINTMENT_ORDER = (Appointment.created_at, Appointment.id)
+REMINDER_HISTORY_ORDER = (Reminder.id,)
+
+
+def list_appointments(db: Session, user_id: int, limit: int, cursor: str = None) -> Page:
+    """A page of the user's appointments, newest first, with their reminders."""
+    query = (
+        db.query(Appointment)
+        .options(selectinload(Appointment.reminders))
+        .filter(Appointment.user_id == user_id)
+    )
+    return paginate(query, APPOINTMENT_ORDER, limit, cursor)
+
+
+def reminder_history(db: Session, user_id: int, limit: int, cursor: str = None):
+    """The user's reminders, newest first, read in batches rather than all at once.
+
+    Like keyset(), this yields up to limit + 1 reminders; the extra one means more follow.
+    """
+    query = (
+        db.query(Reminder)
+        .join(Appointment, Reminder.appointment_id == Appointment.id)
+        .filter(Appointment.user_id == user_id)
+    )
+    return keyset(query, REMINDER_HISTORY_ORDER, limit, cursor).yield_per(200)
+
+
+def _lock_due(db: Session, now: datetime, limit: int, tenant_id: int = None, exclude=()) -> list:
+    query = (
+        db.query(Reminder)
+        .options(joinedload(Reminder.appointment, innerjoin=True))
+        .filter(Reminder.status == Reminder.PENDING, Reminder.due_at <= now)
+    )
+    if tenant_id is not None:
+        query = query.filter(Reminder.tenant_id == tenant_id)
+    if exclude:
+        # SKIP LOCKED does not skip rows this transaction locked itself
+        query = query.filter(Reminder.id.notin_(exclude))
+    return query.order_by(Reminder.due_at).limit(limit).with_for_update(skip_locked=True, of=Reminder).all()
+
+
+def _lease(db: Session, reminders: list, owner: str, lease_seconds: int, now: datetime, outbox: bool) -> list:
+    lease_expires_at = now + timedelta(seconds=lease_seconds)
+    for reminder in reminders:
+        reminder.status = Reminder.CLAIMED
+        reminder.lease_owner = owner
+        reminder.lease_expires_at = lease_expires_at
+    if outbox:
+        # Committed with the lease: either both happen or neither does
+        add_events(db, REMINDER_TOPIC, [reminder_message(reminder) for reminder in reminders])
+    db.commit()
+    return reminders
+
+
+def claim_due_reminders(db: Session, owner: str, batch_size: int, lease_seconds: int, now: datetime = None,
+                        outbox: bool = False):
+    """Lease up to batch_size due reminders to owner and return them.
+
+    Rows are locked with FOR UPDATE SKIP LOCKED, so concurrent schedulers each get a
+    disjoint batch instead of queueing on one another's locks. A claim that is not
+    finished before its lease runs out is handed back by release_expired_leases. With
+    outbox, a delivery message per reminder is written to the outbox in the same commit.
+    """
+    now = now or utcnow()
+    return _lease(db, _lock_due(db, now, batch_size), owner, lease_seconds, now, outbox)
+
+
+def next_due_at(db: Session) -> datetime:
+    """When the earliest pending reminder falls due (aware UTC), or None if none is pending."""
+    due_at = db.query(func.min(Reminder.due_at)).filter(Reminder.status == Reminder.PENDING).scalar()
+    if due_at is None:
+        return None
+    # SQLite hands timestamps back naive (they are stored in UTC)
+    return due_at.replace(tzinfo=timezone.utc) if due_at.tzinfo is None else due_at
+
+
+def due_tenants(db: Session, now: datetime = None) -> list:
+    """(tenant_id, reminders_per_minute) for every tenant with pending reminders due.
+
+    Each tenant costs one probe of ix_reminders_tenant_status_due_at, however large its
+    backlog; tenant 0 (accounts outside any organization) has no quota of its own.
+    """
+    now = now or utcnow()
+
+    def has_due(tenant_id):
+        return exists().where(Reminder.tenant_id == tenant_id, Reminder.status == Reminder.PENDING,
+                              Reminder.due_at <= now)
+
+    tenants = (
+        db.query(Organization.id, Organization.reminders_per_minute)
+        .filter(has_due(Organization.id))
+        .all()
+    )
+    if db.query(literal(True)).filter(has_due(0)).scalar():
+        tenants.append((0, None))
+    return [tuple(tenant) for tenant in tenants]
+
+
+def claim_due_reminders_fairly(db: Session, owner: str, batch_size: int, lease_seconds: int,
+                               quota=None, now: datetime = None, outbox: bool = False):
+    """Lease up to batch_size due reminders to owner, shared out evenly across tenants.
+
+    Every tenant with reminders due gets an equal share of the batch, and what a tenant
+    cannot use is shared out again among the others, so one tenant's backlog never holds
+    back anyone else's reminders. quota(tenant_id, reminders_per_minute, wanted) returns
+    how many of `wanted` a tenant may still send; the rest stay pending and unleased.
+    What a tenant was allowed but had no free rows for (fewer due, or locked by another
+    scheduler) goes back through quota.refund(tenant_id, reminders_per_minute, unused).
+    outbox is as for claim_due_reminders.
+    """
+    now = now or utcnow()
+    tenants = due_tenants(db, now)
+    # With more tenants than batch slots, a random order lets each get its turn
+    random.shuffle(tenants)
+    claimed = []
+    remaining = batch_size
+    while remaining and tenants:
+        share = max(1, remaining // len(tenants))
+        unsatisfied = []
+        for tenant_id, per_minute in tenants:
+            wanted = min(share, remaining)
+            if wanted == 0:
+                break
+            allowed = quota(tenant_id, per_minute, wanted) if quota is not None else wanted
+            if allowed == 0:
+                continue
+            reminders = _lock_due(db, now, allowed, tenant_id, [r.id for r in claimed if r.tenant_id == tenant_id])
+            if quota is not None and len(reminders) < allowed:
+                quota.refund(tenant_id, per_minute, allowed - len(reminders))
+            claimed.extend(reminders)
+            remaining -= len(reminders)
+            if len(reminders) == wanted:
+                unsatisfied.append((tenant_id, per_minute))
+        tenants = unsatisfied
+    return _lease(db, claimed, owner, lease_seconds, now, outbox)
+
+
+def release_expired_leases(db: Session, now: datetime = None) -> int:
+    """Return reminders whose lease ran out to pending and report how many."""
+    now = now or utcnow()
+    released = (
+        db.query(Reminder)
+        .filter(Reminder.status == Reminder.CLAIMED, Reminder.lease_expires_at <= now)
+        .update(
+            {Reminder.status: Reminder.PENDING, Reminder.lease_owner: None, Reminder.lease_expires_at: None},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return released
@@ -0,0 +1,187 @@
+# Recurring appointment series and their expansion into appointments
+#
+# A series is stored once, as a rule. Its occurrences are materialized as ordinary
+# appointments (with reminders) only a rolling window ahead, by expand_due_series,
+# which the scheduler runs in the background every RECURRENCE_EXPAND_SECONDS.
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import exists, or_
+from sqlalchemy.orm import Session
+from app.core import config
+from app.core.lru import LRUCache
+from app.core.recurrence import finished_by, get_zone, occurrences, parse_rrule, to_utc, window_table
+from app.db.changefeed import notify
+from app.db.models import Appointment, AppointmentSeries, Organization, Reminder, User
+from .organization import tenant_of
+from .reminder import new_appointment, utcnow
+
+# (series id, version, first day) -> UTC occurrences of that window. A change to a series
+# bumps its version, so only that series' windows are recomputed.
+occurrence_cache = LRUCache(config.OCCURRENCE_CACHE_SIZE)
+
+
+def default_timezone(db: Session, user_id: int) -> str:
+    """The time zone of user_id's organization, or UTC."""
+    zone = (
+        db.query(Organization.timezone)
+        .join(User, User.organization_id == Organization.id)
+        .filter(User.id == user_id)
+        .scalar()
+    )
+    return zone or "UTC"
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back naive (they are stored in UTC)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def window_occurrences(series: AppointmentSeries, day, days: int = None) -> tuple:
+    """The series' occurrences (aware UTC) in the days from the start of day (UTC), cached.
+
+    The zone's offsets come from a table computed once per zone and window, shared by
+    every series in that zone.
+    """
+    days = days or config.RECURRENCE_WINDOW_DAYS
+    key = (series.id, series.version, day, days)
+    cached = occurrence_cache.get(key)
+    if cached is not None:
+        return cached
+    table = window_table(series.timezone, day, days)
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=days)
+    rule = parse_rrule(series.rrule, get_zone(series.timezone))
+    # The local window is padded by a day either side; the UTC bounds are exact
+    instants = tuple(
+        utc for utc in (
+            to_utc(local, table)
+            for local in occurrences(rule, series.starts_at_local, start - timedelta(days=1), end + timedelta(days=1))
+        )
+        if start <= utc.replace(tzinfo=None) < end
+    )
+    occurrence_cache.set(key, instants)
+    return instants
+
+
+def expand_series(db: Session, series: AppointmentSeries, tenant_id: int, now: datetime = None) -> int:
+    """Materialize the series' occurrences up to RECURRENCE_WINDOW_DAYS ahead; return how many were added.
+
+    Starts from the series' watermark (never in the past) and skips occurrences that
+    already have an appointment. The caller commits.
+    """
+    now = now or utcnow()
+    horizon = now + timedelta(days=config.RECURRENCE_WINDOW_DAYS)
+    start = max(_as_utc(series.expanded_until), now) if series.expanded_until is not None else now
+    existing = {
+        _as_utc(starts_at) for (starts_at,) in
+        db.query(Appointment.starts_at).filter(Appointment.series_id == series.id, Appointment.starts_at >= start)
+    }
+    added = []
+    for instant in window_occurrences(series, now.date(), config.RECURRENCE_WINDOW_DAYS + 1):
+        if not start <= instant < horizon or instant in existing:
+            continue
+        appointment = new_appointment(series.user_id, series.title, instant, series.client_name,
+                                      series.client_email, series.client_phone, tenant_id=tenant_id)
+        appointment.series_id = series.id
+        db.add(appointment)
+        added.append(appointment)
+    if added:
+        notify(db, [series.user_id], min((r.due_at for a in added for r in a.reminders), default=None))
+    series.expanded_until = horizon
+    rule = parse_rrule(series.rrule, get_zone(series.timezone))
+    # A day's margin either way covers any zone's offset from UTC
+    series.finished = finished_by(rule, series.starts_at_local, horizon.replace(tzinfo=None) - timedelta(days=1))
+    return len(added)
+
+
+def expand_due_series(db: Session, now: datetime = None, batch_size: int = None) -> set:
+    """Top up the materialized window of series running low; return the ids of the users affected.
+
+    Runs in the background rather than in the claim loop. Each series is only expanded
+    when less than RECURRENCE_REFILL_DAYS of its window is left, i.e. about once a day;
+    series rows are locked with SKIP LOCKED so concurrent schedulers split the work.
+    Series closest to the end of their window go first, a batch of batch_size at a time
+    (committed as it goes) until a batch comes back short, so a backlog larger than one
+    batch is cleared in the same run.
+    """
+    now = now or utcnow()
+    batch_size = batch_size or config.RECURRENCE_EXPAND_BATCH
+    refill_before = now + timedelta(days=config.RECURRENCE_REFILL_DAYS)
+    users = set()
+    while True:
+        # Expanded series move past refill_before, so each batch picks up new ones
+        rows = (
+            db.query(AppointmentSeries, User.organization_id)
+            .join(User, User.id == AppointmentSeries.user_id)
+            .filter(
+                AppointmentSeries.finished.is_(False),
+                or_(AppointmentSeries.expanded_until.is_(None), AppointmentSeries.expanded_until < refill_before),
+            )
+            .order_by(AppointmentSeries.expanded_until)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True, of=AppointmentSeries)
+            .all()
+        )
+        for series, organization_id in rows:
+            if expand_series(db, series, organization_id or 0, now):
+                users.add(series.user_id)
+        db.commit()
+        # With a window no longer than the refill mark, expanded series would be picked again
+        if len(rows) < batch_size or config.RECURRENCE_WINDOW_DAYS <= config.RECURRENCE_REFILL_DAYS:
+            return users
+
+
+def create_series(db: Session, user_id: int, values: dict, now: datetime = None) -> AppointmentSeries:
+    """Create a series from validated values (see parse_series) and materialize its first window."""
+    values = dict(values)
+    values.setdefault('timezone', None)
+    values['timezone'] = values['timezone'] or default_timezone(db, user_id)
+    series = AppointmentSeries(user_id=user_id, **values)
+    db.add(series)
+    db.flush()
+    expand_series(db, series, tenant_of(db, user_id), now)
+    db.commit()
+    return series
+
+
+def _discard_future_occurrences(db: Session, series: AppointmentSeries, now: datetime) -> None:
+    # Occurrences whose reminders have started going out stay as they are
+    started = exists().where(Reminder.appointment_id == Appointment.id, Reminder.status != Reminder.PENDING)
+    discarded = (
+        db.query(Appointment.id)
+        .filter(Appointment.series_id == series.id, Appointment.starts_at >= now, ~started)
+        .subquery()
+    )
+    db.query(Reminder).filter(Reminder.appointment_id.in_(discarded.select())).delete(synchronize_session=False)
+    db.query(Appointment).filter(Appointment.id.in_(discarded.select())).delete(synchronize_session=False)
+    notify(db, [series.user_id])
+
+
+def update_series(db: Session, series: AppointmentSeries, changes: dict, now: datetime = None) -> AppointmentSeries:
+    """Apply validated changes and re-materialize the series from now on.
+
+    Only this series' future, not yet reminded occurrences are replaced, and its cached
+    windows are invalidated by the version bump; past occurrences are left alone.
+    """
+    now = now or utcnow()
+    changes = {field: value for field, value in changes.items() if getattr(series, field) != value}
+    if not changes:
+        return series
+    for field, value in changes.items():
+        setattr(series, field, value)
+    series.version += 1
+    _discard_future_occurrences(db, series, now)
+    series.expanded_until = None
+    series.finished = False
+    expand_series(db, series, tenant_of(db, series.user_id), now)
+    db.commit()
+    return series
+
+
+def delete_series(db: Session, series: AppointmentSeries, now: datetime = None) -> None:
+    """Delete a series and its future, not yet reminded occurrences; past ones are kept."""
+    _discard_future_occurrences(db, series, now or utcnow())
+    db.query(Appointment).filter(Appointment.series_id == series.id).update(
+        {Appointment.series_id: None}, synchronize_session=False
+    )
+    db.delete(series)
+    db.commit()
@@ -0,0 +1,105 @@
+# Delivery statistics, kept as daily rollups per tenant and channel
+#
+# Delivery workers add each batch's outcomes to delivery_daily_rollups in the transaction
+# that records them, so dashboards read a few rollup rows instead of grouping the
+# reminders table. backfill_delivery_rollups rebuilds the rollups from the reminders.
+from collections import Counter
+from datetime import date, timedelta
+from sqlalchemy import Date, case, cast, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.db.models import DeliveryDailyRollup, Reminder
+
+ROLLUP_COUNTS = ("sent", "failed", "retried")
+
+
+def add_delivery_counts(db: Session, counts: dict) -> None:
+    """Add counts, {(tenant_id, day, channel): {"sent": n, ...}}, to the rollups in db's transaction.
+
+    One upsert per rollup row, in key order so concurrent workers lock rows in the
+    same order. The caller commits.
+    """
+    table = DeliveryDailyRollup.__table__
+    insert = postgresql.insert if db.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    for (tenant_id, day, channel), row in sorted(counts.items()):
+        values = {name: row.get(name, 0) for name in ROLLUP_COUNTS}
+        statement = insert(table).values(tenant_id=tenant_id, day=day, channel=channel, **values)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.tenant_id, table.c.day, table.c.channel],
+            set_={name: table.c[name] + statement.excluded[name] for name in ROLLUP_COUNTS},
+        ))
+
+
+def _utc_day(db: Session, column):
+    if db.get_bind().dialect.name == 'postgresql':
+        return cast(func.timezone('UTC', column), Date)
+    return func.date(column, type_=Date)  # SQLite stores UTC timestamps as text
+
+
+def backfill_delivery_rollups(db: Session, start: date = None, end: date = None) -> int:
+    """Rebuild the rollups of days in [start, end) (all days by default) from the reminders; return rows written.
+
+    Reminders do not keep a history of their attempts, so a reminder's retries are all
+    counted on the day it was sent or, otherwise, last due.
+    """
+    finished = Reminder.status.in_((Reminder.SENT, Reminder.FAILED))
+    day = _utc_day(db, case((Reminder.status == Reminder.SENT, Reminder.sent_at), else_=Reminder.due_at))
+    rows = (
+        select(
+            Reminder.tenant_id, day.label('day'), Reminder.channel,
+            func.sum(case((Reminder.status == Reminder.SENT, 1), else_=0)),
+            func.sum(case((Reminder.status == Reminder.FAILED, 1), else_=0)),
+            func.sum(case((finished, Reminder.attempts - 1), else_=Reminder.attempts)),
+        )
+        .where(Reminder.attempts > 0)
+        .group_by(Reminder.tenant_id, day, Reminder.channel)
+    )
+    stale = db.query(DeliveryDailyRollup)
+    if start is not None:
+        rows = rows.where(day >= start)
+        stale = stale.filter(DeliveryDailyRollup.day >= start)
+    if end is not None:
+        rows = rows.where(day < end)
+        stale = stale.filter(DeliveryDailyRollup.day < end)
+    stale.delete(synchronize_session=False)
+    table = DeliveryDailyRollup.__table__
+    written = db.execute(table.insert().from_select(
+        [table.c.tenant_id, table.c.day, table.c.channel, *(table.c[name] for name in ROLLUP_COUNTS)], rows
+    )).rowcount
+    db.commit()
+    return written
+
+
+def delivery_stats(db: Session, tenant_id: int, days: int, today: date) -> dict:
+    """Delivery counts of tenant_id for the days up to and including today (UTC), with totals.
+
+    Reads at most days rows per channel from the rollups, however much history there is.
+    """
+    start = today - timedelta(days=days - 1)
+    rollups = (
+        db.query(DeliveryDailyRollup)
+        .filter(DeliveryDailyRollup.tenant_id == tenant_id, DeliveryDailyRollup.day.between(start, today))
+        .all()
+    )
+    by_day = {start + timedelta(days=i): {} for i in range(days)}
+    totals, channels = Counter(), {}
+    for rollup in rollups:
+        counts = Counter({name: getattr(rollup, name) for name in ROLLUP_COUNTS})
+        by_day[rollup.day][rollup.channel] = counts
+        channels.setdefault(rollup.channel, Counter()).update(counts)
+        totals.update(counts)
+
+    def summary(counts):
+        return {name: counts[name] for name in ROLLUP_COUNTS}
+
+    return {
+        'start': start.isoformat(),
+        'end': today.isoformat(),
+        'totals': summary(totals),
+        'channels': {channel: summary(counts) for channel, counts in sorted(channels.items())},
+        'days': [
+            dict(summary(sum(by_channel.values(), Counter())), day=day.isoformat(),
+                 channels={channel: summary(counts) for channel, counts in sorted(by_channel.items())})
+            for day, by_channel in by_day.items()
+        ],
+    }
@@ -1,8 +1,19 @@
 # User CRUD operations
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import exc, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 # Remove this import: from passlib.context import CryptContext
 from app.db.models import User
-from app.core.security import get_password_hash # Import get_password_hash
+from app.core.security import get_password_hash, get_password_hashes # Import get_password_hash
+from app.core import config
+from app.core.hashing import HashingPoolFull
+from app.db import session as db_session
+from .pagination import Page, paginate
+
+# Sort key of the account listing, matching ix_users_created_at_id
+USER_ORDER = (User.created_at, User.id)
 
 # Remove this entire block (including the pwd_context definition and the two functions):
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -16,20 +27,161 @@ from app.core.security import get_password_hash # Import get_password_hash
 #     return pwd_context.verify(plain_password, hashed_password)
 
 
+def normalize_email(email: str) -> str:
+    """The form emails are compared in: addresses differing only in case are one account."""
+    return email.lower()
+
+
 def get_user_by_email(db: Session, email: str):
-    """Get user by email."""
-    return db.query(User).filter(User.email == email).first()
+    """Get user by email, ignoring case (served by the unique index on lower(email))."""
+    return db.query(User).filter(func.lower(User.email) == normalize_email(email)).first()
+
+
+def list_users(db: Session, limit: int, cursor: str = None) -> Page:
+    """A page of accounts, newest first; pass the page's next_cursor for the one after."""
+    return paginate(db.query(User), USER_ORDER, limit, cursor)
+
+
+def _insert_user_ignoring_conflict(db: Session, row: dict):
+    """Insert one user unless the email is taken (in any case); return the new id or None."""
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(User).values(row).on_conflict_do_nothing().returning(User.id)
+        return db.execute(statement).scalar()
+    if dialect == 'sqlite':
+        result = db.execute(sqlite.insert(User).values(row).on_conflict_do_nothing())
+        return result.lastrowid if result.rowcount else None
+    try:
+        with db.begin_nested():
+            return db.execute(insert(User).values(row)).inserted_primary_key[0]
+    except exc.IntegrityError:
+        return None
+
+
+def register_user(db: Session, email: str, name: str, password: str):
+    """Create a user with a single INSERT ... ON CONFLICT DO NOTHING; None if the email is taken.
+
+    There is no lookup first: the unique index on lower(email) decides, so of two concurrent
+    signups for one address exactly one succeeds. The returned User is built from the inserted
+    values rather than read back, and is not attached to the session.
+    """
+    row = {'email': email, 'name': name, 'hashed_password': get_password_hash(password), 'is_active': True}
+    user_id = _insert_user_ignoring_conflict(db, row)
+    db.commit()
+    return User(id=user_id, **row) if user_id is not None else None
+
+
+# Rows per INSERT statement, keeping well under Postgres' 65535 bind parameter limit
+BULK_INSERT_ROWS = 5000
+
+
+def _insert_users_ignoring_conflicts(db: Session, rows: list) -> dict:
+    """Insert rows, skipping emails that already exist; return {normalized email: id} for inserted rows."""
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        statement = (
+            postgresql.insert(User).values(rows)
+            .on_conflict_do_nothing()
+            .returning(User.id, User.email)
+        )
+        return {normalize_email(email): user_id for user_id, email in db.execute(statement)}
+    if dialect == 'sqlite':
+        db.execute(sqlite.insert(User).values(rows).on_conflict_do_nothing())
+    else:
+        db.execute(insert(User), rows)
+    # No RETURNING here, so read back the ids of the emails that were meant to be new
+    emails = [normalize_email(row['email']) for row in rows]
+    lookup = select(func.lower(User.email), User.id).where(func.lower(User.email).in_(emails))
+    return dict(db.execute(lookup).all())
 
 
-def create_user(db: Session, email: str, name: str, password: str):
-    """Create a new user."""
-    hashed_password = get_password_hash(password)
-    db_user = User(
-        email=email,
-        name=name,
-        hashed_password=hashed_password
+def create_users_bulk(db: Session, users: list) -> list:
+    """Create many users in one transaction and report what happened to each.
+
+    users is a list of dicts with email, name and password. Returns one dict per
+    input row, in order, with the email, a status of 'created', 'exists' (already
+    registered) or 'duplicate' (repeated in the input), and the id when created.
+    Emails are compared ignoring case.
+    Existing emails are found with one IN query, passwords are hashed in parallel
+    across the hashing pool, and rows are written with multi-row
+    INSERT ... ON CONFLICT DO NOTHING, so a concurrent signup is reported as
+    'exists' rather than failing the batch.
+    """
+    emails = [normalize_email(user['email']) for user in users]
+    existing = set(db.execute(
+        select(func.lower(User.email)).where(func.lower(User.email).in_(emails))
+    ).scalars()) if emails else set()
+
+    results, new_users, seen = [], [], set()
+    for user, email in zip(users, emails):
+        if email in existing:
+            results.append({'email': user['email'], 'status': 'exists'})
+        elif email in seen:
+            results.append({'email': user['email'], 'status': 'duplicate'})
+        else:
+            seen.add(email)
+            results.append({'email': user['email'], 'status': 'created'})
+            new_users.append(user)
+
+    hashed_passwords = get_password_hashes([user['password'] for user in new_users])
+    rows = [
+        {'email': user['email'], 'name': user['name'], 'hashed_password': hashed, 'is_active': True}
+        for user, hashed in zip(new_users, hashed_passwords)
+    ]
+    inserted = {}
+    for start in range(0, len(rows), BULK_INSERT_ROWS):
+        inserted.update(_insert_users_ignoring_conflicts(db, rows[start:start + BULK_INSERT_ROWS]))
+    db.commit()
+
+    for result in results:
+        if result['status'] == 'created':
+            if normalize_email(result['email']) in inserted:
+                result['id'] = inserted[normalize_email(result['email'])]
+            else:
+                # Registered by someone else between the IN query and the insert
+                result['status'] = 'exists'
+    return results
+
+
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    """Replace a user's stored password hash."""
+    db.query(User).filter(User.id == user_id).update(
+        {User.hashed_password: hashed_password}, synchronize_session=False
     )
-    db.add(db_user)
     db.commit()
-    db.refresh(db_user)
-    return db_user
\ No newline at end of file
+
+
+# Single background thread: rehashing is opportunistic and must not compete with logins
+_rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rehash")
+# Users with a rehash queued or running
+_rehash_pending = set()
+_rehash_lock = threading.Lock()
+
+
+def _rehash_password(user_id: int, password: str):
+    try:
+        hashed_password = get_password_hash(password)
+    except HashingPoolFull:
+        # Busy right now; the next successful login will try again
+        return
+    finally:
+        with _rehash_lock:
+            _rehash_pending.discard(user_id)
+    db = db_session.SessionLocal()
+    try:
+        update_password_hash(db, user_id, hashed_password)
+    finally:
+        db.close()
+
+
+def schedule_password_rehash(user_id: int, password: str):
+    """Rehash a password with the current settings and store it, off the request path.
+
+    Returns the job's future, or None when the user already has one queued or
+    REHASH_QUEUE_MAX are waiting; a later login schedules it again.
+    """
+    with _rehash_lock:
+        if user_id in _rehash_pending or len(_rehash_pending) >= config.REHASH_QUEUE_MAX:
+            return None
+        _rehash_pending.add(user_id)
+    return _rehash_executor.submit(_rehash_password, user_id, password)
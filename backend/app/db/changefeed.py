@@ -0,0 +1,231 @@
+# Change feed: announces committed changes to appointments and reminders, so schedulers
+# and clients wait for news instead of polling the database.
+#
+# Writers call notify(db, user_ids, due_at) inside their transaction; each commit then
+# sends one event. On Postgres the event is a NOTIFY issued by the transaction itself,
+# so it goes out exactly when (and only if) the changes become visible. Elsewhere it is
+# published after the commit over Redis pub/sub, or straight to this process's
+# subscribers without Redis. Events are hints: subscribers re-read the database.
+import json
+import select
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+import redis
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.core import config
+from app.core.redis_client import get_redis
+from .session import DATABASE_URL
+
+CHANNEL = "changes"
+# Users named in one NOTIFY, which must stay under Postgres' 8000-byte payload limit
+_USERS_PER_EVENT = 500
+
+# users: ids of the users whose appointments changed, None for everyone (e.g. after the
+# feed lost events); due_at: earliest due time of the reminders written, if any
+Change = namedtuple("Change", "users due_at")
+
+
+def notify(db: Session, user_ids, due_at: datetime = None) -> None:
+    """Announce, once db's transaction commits, that user_ids' appointments changed.
+
+    due_at is the earliest due time of any reminder written, so a sleeping scheduler can
+    tell whether it needs to wake up early. Calls in one transaction are merged.
+    """
+    if not db.in_transaction():
+        db.begin()  # So that a rollback, even with nothing flushed yet, drops what is staged
+    staged = db.info.setdefault("changes", {"users": set(), "due_at": None})
+    staged["users"].update(int(user_id) for user_id in user_ids)
+    if due_at is not None and (staged["due_at"] is None or due_at < staged["due_at"]):
+        staged["due_at"] = due_at
+
+
+def _encode(users, due_at) -> str:
+    if due_at is not None and due_at.tzinfo is None:
+        due_at = due_at.replace(tzinfo=timezone.utc)  # SQLite hands timestamps back naive
+    return json.dumps({"users": users, "due_at": due_at.isoformat() if due_at else None})
+
+
+def _decode(payload) -> Change:
+    data = json.loads(payload)
+    users = frozenset(data["users"]) if data.get("users") is not None else None
+    return Change(users, datetime.fromisoformat(data["due_at"]) if data.get("due_at") else None)
+
+
+def _payloads(staged) -> list:
+    users = sorted(staged["users"])
+    return [_encode(users[i:i + _USERS_PER_EVENT], staged["due_at"])
+            for i in range(0, max(len(users), 1), _USERS_PER_EVENT)]
+
+
+class Subscription:
+    """Changes for one subscriber, collected until it next waits."""
+
+    def __init__(self, feed, user_id: int = None):
+        self.user_id = user_id
+        self._feed = feed
+        self._changes = []
+        self._interrupted = False
+        self._ready = threading.Condition()
+
+    def deliver(self, change: Change) -> None:
+        if self.user_id is not None and change.users is not None and self.user_id not in change.users:
+            return
+        with self._ready:
+            self._changes.append(change)
+            self._ready.notify()
+
+    def wait(self, timeout: float) -> list:
+        """Changes since the last call, waiting up to timeout for the first; [] on timeout or interrupt."""
+        with self._ready:
+            if not self._changes and not self._interrupted:
+                self._ready.wait(timeout)
+            changes, self._changes = self._changes, []
+            self._interrupted = False
+            return changes
+
+    def interrupt(self) -> None:
+        """Wake a waiting subscriber without a change, e.g. to let it stop."""
+        with self._ready:
+            self._interrupted = True
+            self._ready.notify()
+
+    def close(self) -> None:
+        self._feed.unsubscribe(self)
+
+
+class ChangeFeed:
+    """Fans change events out to the subscribers in this process.
+
+    backend is "postgres" (LISTEN on the database), "redis" (pub/sub) or "local" (this
+    process only). A listener thread is started with the first subscription; when it
+    loses its connection it reconnects and tells every subscriber to re-read, since
+    events sent meanwhile are gone.
+    """
+
+    def __init__(self, backend: str, database_url: str = None, redis_client=None):
+        self.backend = backend
+        self.database_url = database_url
+        self._redis = redis_client
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self, user_id: int = None) -> Subscription:
+        """Subscribe to user_id's changes, or to all of them."""
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if self.backend != "local" and self._listener is None:
+                listen = self._listen_postgres if self.backend == "postgres" else self._listen_redis
+                self._listener = threading.Thread(target=self._listen_forever, args=(listen,),
+                                                  name="change-feed", daemon=True)
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def deliver(self, change: Change) -> None:
+        """Hand change to this process's subscribers."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.deliver(change)
+
+    def publish(self, payloads) -> None:
+        """Send committed changes over the non-Postgres backends (Postgres sends them with the commit)."""
+        if self.backend == "redis" and self._redis is not None:
+            try:
+                for payload in payloads:
+                    self._redis.publish(CHANNEL, payload)
+                return
+            except redis.RedisError:
+                pass  # Subscribers here still hear of it; others catch up on their idle timeout
+        for payload in payloads:
+            self.deliver(_decode(payload))
+
+    def _listen_forever(self, listen) -> None:
+        reconnecting = False
+
+        def on_connect():
+            if reconnecting:
+                self.deliver(Change(None, None))
+
+        while True:
+            try:
+                listen(on_connect)
+            except Exception as e:  # Keep listening whatever the connection did
+                print(f"Change feed listener lost its connection: {e}")
+            reconnecting = True
+            time.sleep(1)
+
+    def _listen_postgres(self, on_connect) -> None:
+        import psycopg2
+
+        url = make_url(self.database_url)
+        connection = psycopg2.connect(**url.translate_connect_args(username="user", database="dbname"))
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            on_connect()
+            while True:
+                if select.select([connection], [], [], 5) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    self.deliver(_decode(connection.notifies.pop(0).payload))
+        finally:
+            connection.close()
+
+    def _listen_redis(self, on_connect) -> None:
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(CHANNEL)
+            on_connect()
+            while True:
+                message = pubsub.get_message(timeout=5)
+                if message is not None:
+                    self.deliver(_decode(message["data"]))
+        finally:
+            pubsub.close()
+
+
+def _backend(database_url: str) -> str:
+    if config.CHANGE_FEED != "auto":
+        return config.CHANGE_FEED
+    if make_url(database_url).get_backend_name() == "postgresql":
+        return "postgres"
+    return "redis" if get_redis() is not None else "local"
+
+
+change_feed = ChangeFeed(_backend(DATABASE_URL), DATABASE_URL, get_redis())
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_in_transaction(session):
+    staged = session.info.get("changes")
+    if not staged or change_feed.backend != "postgres" or session.get_bind().dialect.name != "postgresql":
+        return
+    session.info.pop("changes")
+    for payload in _payloads(staged):
+        session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session):
+    staged = session.info.pop("changes", None)
+    if staged:
+        change_feed.publish(_payloads(staged))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard(session, previous_transaction):
+    # Also fires when nothing had been flushed; a savepoint's rollback leaves the rest standing
+    if not previous_transaction.nested:
+        session.info.pop("changes", None)
@@ -0,0 +1,252 @@
+# Versioned schema migrations, applied once per deploy:
+#
+#     python -m app.db.migrations
+#
+# Each migration runs once and is recorded in the schema_migrations table.
+# Web workers never issue DDL themselves.
+import sys
+import time
+from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, exc, func,
+                        inspect, select, text)
+from sqlalchemy.schema import CreateColumn
+from app.core import config
+from .session import Base, engine
+from .models import (Appointment, AppointmentSeries, DeliveryDailyRollup, ImportJob, Organization, OutboxEvent,
+                     Reminder, User)
+
+MIGRATIONS = []
+
+_versions = Table(
+    'schema_migrations', MetaData(),
+    Column('version', String, primary_key=True),
+    Column('description', String, nullable=False),
+    Column('applied_at', DateTime(timezone=True), server_default=func.now()),
+)
+
+# Arbitrary key so concurrent deploys serialize on the same Postgres advisory lock
+_LOCK_KEY = 7214
+
+
+def migration(version: str, description: str):
+    """Register a migration function taking a connection."""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def _create(conn, *tables):
+    # Creates tables as the models define them today. A migration that has been applied
+    # must keep doing what it did, so once a model changes, its change goes in a new
+    # migration and the tables of migrations written before it are frozen below.
+    Base.metadata.create_all(conn, tables=[table.__table__ for table in tables])
+
+
+# Tables as migrations 0001 and 0002 first created them, before later migrations added
+# to them; every difference from today's models is applied by a later migration
+_initial = MetaData()
+_users_0001 = Table(
+    'users', _initial,
+    Column('id', Integer, primary_key=True, index=True),
+    Column('email', String, unique=True, index=True, nullable=False),
+    Column('name', String, nullable=False),
+    Column('hashed_password', String, nullable=False),
+    Column('is_active', Boolean),
+    Column('created_at', DateTime(timezone=True), server_default=func.now()),
+    Column('updated_at', DateTime(timezone=True)),
+)
+_appointments_0002 = Table(
+    'appointments', _initial,
+    Column('id', Integer, primary_key=True, index=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True),
+    Column('title', String, nullable=False),
+    Column('starts_at', DateTime(timezone=True), nullable=False),
+    Column('client_name', String, nullable=False),
+    Column('client_email', String),
+    Column('client_phone', String),
+    Column('created_at', DateTime(timezone=True), server_default=func.now()),
+    Column('updated_at', DateTime(timezone=True)),
+)
+_reminders_0002 = Table(
+    'reminders', _initial,
+    Column('id', Integer, primary_key=True),
+    Column('appointment_id', Integer, ForeignKey('appointments.id', ondelete='CASCADE'), nullable=False, index=True),
+    Column('channel', String, nullable=False),
+    Column('recipient', String, nullable=False),
+    Column('due_at', DateTime(timezone=True), nullable=False),
+    Column('status', String, nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('lease_owner', String),
+    Column('lease_expires_at', DateTime(timezone=True)),
+    Column('sent_at', DateTime(timezone=True)),
+    Column('last_error', String),
+    Column('created_at', DateTime(timezone=True), server_default=func.now()),
+    Index('ix_reminders_status_due_at', 'status', 'due_at'),
+    Index('ix_reminders_status_lease_expires_at', 'status', 'lease_expires_at'),
+)
+
+
+def _add_column(conn, model, name):
+    # Tables created by an earlier migration from the current model already have the column
+    table = model.__table__
+    if name not in {column['name'] for column in inspect(conn).get_columns(table.name)}:
+        column_ddl = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column_ddl}'))
+
+
+@migration('0001', 'create users table')
+def _create_users(conn):
+    _initial.create_all(conn, tables=[_users_0001])
+
+
+@migration('0002', 'create appointments and reminders tables')
+def _create_reminders(conn):
+    _initial.create_all(conn, tables=[_appointments_0002, _reminders_0002])
+
+
+@migration('0003', 'create import_jobs table')
+def _create_import_jobs(conn):
+    _create(conn, ImportJob)
+
+
+@migration('0004', 'add users.is_admin')
+def _add_users_is_admin(conn):
+    _add_column(conn, User, 'is_admin')
+
+
+@migration('0005', 'case-insensitive unique index on users.email')
+def _index_users_email_lower(conn):
+    lowered = func.lower(User.email)
+    duplicates = conn.execute(
+        select(lowered).group_by(lowered).having(func.count() > 1).limit(20)
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"Accounts differ only in email case and must be merged first: {', '.join(duplicates)}")
+    # The case-sensitive unique index is replaced, not kept alongside: one index to maintain per insert
+    conn.execute(text('DROP INDEX IF EXISTS ix_users_email'))
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_users_email_lower ON users (lower(email))'))
+
+
+def _partition_reminders(conn, partitions: int):
+    # Rebuild reminders as a table hash-partitioned on tenant_id. The primary key has to
+    # include the partition key; ids stay unique because they still come from one sequence.
+    conn.execute(text('ALTER TABLE reminders RENAME TO reminders_unpartitioned'))
+    conn.execute(text(
+        'CREATE TABLE reminders (LIKE reminders_unpartitioned INCLUDING DEFAULTS) PARTITION BY HASH (tenant_id)'
+    ))
+    for remainder in range(partitions):
+        conn.execute(text(
+            f'CREATE TABLE reminders_p{remainder} PARTITION OF reminders'
+            f' FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        ))
+    conn.execute(text('INSERT INTO reminders SELECT * FROM reminders_unpartitioned'))
+    conn.execute(text('ALTER SEQUENCE reminders_id_seq OWNED BY reminders.id'))
+    # Dropping the old table frees its constraint and index names for the new one
+    conn.execute(text('DROP TABLE reminders_unpartitioned'))
+    conn.execute(text('ALTER TABLE reminders ADD CONSTRAINT reminders_pkey PRIMARY KEY (id, tenant_id)'))
+    conn.execute(text(
+        'ALTER TABLE reminders ADD CONSTRAINT reminders_appointment_id_fkey'
+        ' FOREIGN KEY (appointment_id) REFERENCES appointments (id) ON DELETE CASCADE'
+    ))
+    # Indexes on the parent cascade to every partition
+    for index in Reminder.__table__.indexes:
+        index.create(conn)
+
+
+@migration('0006', 'organizations, reminders.tenant_id and tenant-partitioned reminders')
+def _add_organizations(conn):
+    _create(conn, Organization)
+    _add_column(conn, User, 'organization_id')
+    _add_column(conn, Reminder, 'tenant_id')
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_users_organization_id ON users (organization_id)'))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_reminders_tenant_status_due_at ON reminders (tenant_id, status, due_at)'
+    ))
+    if conn.dialect.name != 'postgresql':
+        return
+    if not any(fk['referred_table'] == 'organizations' for fk in inspect(conn).get_foreign_keys('users')):
+        conn.execute(text(
+            'ALTER TABLE users ADD CONSTRAINT users_organization_id_fkey'
+            ' FOREIGN KEY (organization_id) REFERENCES organizations (id) ON DELETE SET NULL'
+        ))
+    partitioned = conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'reminders'::regclass"
+    )).scalar()
+    if not partitioned:
+        _partition_reminders(conn, config.REMINDER_PARTITIONS)
+
+
+@migration('0007', 'keyset pagination indexes on users and appointments')
+def _index_keyset_pagination(conn):
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_users_created_at_id ON users (created_at, id)'))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_appointments_user_created_at_id ON appointments (user_id, created_at, id)'
+    ))
+    # The composite index leads with user_id, so the single-column one is redundant
+    conn.execute(text('DROP INDEX IF EXISTS ix_appointments_user_id'))
+
+
+@migration('0008', 'recurring appointment series')
+def _add_appointment_series(conn):
+    _add_column(conn, Organization, 'timezone')
+    _create(conn, AppointmentSeries)
+    _add_column(conn, Appointment, 'series_id')
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_appointments_series_starts_at ON appointments (series_id, starts_at)'
+    ))
+    if conn.dialect.name != 'postgresql':
+        return
+    if not any(fk['referred_table'] == 'appointment_series' for fk in inspect(conn).get_foreign_keys('appointments')):
+        conn.execute(text(
+            'ALTER TABLE appointments ADD CONSTRAINT appointments_series_id_fkey'
+            ' FOREIGN KEY (series_id) REFERENCES appointment_series (id) ON DELETE SET NULL'
+        ))
+
+
+@migration('0009', 'create outbox_events table')
+def _create_outbox(conn):
+    _create(conn, OutboxEvent)
+
+
+@migration('0010', 'create delivery_daily_rollups table')
+def _create_delivery_rollups(conn):
+    # Backfill existing history with: python -m app.manage backfill-delivery-stats
+    _create(conn, DeliveryDailyRollup)
+
+
+def upgrade(bind=engine) -> list:
+    """Apply pending migrations in order and return their versions."""
+    applied_now = []
+    with bind.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': _LOCK_KEY})
+        _versions.create(conn, checkfirst=True)
+        applied = set(conn.execute(select(_versions.c.version)).scalars())
+        for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in applied:
+                continue
+            fn(conn)
+            conn.execute(_versions.insert().values(version=version, description=description))
+            applied_now.append(version)
+    return applied_now
+
+
+def wait_for_database(bind=engine, timeout: float = 60):
+    """Block until the database accepts connections or the timeout runs out."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with bind.connect() as conn:
+                conn.execute(text('SELECT 1'))
+            return
+        except exc.OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+
+
+if __name__ == '__main__':
+    wait_for_database()
+    versions = upgrade()
+    print(f"Applied migrations: {', '.join(versions)}" if versions else "Schema is up to date")
+    sys.exit(0)
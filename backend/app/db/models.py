@@ -1,23 +1,192 @@
 # SQLAlchemy models
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
-from sqlalchemy.sql import func
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, ForeignKey, Index, Text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import expression, func
 from .session import Base
 # Remove this: from passlib.hash import pbkdf2_sha256 # Import the hashing library
 # Remove this: from app.crud.user import pwd_context # We are now importing verify_password from security
-from app.core.security import verify_password # Import verify_password
+from app.core.security import check_password_hash, PasswordCheck
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class Organization(Base):
+    __tablename__ = "organizations"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    # Reminder sends per minute across the organization; NULL uses TENANT_REMINDERS_PER_MINUTE
+    reminders_per_minute = Column(Integer)
+    # IANA time zone recurring series of its members default to
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, nullable=False)
     name = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    is_admin = Column(Boolean, nullable=False, default=False, server_default=expression.false())
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="SET NULL"), index=True)
+    # Keyset pagination compares created_at; the app-side default gives every row written through
+    # SQLAlchemy the same stored form (SQLite's CURRENT_TIMESTAMP drops fractional seconds)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    def check_password(self, password: str) -> bool:
-        """Check if the provided password matches the hashed password using the application's password context."""
-        # Change this line to use verify_password from security.py
-        return verify_password(password, self.hashed_password)
\ No newline at end of file
+    __table_args__ = (
+        # One account per address regardless of case; lookups compare lower(email)
+        Index("uq_users_email_lower", func.lower(email), unique=True),
+        # Keyset pagination of the account listing, newest first
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
+
+    def check_password(self, password: str) -> PasswordCheck:
+        """Check if the provided password matches the hashed password using the application's password context.
+
+        The result is truthy when the password matches; its needs_update flag tells the caller
+        the stored hash uses an outdated scheme or cost and should be replaced.
+        """
+        return check_password_hash(password, self.hashed_password)
+
+
+class Appointment(Base):
+    __tablename__ = "appointments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String, nullable=False)
+    starts_at = Column(DateTime(timezone=True), nullable=False)
+    client_name = Column(String, nullable=False)
+    client_email = Column(String)
+    client_phone = Column(String)
+    # The recurring series this is an occurrence of, if any
+    series_id = Column(Integer, ForeignKey("appointment_series.id", ondelete="SET NULL"))
+    # App-side default as on users.created_at, for keyset pagination
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    reminders = relationship("Reminder", back_populates="appointment", passive_deletes=True)
+
+    __table_args__ = (
+        # A user's appointments, newest first, paged by keyset; also serves plain user_id lookups
+        Index("ix_appointments_user_created_at_id", "user_id", "created_at", "id"),
+        # An occurrence is materialized once however often its series is expanded
+        Index("uq_appointments_series_starts_at", "series_id", "starts_at", unique=True),
+    )
+
+
+class AppointmentSeries(Base):
+    """A recurring appointment; occurrences become appointments shortly before they are due."""
+    __tablename__ = "appointment_series"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    title = Column(String, nullable=False)
+    client_name = Column(String, nullable=False)
+    client_email = Column(String)
+    client_phone = Column(String)
+    # First occurrence, as wall time in `timezone`; every occurrence keeps its time of day
+    starts_at_local = Column(DateTime, nullable=False)
+    timezone = Column(String, nullable=False)
+    # RRULE subset, see app.core.recurrence
+    rrule = Column(String, nullable=False)
+    # Occurrences before this (UTC) have been materialized; NULL before the first expansion
+    expanded_until = Column(DateTime(timezone=True))
+    # Set once the rule has no occurrences left to materialize
+    finished = Column(Boolean, nullable=False, default=False, server_default=expression.false())
+    # Bumped whenever the occurrences change; part of the occurrence cache key
+    version = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # The expander's scan for series whose materialized window needs topping up
+        Index("ix_appointment_series_finished_expanded_until", "finished", "expanded_until"),
+    )
+
+
+class Reminder(Base):
+    __tablename__ = "reminders"
+
+    # Lifecycle: pending -> claimed (leased by a scheduler) -> sent / failed
+    PENDING = "pending"
+    CLAIMED = "claimed"
+    SENT = "sent"
+    FAILED = "failed"
+
+    id = Column(Integer, primary_key=True)
+    appointment_id = Column(Integer, ForeignKey("appointments.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Owner's organization id, 0 for accounts outside any organization; the partition key on Postgres
+    tenant_id = Column(Integer, nullable=False, default=0, server_default="0")
+    channel = Column(String, nullable=False)
+    recipient = Column(String, nullable=False)
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    status = Column(String, nullable=False, default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(String)
+    lease_expires_at = Column(DateTime(timezone=True))
+    sent_at = Column(DateTime(timezone=True))
+    last_error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    appointment = relationship("Appointment", back_populates="reminders")
+
+    __table_args__ = (
+        # Due lookups filter on status equality and range-scan due_at, so status leads
+        Index("ix_reminders_status_due_at", "status", "due_at"),
+        Index("ix_reminders_status_lease_expires_at", "status", "lease_expires_at"),
+        # Per-tenant due probes and claims for fair scheduling
+        Index("ix_reminders_tenant_status_due_at", "tenant_id", "status", "due_at"),
+    )
+
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    id = Column(String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    format = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=RUNNING)
+    rows_total = Column(Integer, nullable=False, default=0)
+    rows_imported = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    # JSON list of {"row": n, "error": "..."}, capped at IMPORT_MAX_ERRORS entries
+    errors = Column(Text, nullable=False, default="[]")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+
+class OutboxEvent(Base):
+    """A message committed with the change it announces, relayed to its queue afterwards."""
+    __tablename__ = "outbox_events"
+
+    # Relayed in id order and deleted once on the queue, so the table stays small
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class DeliveryDailyRollup(Base):
+    """Reminder delivery outcomes per tenant, UTC day and channel, counted as they happen."""
+    __tablename__ = "delivery_daily_rollups"
+
+    # Same tenant ids as Reminder.tenant_id; the key serves a tenant's day range directly
+    tenant_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    channel = Column(String, primary_key=True)
+    sent = Column(Integer, nullable=False, default=0, server_default="0")
+    # Attempts that gave up for good, and attempts that failed and were rescheduled
+    failed = Column(Integer, nullable=False, default=0, server_default="0")
+    retried = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,80 @@
+# Connection pool instrumentation
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Checkout latency, overflow and wait counts for the connection pool.
+
+    Listeners registered with add_listener are called after every checkout with
+    (seconds, waited, overflowed) so exporters can feed their own histograms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._checkouts = 0
+            self._waits = 0
+            self._overflows = 0
+            self._timeouts = 0
+            self._latency_total = 0.0
+            self._latency_max = 0.0
+
+    def add_listener(self, listener):
+        """Register a callable(seconds, waited, overflowed) run after each checkout."""
+        self._listeners.append(listener)
+
+    def observe(self, seconds: float, waited: bool, overflowed: bool):
+        with self._lock:
+            self._checkouts += 1
+            self._waits += waited
+            self._overflows += overflowed
+            self._latency_total += seconds
+            self._latency_max = max(self._latency_max, seconds)
+        for listener in self._listeners:
+            listener(seconds, waited, overflowed)
+
+    def observe_timeout(self):
+        with self._lock:
+            self._timeouts += 1
+
+    def stats(self) -> dict:
+        """Snapshot of the counters for this process."""
+        with self._lock:
+            return {
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "overflows": self._overflows,
+                "timeouts": self._timeouts,
+                "checkout_seconds_total": self._latency_total,
+                "checkout_seconds_max": self._latency_max,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout took and whether it had to wait."""
+
+    def _do_get(self):
+        # Mirrors QueuePool._do_get: a checkout blocks when nothing is idle and overflow is used up
+        saturated = self._max_overflow > -1 and self._overflow >= self._max_overflow
+        waited = saturated and self.checkedin() == 0
+        overflow_before = self._overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.observe_timeout()
+            raise
+        # _overflow counts up from -pool_size, so only positive growth is a connection beyond pool_size
+        overflowed = self._overflow > max(overflow_before, 0)
+        pool_metrics.observe(time.perf_counter() - start, waited, overflowed)
+        return connection
@@ -0,0 +1,124 @@
+# Read/write splitting: read-only statements go to a healthy replica, everything else to the primary
+import itertools
+import threading
+import time
+from sqlalchemy import exc, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+_POSTGRES_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def replication_lag(engine) -> float:
+    """Seconds the replica is behind its primary; 0 for databases without replication (SQLite)."""
+    if engine.dialect.name != 'postgresql':
+        return 0.0
+    with engine.connect() as conn:
+        return float(conn.execute(_POSTGRES_LAG).scalar() or 0)
+
+
+class ReplicaSet:
+    """Replica engines, handed out round-robin among those lagging at most `max_lag` seconds.
+
+    Lag is measured lazily, at most once per `check_interval` per replica; a replica that
+    cannot be reached counts as infinitely behind until its next check.
+    """
+
+    def __init__(self, engines, max_lag: float, check_interval: float, probe=replication_lag):
+        self.engines = list(engines)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.probe = probe
+        self._lag = {}
+        self._checked_at = {}
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(range(len(self.engines)))
+
+    def lag(self, index: int) -> float:
+        now = time.monotonic()
+        checked_at = self._checked_at.get(index)
+        if checked_at is None or now - checked_at >= self.check_interval:
+            # Mark first, so threads arriving during a slow probe use the last known lag
+            # (the primary, before the first probe) instead of probing again
+            self._checked_at[index] = now
+            try:
+                self._lag[index] = self.probe(self.engines[index])
+            except exc.DBAPIError as e:
+                print(f"Replica {index} unavailable, reading from the primary: {e}")
+                self._lag[index] = float('inf')
+        return self._lag.get(index, float('inf'))
+
+    def choose(self):
+        """A replica within the lag threshold, or None when every replica is behind or down."""
+        with self._lock:
+            start = next(self._cycle)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self.lag(index) <= self.max_lag:
+                return self.engines[index]
+        return None
+
+    def stats(self) -> dict:
+        return {str(engine.url.render_as_string(hide_password=True)): self._lag.get(index)
+                for index, engine in enumerate(self.engines)}
+
+    def dispose(self, close: bool = True) -> None:
+        for engine in self.engines:
+            engine.dispose(close=close)
+
+
+def _is_write(clause) -> bool:
+    if isinstance(clause, (UpdateBase, TextClause)):
+        # INSERT/UPDATE/DELETE, and raw SQL whose intent cannot be told
+        return True
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    """Session that sends read-only statements to a replica and writes to the primary.
+
+    Once the session flushes or runs a write it stays on the primary, so a request reads its
+    own writes. The replica is chosen once per transaction.
+    """
+
+    def __init__(self, replicas: ReplicaSet = None, **kwargs):
+        super().__init__(**kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper, clause, **kwargs)
+        if self.replicas is None or self.info.get('primary'):
+            return primary
+        if self._flushing or _is_write(clause):
+            self.info['primary'] = True
+            return primary
+        if 'replica' not in self.info:
+            self.info['replica'] = self.replicas.choose()
+        if self.info['replica'] is None:
+            return primary
+        self.info['read_from_replica'] = True
+        return self.info['replica']
+
+    def commit(self):
+        super().commit()
+        self.info.pop('replica', None)
+
+    def rollback(self):
+        super().rollback()
+        self.info.pop('replica', None)
+
+
+def use_primary(db: Session) -> Session:
+    """Send the rest of this session's statements to the primary; returns the session."""
+    db.info['primary'] = True
+    return db
+
+
+def read_from_replica(db: Session) -> bool:
+    """Whether any statement of this session has been served by a replica."""
+    return bool(db.info.get('read_from_replica'))
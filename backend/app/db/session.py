@@ -1,17 +1,48 @@
 # Database session handling 
 import os
+from flask import g
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.core import config
+from .pool import InstrumentedQueuePool
+from .routing import ReplicaSet, RoutingSession
 
 # Get database URL from environment variable
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://user:password@db:5432/app_db')
 
+
+def engine_options(url: str) -> dict:
+    """Build create_engine keyword arguments for url from the DB_* settings."""
+    if make_url(url).get_backend_name() == 'sqlite':
+        # SQLite picks its own pool class; sizing options do not apply
+        return {}
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.DB_POOL_SIZE,
+        'max_overflow': config.DB_MAX_OVERFLOW,
+        'pool_timeout': config.DB_POOL_TIMEOUT,
+        'pool_recycle': config.DB_POOL_RECYCLE,
+        'pool_pre_ping': config.DB_POOL_PRE_PING,
+    }
+    if config.DB_STATEMENT_TIMEOUT_MS and make_url(url).get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}'}
+    return options
+
+
 # Create engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Read replicas (none unless DATABASE_REPLICA_URLS is set)
+replicas = ReplicaSet(
+    [create_engine(url, **engine_options(url)) for url in config.DATABASE_REPLICA_URLS],
+    config.REPLICA_MAX_LAG_SECONDS,
+    config.REPLICA_LAG_CHECK_SECONDS,
+) if config.DATABASE_REPLICA_URLS else None
+
+# Create session factory; reads are routed to the replicas when there are any
+SessionLocal = sessionmaker(class_=RoutingSession, replicas=replicas, autocommit=False, autoflush=False, bind=engine)
 
 # Create base class for models
 Base = declarative_base()
@@ -23,4 +54,26 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+def get_session():
+    """Get the session for the current app context, opening it on first use."""
+    if 'db_session' not in g:
+        g.db_session = SessionLocal()
+    return g.db_session
+
+
+def close_session(exc=None):
+    """Return the app context's session (if any) to the pool."""
+    db = g.pop('db_session', None)
+    if db is not None:
+        if exc is not None:
+            db.rollback()
+        db.close()
+
+
+def init_app(app):
+    """Close the request's session when the request or app context ends."""
+    app.teardown_request(close_session)
+    app.teardown_appcontext(close_session)
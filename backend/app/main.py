@@ -2,18 +2,45 @@ import flask
 # from flask import Flask
 from app.routes import api_bp
 from app.api.v1 import api_v1
-from flask_jwt_extended import JWTManager # Import JWTManager
+from app.core import compression, metrics, serialization
+from app.core.hashing import HashingPoolFull
+from app.core.profiling import request_profiler
+from app.core.security import init_password_hashing
+from app.core.tokens import CachingJWTManager
+from app.db import session as db_session
 
 app = flask.Flask(__name__)
 
+# Settle the bcrypt cost before serving (calibrated when HASH_TIME_BUDGET_MS is set)
+init_password_hashing()
+
 # Configure JWTManager
 app.config["JWT_SECRET_KEY"] = "super-secret"  # Change this in production!
-jwt = JWTManager(app)
+jwt = CachingJWTManager(app)
+
+# One database session per request, returned to the pool on teardown
+db_session.init_app(app)
+
+# /metrics with per-route latency and hot-path spans; opt-in request profiling
+metrics.init_app(app)
+request_profiler.init_app(app)
+
+# orjson-backed JSON, and brotli/gzip for larger responses
+serialization.init_app(app)
+compression.init_app(app)
 
 @app.route("/")
 def read_root():
     return {"Hello": "World"}
 
+@app.errorhandler(HashingPoolFull)
+def handle_hashing_pool_full(e):
+    # Shed load instead of queueing logins behind a saturated hashing pool
+    response = flask.jsonify({'error': 'Server is busy, please retry shortly.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 app.register_blueprint(api_bp)
 app.register_blueprint(api_v1)
 
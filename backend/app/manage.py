@@ -0,0 +1,62 @@
+# Administrative commands:
+#
+#     python -m app.manage promote-admin <email>
+#     python -m app.manage backfill-delivery-stats [<first day> [<day after the last>]]
+import sys
+from datetime import date
+from app.db.session import SessionLocal
+from app.crud.stats import backfill_delivery_rollups
+from app.crud.user import get_user_by_email
+
+
+def promote_admin(email: str) -> bool:
+    """Grant administrator access to the user with email; False if there is none."""
+    db = SessionLocal()
+    try:
+        user = get_user_by_email(db, email)
+        if user is None:
+            return False
+        user.is_admin = True
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def backfill_delivery_stats(start: str = None, end: str = None) -> int:
+    """Rebuild the delivery rollups of days (YYYY-MM-DD) in [start, end), or of all days; return rows written."""
+    db = SessionLocal()
+    try:
+        return backfill_delivery_rollups(db, date.fromisoformat(start) if start else None,
+                                         date.fromisoformat(end) if end else None)
+    finally:
+        db.close()
+
+
+def _promote_admin(email):
+    if not promote_admin(email):
+        sys.exit(f"No user with email {email}")
+    print("Done")
+
+
+def _backfill_delivery_stats(start=None, end=None):
+    try:
+        written = backfill_delivery_stats(start, end)
+    except ValueError as e:
+        sys.exit(f"Invalid day: {e}")
+    print(f"Wrote {written} rollup rows")
+
+
+# name: (run, usage of its arguments, how many it takes)
+COMMANDS = {
+    'promote-admin': (_promote_admin, '<email>', (1, 1)),
+    'backfill-delivery-stats': (_backfill_delivery_stats, '[<YYYY-MM-DD> [<YYYY-MM-DD>]]', (0, 2)),
+}
+
+
+if __name__ == '__main__':
+    name, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else (None, [])
+    if name not in COMMANDS or not COMMANDS[name][2][0] <= len(args) <= COMMANDS[name][2][1]:
+        sys.exit('Usage:\n' + '\n'.join(f'  python -m app.manage {command} {usage}'
+                                        for command, (_, usage, _) in COMMANDS.items()))
+    COMMANDS[name][0](*args)
@@ -0,0 +1,73 @@
+# Validation for appointment payloads
+import re
+from datetime import datetime, timezone
+from app.core.recurrence import get_zone, parse_rrule
+
+APPOINTMENT_FIELDS = ('title', 'starts_at', 'client_name', 'client_email', 'client_phone')
+SERIES_FIELDS = ('title', 'starts_at', 'timezone', 'rrule', 'client_name', 'client_email', 'client_phone')
+
+_EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_PHONE_PATTERN = re.compile(r'^\+?[0-9 ()-]{6,20}$')
+
+
+def parse_datetime(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp; values without an offset are taken as UTC."""
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _check_contacts(values: dict) -> None:
+    if not values['client_email'] and not values['client_phone']:
+        raise ValueError('Either client_email or client_phone is required')
+    if values['client_email'] and not _EMAIL_PATTERN.match(values['client_email']):
+        raise ValueError('Invalid email format')
+    if values['client_phone'] and not _PHONE_PATTERN.match(values['client_phone']):
+        raise ValueError('Invalid phone format')
+
+
+def parse_appointment(data: dict) -> dict:
+    """Validate an appointment payload and return its normalized fields.
+
+    Raises ValueError with a client-facing message when the payload is invalid.
+    """
+    values = {field: (str(data.get(field) or '')).strip() or None for field in APPOINTMENT_FIELDS}
+    for field in ('title', 'starts_at', 'client_name'):
+        if not values[field]:
+            raise ValueError(f'Missing required field: {field}')
+    _check_contacts(values)
+    try:
+        values['starts_at'] = parse_datetime(values['starts_at'])
+    except ValueError:
+        raise ValueError('Invalid starts_at, expected an ISO 8601 timestamp')
+    return values
+
+
+def parse_series(data: dict, current: dict = None) -> dict:
+    """Validate a recurring series payload and return its fields as stored on AppointmentSeries.
+
+    starts_at is the first occurrence as local wall time (no offset) in timezone, which
+    defaults to the organization's. With current (the series' fields, by payload name),
+    data is a partial update and only the fields it holds are returned.
+    """
+    given = {
+        field: (str(data.get(field) or '')).strip() or None
+        for field in SERIES_FIELDS if current is None or field in data
+    }
+    values = dict(current or {}, **given)
+    required = ('title', 'starts_at', 'rrule', 'client_name') + (('timezone',) if current is not None else ())
+    for field in required:
+        if not values.get(field):
+            raise ValueError(f'Missing required field: {field}')
+    _check_contacts(values)
+    if isinstance(values['starts_at'], str):
+        try:
+            values['starts_at'] = datetime.fromisoformat(values['starts_at'])
+        except ValueError:
+            raise ValueError('Invalid starts_at, expected an ISO 8601 local time') from None
+        if values['starts_at'].tzinfo is not None:
+            raise ValueError('starts_at is a local time in timezone and takes no offset')
+    zone = get_zone(values['timezone']) if values['timezone'] else None
+    parse_rrule(values['rrule'], zone)
+    return {('starts_at_local' if field == 'starts_at' else field): values[field] for field in given}
@@ -0,0 +1,228 @@
+# Reminder delivery workers: pull batches from the delivery queue and send them.
+#
+#     python -m app.workers.delivery
+#
+# Without REDIS_URL the queue is in-process, so a scheduler runs in this process too.
+import random
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import redis
+from sqlalchemy import exc
+from app.core import config
+from app.core.cache import response_cache
+from app.core.redis_client import get_blocking_redis, get_redis
+from app.core.idempotency import DONE, IdempotencyStore
+from app.crud.outbox import REMINDER_TOPIC
+from app.crud.reminder import utcnow
+from app.crud.stats import add_delivery_counts
+from app.db import session as db_session
+from app.db.changefeed import change_feed, notify
+from app.db.models import Reminder
+from .outbox import OutboxRelay
+from .queue import DeliveryQueue
+from .transports import HTTPTransport, SMTPTransport, TransportError
+
+
+def reminder_queue() -> DeliveryQueue:
+    return DeliveryQueue("reminders", get_blocking_redis())
+
+
+def dead_letter_queue() -> DeliveryQueue:
+    return DeliveryQueue("reminders-dead", get_blocking_redis())
+
+
+def reminder_relay(queue: DeliveryQueue) -> OutboxRelay:
+    """Relay of reminder delivery messages from the outbox onto queue."""
+    return OutboxRelay({REMINDER_TOPIC: queue})
+
+
+def backoff_seconds(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff, so retries of one burst do not land together."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def record_outcomes(outcomes, max_attempts: int, dead_letters: DeliveryQueue = None):
+    """Store delivery outcomes in one transaction: sent, rescheduled with backoff, or failed.
+
+    The day's delivery rollups are updated in the same transaction.
+    """
+    now = utcnow()
+    sent, updates, dead = [], [], []
+    outcome_of = {}
+    for message, error in outcomes:
+        attempts = message["attempts"] + 1
+        if error is None:
+            sent.append(message["id"])
+        elif error.retryable and attempts < max_attempts:
+            outcome_of[message["id"]] = "retried"
+            delay = backoff_seconds(attempts, config.DELIVERY_BACKOFF_BASE_SECONDS, config.DELIVERY_BACKOFF_MAX_SECONDS)
+            updates.append({
+                "id": message["id"], "status": Reminder.PENDING, "attempts": attempts,
+                "due_at": now + timedelta(seconds=delay), "last_error": str(error),
+                "lease_owner": None, "lease_expires_at": None,
+            })
+        else:
+            outcome_of[message["id"]] = "failed"
+            updates.append({
+                "id": message["id"], "status": Reminder.FAILED, "attempts": attempts,
+                "last_error": str(error), "lease_owner": None, "lease_expires_at": None,
+            })
+            dead.append(dict(message, attempts=attempts, error=str(error)))
+
+    db = db_session.SessionLocal()
+    try:
+        # Locked, so a duplicate recorded concurrently waits and then sees these as sent
+        rows = (
+            db.query(Reminder.id, Reminder.tenant_id, Reminder.channel, Reminder.status)
+            .filter(Reminder.id.in_([message["id"] for message, _ in outcomes]))
+            .with_for_update()
+            .all()
+        )
+        # A duplicate reporting on a reminder that is (or is now being) sent changes nothing
+        # and is not counted again: a failed duplicate must not undo the send
+        sent_now = set(sent)
+        done = {reminder_id for reminder_id, _, _, status in rows if status == Reminder.SENT} | sent_now
+        updates = [update for update in updates if update["id"] not in done]
+        dead = [message for message in dead if message["id"] not in done]
+        counts = defaultdict(Counter)
+        for reminder_id, tenant_id, channel, status in rows:
+            if status != Reminder.SENT:
+                outcome = "sent" if reminder_id in sent_now else outcome_of[reminder_id]
+                counts[tenant_id, now.date(), channel][outcome] += 1
+        if sent:
+            db.query(Reminder).filter(Reminder.id.in_(sent), Reminder.status != Reminder.SENT).update(
+                {Reminder.status: Reminder.SENT, Reminder.sent_at: now, Reminder.attempts: Reminder.attempts + 1,
+                 Reminder.lease_owner: None, Reminder.lease_expires_at: None},
+                synchronize_session=False,
+            )
+        if updates:
+            db.bulk_update_mappings(Reminder, updates)
+        add_delivery_counts(db, counts)
+        # Owners see the new statuses; a scheduler wakes for the earliest retry
+        retries = [update["due_at"] for update in updates if "due_at" in update]
+        notify(db, {message["user_id"] for message, _ in outcomes}, min(retries, default=None))
+        db.commit()
+    finally:
+        db.close()
+    # Reminder statuses show up in the owners' appointment listings
+    response_cache.invalidate(*{message["user_id"] for message, _ in outcomes if "user_id" in message})
+    if dead and dead_letters is not None:
+        dead_letters.push(dead)
+
+
+class DeliveryWorker:
+    """Send queued reminders in batches, with a concurrency cap per transport.
+
+    Messages carrying an idempotency key are sent at most once however often they are
+    queued: relays and re-claims may duplicate them, so workers can retry freely.
+    """
+
+    def __init__(self, queue: DeliveryQueue, transports: dict, dead_letters: DeliveryQueue = None,
+                 batch_size: int = config.DELIVERY_BATCH_SIZE, max_attempts: int = config.DELIVERY_MAX_ATTEMPTS,
+                 record=record_outcomes, idempotency: IdempotencyStore = None):
+        self.queue = queue
+        self.idempotency = idempotency if idempotency is not None else IdempotencyStore("deliveries", get_redis())
+        self.transports = transports
+        self.dead_letters = dead_letters
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.record = record
+        # One bounded executor per provider: a slow SMS API cannot starve email sends
+        self._executors = {
+            channel: ThreadPoolExecutor(max_workers=transport.concurrency, thread_name_prefix=f"send-{channel}")
+            for channel, transport in transports.items()
+        }
+        self._stop = threading.Event()
+
+    def deliver(self, messages) -> list:
+        """Send messages concurrently and return (message, error or None) pairs.
+
+        A message whose idempotency key is done is reported as sent without sending it
+        again; one whose key another worker holds is left to that worker.
+        """
+        keyed = [message for message in messages if message.get("idempotency_key")]
+        states = dict(zip(map(id, keyed), self.idempotency.begin(m["idempotency_key"] for m in keyed)))
+        claimed = {id(message) for message in keyed if states[id(message)] is None}
+        pending = []
+        outcomes = []
+        for message in messages:
+            state = states.get(id(message))
+            if state == DONE:
+                outcomes.append((message, None))
+                continue
+            if state is not None:
+                continue
+            executor = self._executors.get(message["channel"])
+            if executor is None:
+                error = TransportError(f"No transport configured for {message['channel']}", retryable=False)
+                outcomes.append((message, error))
+            else:
+                pending.append((message, executor.submit(self.transports[message["channel"]].send, message)))
+        for message, future in pending:
+            try:
+                future.result()
+                outcomes.append((message, None))
+            except TransportError as e:
+                outcomes.append((message, e))
+        # Failed sends release their key, so the retry may send
+        self.idempotency.finish(m["idempotency_key"] for m, error in outcomes if id(m) in claimed and error is None)
+        self.idempotency.abandon(m["idempotency_key"] for m, error in outcomes if id(m) in claimed and error is not None)
+        return outcomes
+
+    def run_once(self, timeout: float = 1.0) -> int:
+        """Deliver one batch from the queue; return how many messages it held."""
+        messages = self.queue.pop_batch(self.batch_size, timeout)
+        if messages:
+            self.record(self.deliver(messages), self.max_attempts, self.dead_letters)
+        return len(messages)
+
+    def run(self):
+        """Loop until stop() is called, riding out Redis and database outages with a growing pause."""
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                failures = 0
+            except (redis.RedisError, exc.DBAPIError) as e:
+                # The pass's session was rolled back and closed on the way out
+                failures += 1
+                print(f"Delivery worker pass failed, retrying: {e}")
+                self._stop.wait(min(2 ** (failures - 1), config.WORKER_ERROR_BACKOFF_MAX_SECONDS))
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        for executor in self._executors.values():
+            executor.shutdown()
+        for transport in self.transports.values():
+            transport.close()
+
+
+def configured_transports() -> dict:
+    """Build the transports that have settings in the environment."""
+    transports = {}
+    if config.SMTP_HOST:
+        transports["email"] = SMTPTransport(
+            config.SMTP_HOST, config.SMTP_PORT, config.SMTP_SENDER, concurrency=config.SMTP_CONCURRENCY
+        )
+    if config.SMS_API_URL:
+        transports["sms"] = HTTPTransport(
+            config.SMS_API_URL, concurrency=config.SMS_CONCURRENCY, token=config.SMS_API_TOKEN
+        )
+    return transports
+
+
+if __name__ == '__main__':
+    from .scheduler import Scheduler
+
+    queue = reminder_queue()
+    worker = DeliveryWorker(queue, configured_transports(), dead_letter_queue())
+    if get_redis() is None:
+        threading.Thread(target=Scheduler(relay=reminder_relay(queue), feed=change_feed).run, daemon=True).start()
+    try:
+        worker.run()
+    finally:
+        worker.close()
@@ -0,0 +1,54 @@
+# Outbox relay: moves committed outbox events onto their queues.
+#
+#     python -m app.workers.outbox
+#
+# Schedulers relay the events of their own claims straight after committing them, and
+# pick up whatever an earlier relay left behind; a standalone relay is only needed to
+# drain the outbox while no scheduler runs.
+import threading
+from app.core import config
+from app.crud.outbox import relay_outbox
+from app.db import session as db_session
+
+
+class OutboxRelay:
+    """Publish outbox events to queues[topic], a batch per transaction."""
+
+    def __init__(self, queues: dict, batch_size: int = config.OUTBOX_BATCH_SIZE):
+        self.queues = queues
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+
+    def publish(self, topic: str, messages: list) -> None:
+        self.queues[topic].push(messages)
+
+    def run_once(self) -> int:
+        """Relay one batch; return how many events it held."""
+        db = db_session.SessionLocal()
+        try:
+            return relay_outbox(db, self.publish, self.batch_size)
+        finally:
+            db.close()
+
+    def drain(self) -> int:
+        """Relay batches until the outbox is empty; return how many events went out."""
+        relayed = 0
+        while True:
+            count = self.run_once()
+            relayed += count
+            if count < self.batch_size:
+                return relayed
+
+    def run(self, poll_interval: float = config.SCHEDULER_POLL_INTERVAL_MS / 1000):
+        while not self._stop.is_set():
+            if self.drain() == 0:
+                self._stop.wait(poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == '__main__':
+    from .delivery import reminder_relay, reminder_queue
+
+    reminder_relay(reminder_queue()).run()
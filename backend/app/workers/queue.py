@@ -0,0 +1,54 @@
+# Message queue between the reminder scheduler and the delivery workers
+import collections
+import json
+import threading
+
+
+class DeliveryQueue:
+    """FIFO of JSON messages kept in a Redis list, or in-process without a client.
+
+    The in-process mode only connects producers and consumers in the same
+    process (tests, benchmarks, single-process setups). pop_batch blocks on the
+    client, so give it one whose socket timeout exceeds the pop timeout (see
+    get_blocking_redis).
+    """
+
+    def __init__(self, name: str, redis_client=None):
+        self.name = name
+        self._key = f"queue:{name}"
+        self._redis = redis_client
+        self._local = collections.deque()
+        self._not_empty = threading.Condition()
+
+    def push(self, messages):
+        """Append messages to the tail of the queue."""
+        payloads = [json.dumps(message) for message in messages]
+        if not payloads:
+            return
+        if self._redis is not None:
+            self._redis.lpush(self._key, *payloads)
+            return
+        with self._not_empty:
+            self._local.extend(payloads)
+            self._not_empty.notify_all()
+
+    def pop_batch(self, max_items: int, timeout: float = 1.0) -> list:
+        """Take up to max_items messages, waiting up to timeout for the first one."""
+        if self._redis is not None:
+            first = self._redis.brpop(self._key, timeout=timeout)
+            if first is None:
+                return []
+            payloads = [first[1]]
+            if max_items > 1:
+                payloads += self._redis.rpop(self._key, max_items - 1) or []
+        else:
+            with self._not_empty:
+                if not self._local:
+                    self._not_empty.wait(timeout)
+                payloads = [self._local.popleft() for _ in range(min(max_items, len(self._local)))]
+        return [json.loads(payload) for payload in payloads]
+
+    def __len__(self):
+        if self._redis is not None:
+            return self._redis.llen(self._key)
+        return len(self._local)
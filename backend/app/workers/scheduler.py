@@ -0,0 +1,178 @@
+# Reminder scheduler: claims due reminders and hands them to a dispatcher.
+#
+#     python -m app.workers.scheduler
+#
+# Any number of schedulers can run side by side; each claims a disjoint batch,
+# shared fairly across tenants and within their quotas, writes its delivery
+# messages to the outbox in the same transaction and relays them onto the
+# delivery queue. Every RECURRENCE_EXPAND_SECONDS it also tops up the materialized
+# occurrences of recurring series, outside the claim path.
+#
+# With a change feed an idle scheduler sleeps until the next reminder is due, or until
+# a write announces an earlier one, instead of polling every SCHEDULER_POLL_INTERVAL_MS.
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+import redis
+from sqlalchemy import exc
+from app.core import config
+from app.core.cache import response_cache
+from app.core.ratelimit import RateLimiter
+from app.core.redis_client import get_redis
+from app.crud.reminder import claim_due_reminders_fairly, next_due_at, release_expired_leases, utcnow
+from app.crud.series import expand_due_series
+from app.db import session as db_session
+from app.db.changefeed import ChangeFeed, change_feed
+from .outbox import OutboxRelay
+
+
+class TenantQuota:
+    """Reminder sends per minute per tenant, shared by every scheduler through Redis.
+
+    Called as quota(tenant_id, reminders_per_minute, wanted) and returns how many of
+    wanted may be claimed now; quota.refund gives back what was granted but not
+    claimed. A tenant's own limit wins over the default; tenant 0 and tenants whose
+    limit is 0 are not throttled.
+    """
+
+    def __init__(self, default_per_minute: int = config.TENANT_REMINDERS_PER_MINUTE, redis_client=None):
+        self.default_per_minute = default_per_minute
+        # Each tenant's bucket holds a minute's sends, so a quiet tenant can burst that far
+        self._limiter = RateLimiter("tenant-reminders", capacity=1, per_second=1, redis_client=redis_client)
+
+    def __call__(self, tenant_id: int, per_minute: int, wanted: int) -> int:
+        if per_minute is None:
+            per_minute = self.default_per_minute
+        if tenant_id == 0 or not per_minute:
+            return wanted
+        return self._limiter.take(str(tenant_id), wanted, capacity=per_minute, per_second=per_minute / 60)
+
+    def refund(self, tenant_id: int, per_minute: int, unused: int):
+        if per_minute is None:
+            per_minute = self.default_per_minute
+        if tenant_id == 0 or not per_minute or unused <= 0:
+            return
+        self._limiter.give_back(str(tenant_id), unused, capacity=per_minute, per_second=per_minute / 60)
+
+
+class Scheduler:
+    """Repeatedly claim due reminders and deliver each batch through relay or dispatch.
+
+    With relay, each claim commits its delivery messages to the outbox and the relay
+    drains the outbox onto the queue afterwards; otherwise the claimed reminders are
+    passed to dispatch(reminders) once the claim has committed.
+
+    Without feed an idle scheduler polls every poll_interval. With it, it sleeps until
+    the earliest pending reminder is due (at least poll_interval, at most max_idle),
+    waking early when the feed announces a change that is due sooner.
+    """
+
+    def __init__(self, dispatch=None, owner: str = None, batch_size: int = config.SCHEDULER_BATCH_SIZE,
+                 lease_seconds: int = config.SCHEDULER_LEASE_SECONDS,
+                 poll_interval: float = config.SCHEDULER_POLL_INTERVAL_MS / 1000, quota: TenantQuota = None,
+                 relay: OutboxRelay = None, feed: ChangeFeed = None,
+                 max_idle: float = config.SCHEDULER_MAX_IDLE_SECONDS):
+        self.dispatch = dispatch
+        self.relay = relay
+        self.feed = feed
+        self.max_idle = max_idle
+        self.quota = quota if quota is not None else TenantQuota(redis_client=get_redis())
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._next_release = 0.0
+        self._next_expansion = 0.0
+        self._next_due = None
+        self._subscription = None
+
+    def run_once(self) -> int:
+        """Claim and dispatch one batch; return how many reminders it held."""
+        # Claimed rows are used after commit, so keep their loaded state
+        db = db_session.SessionLocal(expire_on_commit=False)
+        try:
+            if time.monotonic() >= self._next_release:
+                release_expired_leases(db)
+                self._next_release = time.monotonic() + self.lease_seconds / 2
+            if time.monotonic() >= self._next_expansion:
+                for user_id in expand_due_series(db):
+                    response_cache.invalidate(user_id)
+                self._next_expansion = time.monotonic() + config.RECURRENCE_EXPAND_SECONDS
+            reminders = claim_due_reminders_fairly(db, self.owner, self.batch_size, self.lease_seconds, self.quota,
+                                                   outbox=self.relay is not None)
+            if self.feed is not None and len(reminders) < self.batch_size:
+                self._next_due = next_due_at(db)
+        finally:
+            db.close()
+        if self.relay is not None:
+            # Also relays what an earlier pass or a crashed scheduler left in the outbox
+            self.relay.drain()
+        elif reminders:
+            self.dispatch(reminders)
+        return len(reminders)
+
+    def _idle_seconds(self) -> float:
+        """How long to sleep before the next reminder is due or housekeeping is."""
+        if self._next_due is None:
+            seconds = self.max_idle
+        else:
+            seconds = min(max(_seconds_until(self._next_due), self.poll_interval), self.max_idle)
+        now = time.monotonic()
+        return max(min(seconds, self._next_release - now, self._next_expansion - now), 0)
+
+    def _wait_for_changes(self, seconds: float) -> None:
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            for change in self._subscription.wait(remaining):
+                if change.users is None:
+                    return  # The feed may have lost events, so look now
+                if change.due_at is not None:
+                    deadline = min(deadline, time.monotonic() + _seconds_until(change.due_at))
+
+    def run(self):
+        """Loop until stop() is called; a full batch means more is due, so go again at once."""
+        # Subscribed before the first claim, so no change committed after it is missed
+        self._subscription = self.feed.subscribe() if self.feed is not None else None
+        failures = 0
+        try:
+            while not self._stop.is_set():
+                try:
+                    claimed = self.run_once()
+                    failures = 0
+                except (redis.RedisError, exc.DBAPIError) as e:
+                    # The pass's session was rolled back and closed on the way out
+                    failures += 1
+                    print(f"Scheduler pass failed, retrying: {e}")
+                    self._stop.wait(min(2 ** (failures - 1), config.WORKER_ERROR_BACKOFF_MAX_SECONDS))
+                    continue
+                if claimed < self.batch_size:
+                    if self._subscription is None:
+                        self._stop.wait(self.poll_interval)
+                    else:
+                        self._wait_for_changes(self._idle_seconds())
+        finally:
+            if self._subscription is not None:
+                self._subscription.close()
+
+    def stop(self):
+        self._stop.set()
+        if self._subscription is not None:
+            self._subscription.interrupt()
+
+
+def _seconds_until(when: datetime) -> float:
+    return (when - utcnow()).total_seconds()
+
+
+if __name__ == '__main__':
+    from .delivery import reminder_queue, reminder_relay
+
+    if get_redis() is None:
+        raise SystemExit("REDIS_URL is not set; run app.workers.delivery, which schedules in-process")
+    Scheduler(relay=reminder_relay(reminder_queue()), feed=change_feed).run()
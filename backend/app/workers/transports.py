@@ -0,0 +1,108 @@
+# Delivery transports: email over SMTP and SMS over an HTTP API
+import smtplib
+import threading
+from email.message import EmailMessage
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TransportError(Exception):
+    """A send failed; retryable failures are tried again later."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class SMTPTransport:
+    """Send email over SMTP, keeping one open connection per sending thread."""
+
+    def __init__(self, host: str, port: int, sender: str, concurrency: int = 4, timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _drop_connection(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            with self._lock:
+                self._connections.remove(connection)
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def send(self, message: dict):
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message["recipient"]
+        email["Subject"] = message["subject"]
+        email.set_content(message["body"])
+        # A kept-alive connection may have been closed by the server; reconnect once
+        for attempt in range(2):
+            try:
+                self._connection().send_message(email)
+                return
+            except smtplib.SMTPServerDisconnected as e:
+                self._drop_connection()
+                if attempt:
+                    raise TransportError(str(e))
+            except smtplib.SMTPRecipientsRefused as e:
+                raise TransportError(str(e), retryable=False)
+            except (smtplib.SMTPException, OSError) as e:
+                self._drop_connection()
+                raise TransportError(str(e))
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+
+class HTTPTransport:
+    """Send SMS through a JSON HTTP API over a pool of keep-alive connections."""
+
+    def __init__(self, url: str, concurrency: int = 8, token: str = None, timeout=(3, 10)):
+        self.url = url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        if token:
+            self._session.headers["Authorization"] = f"Bearer {token}"
+
+    def send(self, message: dict):
+        try:
+            response = self._session.post(
+                self.url, json={"to": message["recipient"], "body": message["body"]}, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise TransportError(str(e))
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransportError(f"Provider returned {response.status_code}")
+        if response.status_code >= 400:
+            raise TransportError(f"Provider rejected message: {response.status_code}", retryable=False)
+
+    def close(self):
+        self._session.close()
@@ -0,0 +1,85 @@
+# Load test of the auth API under gunicorn: /register, /login and /api/test at fixed concurrency levels
+#
+#     python -m benchmarks.api --concurrency 1,8,32 --requests 200 [--database-url postgresql://...]
+#
+# Login throttling is lifted for the run (every client shares 127.0.0.1). Requests shed by
+# the hashing pool (503) count as errors, so saturation shows up in the error column.
+import argparse
+import json
+import os
+from benchmarks.loadgen import run_load
+from benchmarks.server import database, serve, stop
+
+PASSWORD = "benchmark-password"
+UNTHROTTLED = str(10 ** 9)
+
+
+def run(concurrency_levels, requests_total: int, worker_class: str, processes: int, threads: int,
+        bcrypt_rounds: int, database_url: str = None) -> dict:
+    results = []
+    with database(database_url) as url:
+        env = dict(
+            os.environ,
+            DATABASE_URL=url,
+            BCRYPT_ROUNDS=str(bcrypt_rounds),
+            HASH_TIME_BUDGET_MS="0",
+            LOGIN_IP_BURST=UNTHROTTLED,
+            LOGIN_IP_PER_MINUTE=UNTHROTTLED,
+            LOGIN_EMAIL_BURST=UNTHROTTLED,
+            LOGIN_EMAIL_PER_MINUTE=UNTHROTTLED,
+        )
+        process, base_url = serve(worker_class, env, processes, threads)
+        try:
+            for concurrency in concurrency_levels:
+                def email(i):
+                    return f"c{concurrency}-user{i % requests_total}@example.com"
+
+                register = run_load(lambda session, i: session.post(
+                    base_url + "/api/v1/auth/register",
+                    json={"email": email(i), "password": PASSWORD, "name": "Bench User"},
+                ), requests_total, concurrency)
+                login = run_load(lambda session, i: session.post(
+                    base_url + "/api/v1/auth/login", json={"email": email(i), "password": PASSWORD},
+                ), requests_total, concurrency)
+
+                token = _login(base_url, email(0))
+                headers = {"Authorization": f"Bearer {token}"}
+                # The protected route is cheap, so it gets more requests for stable percentiles
+                protected = run_load(lambda session, i: session.get(base_url + "/api/test", headers=headers),
+                                     requests_total * 5, concurrency)
+                results.append({"concurrency": concurrency, "register": register, "login": login,
+                                "api_test": protected})
+        finally:
+            stop(process)
+
+    return {
+        "benchmark": "api",
+        "database": url.split(":", 1)[0],
+        "worker_class": worker_class,
+        "processes": processes,
+        "threads": threads,
+        "bcrypt_rounds": bcrypt_rounds,
+        "results": results,
+    }
+
+
+def _login(base_url: str, email: str) -> str:
+    import requests
+    response = requests.post(base_url + "/api/v1/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test /register, /login and /api/test")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=200, help="register/login requests per level")
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+    print(json.dumps(run(levels, args.requests, args.worker_class, args.processes, args.threads,
+                         args.bcrypt_rounds, args.database_url), indent=2))
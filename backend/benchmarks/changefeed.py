@@ -0,0 +1,99 @@
+# Scheduler wake-ups: polling against the change feed, idle and under a stream of writes
+#
+#     python -m benchmarks.changefeed --seconds 5 --rate 20 [--database-url postgresql://...]
+#
+# Reports the statements the scheduler issues per second, and how long a reminder that is
+# due the moment it is written waits to be claimed. On SQLite the feed is in-process (or
+# Redis with REDIS_URL); on Postgres it is LISTEN/NOTIFY.
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from benchmarks.loadgen import percentile
+from benchmarks.server import database
+
+
+def measure(feed, seconds: float, rate: float) -> dict:
+    """Run a scheduler for seconds while rate due reminders a second are written."""
+    from sqlalchemy import event
+    from app.crud.reminder import create_appointment, utcnow
+    from app.db.session import SessionLocal, engine
+    from app.workers.scheduler import Scheduler
+
+    written, claimed = {}, {}
+    scheduler = Scheduler(lambda reminders: claimed.update((r.id, time.perf_counter()) for r in reminders),
+                          owner="bench", feed=feed)
+    thread = threading.Thread(target=scheduler.run, name="bench-scheduler")
+    statements = [0]
+
+    def count(*args):
+        if threading.current_thread() is thread:
+            statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    db = SessionLocal()
+    thread.start()
+    try:
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            if rate:
+                appointment = create_appointment(db, 1, "Checkup", utcnow() + timedelta(hours=1), "Client",
+                                                 "client@example.com", remind_before=(timedelta(hours=1),))
+                written[appointment.reminders[0].id] = time.perf_counter()
+                time.sleep(1 / rate)
+            else:
+                time.sleep(seconds)
+        # Let the last writes be claimed
+        deadline = time.perf_counter() + 2
+        while len(claimed) < len(written) and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+    finally:
+        scheduler.stop()
+        thread.join()
+        event.remove(engine, "before_cursor_execute", count)
+        db.close()
+    latencies = [claimed[id] - at for id, at in written.items() if id in claimed]
+    result = {"statements_per_second": round(statements[0] / elapsed, 1)}
+    if rate:
+        result["claimed"] = f"{len(latencies)}/{len(written)}"
+        for pct in (50, 99):
+            result[f"claim_p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 1)
+    return result
+
+
+def run(seconds: float, rate: float, database_url: str = None) -> dict:
+    with database(database_url) as url:
+        # The app reads DATABASE_URL at import time
+        os.environ["DATABASE_URL"] = url
+        from app.db.changefeed import change_feed
+        from app.db.models import User
+        from app.db.session import SessionLocal
+
+        db = SessionLocal()
+        db.add(User(email="owner@example.com", name="Owner", hashed_password="x"))
+        db.commit()
+        db.close()
+        results = {
+            mode: {"idle": measure(feed, seconds, 0), "churn": measure(feed, seconds, rate)}
+            for mode, feed in (("polling", None), ("feed", change_feed))
+        }
+    return {
+        "benchmark": "changefeed",
+        "database": url.split(":", 1)[0],
+        "feed_backend": change_feed.backend,
+        "seconds": seconds,
+        "writes_per_second": rate,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare scheduler polling with change feed wake-ups")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rate", type=float, default=20, help="due reminders written per second under churn")
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    args = parser.parse_args()
+    print(json.dumps(run(args.seconds, args.rate, args.database_url), indent=2))
@@ -0,0 +1,57 @@
+# Delivery throughput on one box, against the local SMTP and HTTP stand-ins:
+#
+#     python -m benchmarks.delivery --messages 5000 --sms-latency-ms 20
+import argparse
+import json
+import time
+from app.workers.delivery import DeliveryWorker
+from app.workers.queue import DeliveryQueue
+from app.workers.transports import HTTPTransport, SMTPTransport
+from tests.fakes import FakeHTTPServer, FakeSMTPServer
+
+
+def run(messages: int, batch_size: int, smtp_concurrency: int, sms_concurrency: int, sms_latency_ms: float) -> dict:
+    queue = DeliveryQueue("bench")
+    queue.push([
+        {"id": i, "channel": "email" if i % 2 else "sms", "recipient": f"client{i}@example.com",
+         "attempts": 0, "subject": "Reminder: Checkup", "body": "Hi, this is a reminder of your checkup."}
+        for i in range(messages)
+    ])
+    delivered = []
+
+    with FakeSMTPServer() as smtp, FakeHTTPServer(delay=sms_latency_ms / 1000) as sms:
+        transports = {
+            "email": SMTPTransport("127.0.0.1", smtp.port, "bench@example.com", concurrency=smtp_concurrency),
+            "sms": HTTPTransport(sms.url, concurrency=sms_concurrency),
+        }
+        # Results are counted instead of written to the database, to measure the send path alone
+        worker = DeliveryWorker(queue, transports, batch_size=batch_size,
+                                record=lambda outcomes, *args: delivered.extend(outcomes))
+        start = time.perf_counter()
+        while worker.run_once(timeout=0):
+            pass
+        elapsed = time.perf_counter() - start
+        worker.close()
+        connections = {"smtp": smtp.connections, "http": sms.connections}
+
+    failed = sum(1 for _, error in delivered if error is not None)
+    return {
+        "benchmark": "delivery",
+        "messages": messages,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(messages / elapsed, 1),
+        "connections": connections,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure reminder delivery throughput against local stand-ins")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--smtp-concurrency", type=int, default=4)
+    parser.add_argument("--sms-concurrency", type=int, default=8)
+    parser.add_argument("--sms-latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.messages, args.batch_size, args.smtp_concurrency,
+                         args.sms_concurrency, args.sms_latency_ms), indent=2))
@@ -0,0 +1,63 @@
+# Closed-loop HTTP load generator shared by the serving benchmarks
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+import requests
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (0 when empty)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Requests/s and latency percentiles (milliseconds) for one run."""
+    completed = len(latencies)
+    return {
+        "requests": completed + errors,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(completed / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def run_load(send: Callable[[requests.Session, int], requests.Response], total: int, concurrency: int) -> dict:
+    """Issue `total` calls of `send(session, i)` from `concurrency` clients, each with its own
+    keep-alive session; `i` numbers the calls from 0."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    remaining = iter(range(total))
+
+    def client():
+        nonlocal errors
+        with requests.Session() as session:
+            while True:
+                with lock:
+                    i = next(remaining, None)
+                if i is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    ok = send(session, i).status_code < 400
+                except requests.RequestException:
+                    ok = False
+                took = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        latencies.append(took)
+                    else:
+                        errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return summarize(latencies, errors, time.perf_counter() - start)
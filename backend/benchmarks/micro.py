@@ -0,0 +1,90 @@
+# Microbenchmarks for the login hot path: password hashing and the user lookup
+#
+#     python -m benchmarks.micro --iterations 50 --users 10000 [--database-url postgresql://...]
+#
+# Hashing goes through the hashing pool exactly as requests do; get_user_by_email runs
+# against --users seeded accounts, for both hits and misses.
+import argparse
+import json
+import os
+import random
+import time
+from benchmarks.loadgen import percentile
+from benchmarks.server import database
+
+
+def stats(latencies: list, elapsed: float, ops: int = None) -> dict:
+    """Throughput and latency percentiles (milliseconds) for one microbenchmark.
+
+    Batch calls pass `ops` and no per-call latencies, and report throughput only.
+    """
+    ops = len(latencies) if ops is None else ops
+    result = {"ops": ops, "ops_per_second": round(ops / elapsed, 1) if elapsed else 0.0}
+    if latencies:
+        for pct in (50, 95, 99):
+            result[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 3)
+    return result
+
+
+def bench(fn, iterations: int) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_start)
+    return stats(latencies, time.perf_counter() - start)
+
+
+def run(iterations: int, users: int, bcrypt_rounds: int, database_url: str = None) -> dict:
+    with database(database_url) as url:
+        # The app reads DATABASE_URL at import time
+        os.environ["DATABASE_URL"] = url
+        from app.core.security import (configure_password_context, get_password_hash, get_password_hashes,
+                                       hashing_pool, verify_password)
+        from app.crud.user import get_user_by_email
+        from app.db.models import User
+        from app.db.session import SessionLocal
+
+        configure_password_context(bcrypt_rounds)
+        hashed = get_password_hash("benchmark-password")
+        results = {
+            "get_password_hash": bench(lambda i: get_password_hash(f"password-{i}"), iterations),
+            "verify_password": bench(lambda i: verify_password("benchmark-password", hashed), iterations),
+        }
+        # The whole pool at once, as bulk provisioning uses it
+        start = time.perf_counter()
+        get_password_hashes([f"password-{i}" for i in range(iterations)])
+        results["get_password_hashes"] = stats([], time.perf_counter() - start, ops=iterations)
+
+        db = SessionLocal()
+        db.execute(User.__table__.insert(), [
+            {"email": f"user{i}@example.com", "name": f"User {i}", "hashed_password": hashed}
+            for i in range(users)
+        ])
+        db.commit()
+        lookups = iterations * 20
+        emails = [f"user{random.randrange(users)}@example.com" for _ in range(lookups)]
+        results["get_user_by_email"] = bench(lambda i: get_user_by_email(db, emails[i]), lookups)
+        results["get_user_by_email_miss"] = bench(lambda i: get_user_by_email(db, f"missing{i}@example.com"), lookups)
+        db.close()
+        hashing_pool.shutdown()
+
+    return {
+        "benchmark": "micro",
+        "database": url.split(":", 1)[0],
+        "bcrypt_rounds": bcrypt_rounds,
+        "hashing_pool_workers": hashing_pool.workers,
+        "users": users,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time password hashing and user lookups")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations, args.users, args.bcrypt_rounds, args.database_url), indent=2))
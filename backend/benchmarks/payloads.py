@@ -0,0 +1,99 @@
+# Benchmarks for response payloads: JSON encoding, compression and streamed listings
+#
+#     python -m benchmarks.payloads --iterations 200 --appointments 200 --history 5000
+#
+# The appointment listing is encoded with the stdlib and orjson providers; its body is
+# compressed with gzip and brotli; a reminder history is built whole and streamed.
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+import flask
+from benchmarks.micro import bench
+from app.core import compression, config
+from app.core.metrics import TimedJSONProvider
+from app.core.serialization import OrjsonProvider, json_array_stream
+
+
+def listing(appointments: int) -> dict:
+    """A payload shaped like GET /appointments."""
+    starts = datetime(2030, 1, 1, 9, tzinfo=timezone.utc)
+    return {"appointments": [
+        {
+            "id": i, "title": f"Appointment {i}", "starts_at": (starts + timedelta(hours=i)).isoformat(),
+            "client_name": f"Client {i}", "client_email": f"client{i}@example.com", "client_phone": "+15550100",
+            "reminders": [
+                {"id": i * 2 + c, "channel": channel, "status": "pending",
+                 "due_at": (starts + timedelta(hours=i - 24)).isoformat()}
+                for c, channel in enumerate(("email", "sms"))
+            ],
+        }
+        for i in range(appointments)
+    ]}
+
+
+def history_item(i: int) -> dict:
+    return {"id": i, "appointment_id": i // 2, "channel": "email", "recipient": f"client{i}@example.com",
+            "due_at": "2030-01-01T09:00:00+00:00", "status": "sent", "attempts": 1,
+            "sent_at": "2030-01-01T09:00:01+00:00"}
+
+
+def measure_memory(fn) -> dict:
+    """Wall time and peak Python allocation of one call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"elapsed_ms": round(elapsed * 1000, 3), "peak_kib": round(peak / 1024, 1)}
+
+
+def run(iterations: int, appointments: int, history: int) -> dict:
+    app = flask.Flask("benchmark")
+    payload = listing(appointments)
+    results = {"encode": {}, "compress": {}, "history": {}}
+
+    with app.app_context():
+        for name, provider in (("stdlib", TimedJSONProvider(app)), ("orjson", OrjsonProvider(app))):
+            results["encode"][name] = bench(lambda i: provider.response(payload).get_data(), iterations)
+        body = OrjsonProvider(app).response(payload).get_data()
+
+    for encoding in ("gzip", "br"):
+        if encoding == "br" and compression.brotli is None:
+            continue
+        compressed = compression.compress(body, encoding)
+        results["compress"][encoding] = dict(
+            bench(lambda i: compression.compress(body, encoding), iterations),
+            bytes=len(compressed), ratio=round(len(body) / len(compressed), 2),
+        )
+
+    app.json = OrjsonProvider(app)
+    with app.test_request_context():
+        results["history"]["whole"] = measure_memory(
+            lambda: app.json.response({"reminders": [history_item(i) for i in range(history)], "next": None})
+        )
+        results["history"]["streamed"] = measure_memory(
+            lambda: sum(len(chunk) for chunk in json_array_stream(
+                {}, "reminders", range(history), history_item, lambda: {"next": None}))
+        )
+
+    return {
+        "benchmark": "payloads",
+        "appointments": appointments,
+        "body_bytes": len(body),
+        "history_items": history,
+        "gzip_level": config.COMPRESS_GZIP_LEVEL,
+        "brotli_quality": config.COMPRESS_BROTLI_QUALITY,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time JSON encoding, compression and streamed listings")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--appointments", type=int, default=200)
+    parser.add_argument("--history", type=int, default=5000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations, args.appointments, args.history), indent=2))
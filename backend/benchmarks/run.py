@@ -0,0 +1,135 @@
+# Run the benchmark suite into one JSON file, and compare two such files:
+#
+#     python -m benchmarks.run --output benchmarks/results/$(git rev-parse --short HEAD).json
+#     python -m benchmarks.run --quick --only micro,api
+#     python -m benchmarks.run --compare benchmarks/results/base.json benchmarks/results/head.json
+#
+# Each benchmark runs in its own interpreter so one cannot warm caches or pools for the next.
+# --compare exits non-zero when any throughput drops, or any latency percentile grows, by more
+# than --threshold percent.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from benchmarks.server import BACKEND_DIR
+
+SUITE = {
+    "micro": ["--iterations", "50", "--users", "10000"],
+    "api": ["--concurrency", "1,8,32", "--requests", "200"],
+    "delivery": ["--messages", "2000"],
+    "payloads": ["--iterations", "200", "--appointments", "200", "--history", "5000"],
+    "serving": ["--worker-classes", "gthread,gevent", "--requests", "500"],
+    "changefeed": ["--seconds", "5", "--rate", "20"],
+}
+# Smaller runs for a quick check; latencies are noisier
+QUICK = {
+    "micro": ["--iterations", "10", "--users", "2000", "--bcrypt-rounds", "8"],
+    "api": ["--concurrency", "1,8", "--requests", "40", "--bcrypt-rounds", "8"],
+    "delivery": ["--messages", "500"],
+    "payloads": ["--iterations", "50", "--appointments", "200", "--history", "2000"],
+    "serving": ["--worker-classes", "gthread", "--requests", "100", "--concurrency", "10"],
+    "changefeed": ["--seconds", "2", "--rate", "20"],
+}
+DATABASE_BENCHMARKS = ("micro", "api", "serving", "changefeed")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(names, quick: bool = False, database_url: str = None) -> dict:
+    arguments = QUICK if quick else SUITE
+    results = {}
+    for name in names:
+        command = [sys.executable, "-m", f"benchmarks.{name}", *arguments[name]]
+        if database_url and name in DATABASE_BENCHMARKS:
+            command += ["--database-url", database_url]
+        print(f"Running {name}...", file=sys.stderr)
+        output = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True)
+        if output.returncode != 0:
+            results[name] = {"error": output.stderr.strip().splitlines()[-1:] or ["failed"]}
+            continue
+        results[name] = json.loads(output.stdout)
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "quick": quick,
+        "benchmarks": results,
+    }
+
+
+def flatten(value, prefix: str = "") -> dict:
+    """Numeric leaves keyed by path; list items are keyed by what they measure, not their index."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((_list_key(item, i), item) for i, item in enumerate(value))
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat = {}
+    for key, item in items:
+        flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def _list_key(item, index: int) -> str:
+    if isinstance(item, dict):
+        for key in ("worker_class", "concurrency"):
+            if key in item:
+                return f"{key}={item[key]}"
+    return str(index)
+
+
+def compare(base: dict, head: dict, threshold: float) -> list:
+    """Rows of (metric, base, head, percent change, regressed) for throughputs and percentiles."""
+    base_flat, head_flat = flatten(base["benchmarks"]), flatten(head["benchmarks"])
+    rows = []
+    for metric in sorted(base_flat.keys() & head_flat.keys()):
+        higher_is_better = metric.endswith("_per_second")
+        if not (higher_is_better or metric.endswith("_ms")) or metric.endswith("latency_ms"):
+            continue
+        old, new = base_flat[metric], head_flat[metric]
+        if not old:
+            continue
+        change = (new - old) / old * 100
+        regressed = -change > threshold if higher_is_better else change > threshold
+        rows.append((metric, old, new, change, regressed))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suite or compare two result files")
+    parser.add_argument("--only", help=f"comma-separated subset of {','.join(SUITE)}")
+    parser.add_argument("--quick", action="store_true", help="smaller runs for a quick check")
+    parser.add_argument("--database-url", help="run the database benchmarks against this database")
+    parser.add_argument("--output", help="write the results here as well as to stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=10, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as base_file, open(args.compare[1]) as head_file:
+            base, head = json.load(base_file), json.load(head_file)
+        rows = compare(base, head, args.threshold)
+        print(f"{base['revision']} -> {head['revision']}")
+        for metric, old, new, change, regressed in rows:
+            print(f"{'REGRESSED ' if regressed else '          '}{metric:70} {old:>12} {new:>12} {change:+7.1f}%")
+        sys.exit(1 if any(row[4] for row in rows) else 0)
+
+    names = args.only.split(",") if args.only else list(SUITE)
+    report = json.dumps(run_suite(names, args.quick, args.database_url), indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as output_file:
+            output_file.write(report + "\n")
+    print(report)
@@ -0,0 +1,65 @@
+# Starting the app under gunicorn (and preparing its database) for the HTTP benchmarks
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_serving(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up within {timeout}s")
+
+
+@contextmanager
+def database(url: str = None):
+    """Yield `url`, or a fresh SQLite file when none is given, with migrations applied."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        env = dict(os.environ, DATABASE_URL=url)
+        subprocess.run([sys.executable, "-m", "app.db.migrations"], cwd=BACKEND_DIR, env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+        yield url
+
+
+def serve(worker_class: str, env: dict, processes: int, threads: int):
+    """Start gunicorn with `worker_class` on a free port; returns (process, base url)."""
+    port = free_port()
+    # gunicorn quietly upgrades "sync" to gthread when threads > 1
+    threads = threads if worker_class == "gthread" else 1
+    env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKER_CLASS=worker_class,
+               WEB_CONCURRENCY=str(processes), WEB_THREADS=str(threads))
+    env.pop("REDIS_URL", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "app.main:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_serving(base_url + "/")
+    except RuntimeError:
+        process.kill()
+        raise
+    return process, base_url
+
+
+def stop(process) -> None:
+    process.terminate()
+    process.wait(timeout=30)
@@ -0,0 +1,67 @@
+# Google OAuth callback throughput per gunicorn worker class, against a local OAuth stub:
+#
+#     python -m benchmarks.serving --worker-classes sync,gthread,gevent --oauth-latency-ms 100
+#
+# Each worker class gets the same process count; the stub adds `--oauth-latency-ms` to every call
+# (the token exchange, plus the one-off JWKS download), standing in for the round trip to Google.
+# The gevent run needs requirements-gevent.txt installed.
+import argparse
+import json
+import os
+from benchmarks.loadgen import run_load
+from benchmarks.server import database, serve, stop
+from tests.fakes import FakeOAuthProvider
+
+CALLBACK_PATH = "/api/v1/auth/google-callback?code=bench-code&state=bench-state"
+
+
+def run(worker_classes, requests_total: int, concurrency: int, processes: int, threads: int,
+        oauth_latency_ms: float, database_url: str = None) -> dict:
+    results = []
+    oauth = FakeOAuthProvider("bench-client", email="bench@example.com", name="Bench User",
+                              delay=oauth_latency_ms / 1000)
+    with database(database_url) as url, oauth:
+        env = dict(
+            os.environ,
+            DATABASE_URL=url,
+            GOOGLE_CLIENT_ID="bench-client",
+            GOOGLE_CLIENT_SECRET="bench-secret",
+            GOOGLE_REDIRECT_URI="http://127.0.0.1/api/v1/auth/google-callback",
+            GOOGLE_TOKEN_URL=oauth.token_url,
+            GOOGLE_JWKS_URL=oauth.jwks_url,
+        )
+
+        for worker_class in worker_classes:
+            process, base_url = serve(worker_class, env, processes, threads)
+            try:
+                url = base_url + CALLBACK_PATH
+                # First call creates the user; every measured call is then a returning login
+                run_load(lambda session, i: session.get(url), 1, 1)
+                result = run_load(lambda session, i: session.get(url, timeout=30), requests_total, concurrency)
+            finally:
+                stop(process)
+            results.append(dict(worker_class=worker_class, **result))
+
+    return {
+        "benchmark": "serving",
+        "endpoint": "google-callback",
+        "oauth_latency_ms": oauth_latency_ms,
+        "processes": processes,
+        "threads": threads,
+        "concurrency": concurrency,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare gunicorn worker classes on the OAuth callback")
+    parser.add_argument("--worker-classes", default="sync,gthread,gevent")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=4, help="threads per process for gthread")
+    parser.add_argument("--oauth-latency-ms", type=float, default=100)
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    args = parser.parse_args()
+    print(json.dumps(run(args.worker_classes.split(","), args.requests, args.concurrency, args.processes,
+                         args.threads, args.oauth_latency_ms, args.database_url), indent=2))
@@ -0,0 +1,45 @@
+# Gunicorn settings
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:80")
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+# "gthread" (default): threaded workers let cheap routes keep serving while logins wait on the hashing pool.
+# "gevent": one greenlet per request, so slow outbound calls (the Google OAuth round trips)
+# and database waits yield instead of holding a thread. Needs requirements-gevent.txt.
+# Use gevent wherever /api/v1/appointments/changes is served: each open event stream holds
+# its request for minutes, and gthread workers only allow SSE_MAX_STREAMS (half their threads) of them.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_connections = int(os.environ.get("GEVENT_CONNECTIONS", 1000))
+
+if worker_class == "gevent":
+    # Patch before the app is preloaded, so every socket, lock and thread it creates is cooperative
+    from gevent import monkey
+    monkey.patch_all()
+    # psycopg2 is a C extension; route its waits through the gevent hub as well
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+# Import the app (and calibrate bcrypt) once in the master; workers fork ready to serve
+preload_app = True
+
+
+def on_starting(server):
+    # Multiprocess metrics live in files shared by the workers; start each run with an empty directory
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # Preconnect the DB pool and start the hashing processes, timed against the startup budget
+    from app.core.warmup import warm_up_worker
+    warm_up_worker(server.log)
@@ -0,0 +1,69 @@
+import os
+import pytest
+import random
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Changes are announced within the process, without a Postgres or Redis listener
+os.environ.setdefault("CHANGE_FEED", "local")
+
+from app.main import app
+from app.core.cache import response_cache
+from app.crud.series import occurrence_cache
+from app.db.session import Base
+from app.db.models import User
+
+# Use an in-memory SQLite database for testing
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+# Create a test engine and session factory
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def client():
+    """Create a test client for the Flask application and set up an in-memory database."""
+    # Create the database tables in the in-memory database
+    Base.metadata.create_all(bind=engine)
+
+    app.config['TESTING'] = True
+    # Ids restart with every database, so cached responses must not outlive one
+    response_cache.clear()
+    occurrence_cache.clear()
+
+    # Point the request-scoped sessions at the testing database. Use patch as a context manager.
+    with patch('app.db.session.SessionLocal', new=TestingSessionLocal):
+        with app.app_context(): # Push an application context
+            with app.test_client() as client:
+                yield client
+
+    # Drop the database tables after the test
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db():
+    """Provide a session on a fresh in-memory database with one user."""
+    Base.metadata.create_all(bind=engine)
+    occurrence_cache.clear()
+    session = TestingSessionLocal()
+    session.add(User(email="owner@example.com", name="Owner", hashed_password="x"))
+    session.commit()
+    with patch('app.db.session.SessionLocal', new=TestingSessionLocal):
+        yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def auth_headers(client):
+    """Register and log in a user; return the Authorization header for their token."""
+    credentials = {
+        "email": f"user{random.randint(0, 999999)}@example.com",
+        "password": "fixturepassword",
+    }
+    client.post('/api/v1/auth/register', json=dict(credentials, name="Fixture User"))
+    response = client.post('/api/v1/auth/login', json=credentials)
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
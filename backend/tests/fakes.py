@@ -0,0 +1,312 @@
+# Local stand-ins for external services used by the tests and benchmarks
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import redis
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of the redis-py client the app uses."""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+
+    def _alive(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        return self._data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and self._alive(key):
+            return None
+        self._data[key] = str(value).encode() if not isinstance(value, bytes) else value
+        self._expires.pop(key, None)
+        if ex is not None:
+            self._expires[key] = time.monotonic() + ex
+        return True
+
+    def exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                removed += 1
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return removed
+
+    def hget(self, key, field):
+        return self._data[key].get(field.encode()) if self._alive(key) else None
+
+    def hset(self, key, field, value):
+        self._alive(key)
+        fields = self._data.setdefault(key, {})
+        added = field.encode() not in fields
+        fields[field.encode()] = value if isinstance(value, bytes) else str(value).encode()
+        return int(added)
+
+    def expire(self, key, seconds):
+        if not self._alive(key):
+            return False
+        self._expires[key] = time.monotonic() + seconds
+        return True
+
+    def zadd(self, key, mapping):
+        zset = self._data.setdefault(key, {})
+        added = sum(1 for member in mapping if member not in zset)
+        zset.update({str(member).encode(): float(score) for member, score in mapping.items()})
+        return added
+
+    def _score_range(self, key, low, high):
+        low = float("-inf") if low == "-inf" else float(low)
+        high = float("inf") if high == "+inf" else float(high)
+        zset = self._data.get(key, {})
+        return sorted(((m, s) for m, s in zset.items() if low <= s <= high), key=lambda item: item[1])
+
+    def zrangebyscore(self, key, low, high, withscores=False):
+        items = self._score_range(key, low, high)
+        return items if withscores else [member for member, _ in items]
+
+    def zremrangebyscore(self, key, low, high):
+        items = self._score_range(key, low, high)
+        for member, _ in items:
+            del self._data[key][member]
+        return len(items)
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def register_script(self, script):
+        def unavailable(*args, **kwargs):
+            raise redis.exceptions.ResponseError("scripting is not supported by FakeRedis")
+        return unavailable
+
+
+class _FakePipeline:
+    """Queues FakeRedis calls and runs them on execute()."""
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._calls.append((getattr(self._client, name), args, kwargs))
+            return self
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._calls = []
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
+
+
+class DownRedis:
+    """Redis client whose server is unreachable."""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise redis.exceptions.ConnectionError("Redis is down")
+        return fail
+
+    def register_script(self, script):
+        return self.__getattr__("evalsha")
+
+
+class _ServerThread:
+    """Run a socketserver on localhost in a background thread."""
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class FakeSMTPServer(_ServerThread):
+    """Minimal SMTP server that accepts every message and keeps them in `messages`."""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                fake.connections += 1
+                self.reply("220 fake-smtp ready")
+                for raw in self.rfile:
+                    command = raw.decode().strip().upper()
+                    if command.startswith(("EHLO", "HELO")):
+                        self.reply("250 fake-smtp")
+                    elif command == "DATA":
+                        self.reply("354 end with <CRLF>.<CRLF>")
+                        lines = []
+                        for data_line in self.rfile:
+                            if data_line in (b".\r\n", b".\n"):
+                                break
+                            lines.append(data_line)
+                        fake.messages.append(b"".join(lines).decode())
+                        self.reply("250 queued")
+                    elif command == "QUIT":
+                        self.reply("221 bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+
+
+class _BacklogHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops bursts of new connections under benchmark load
+    request_queue_size = 128
+
+
+class FakeHTTPServer(_ServerThread):
+    """Local HTTP stub: records JSON POST bodies and answers with `status` after `delay` seconds.
+
+    `routes` maps paths to JSON-serialisable responses (or callables building them).
+    """
+
+    def __init__(self, status=200, delay=0.0, routes=None):
+        self.status = status
+        self.delay = delay
+        self.routes = routes or {}
+        self.requests = []
+        self.connections = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; do not let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                fake.connections += 1
+
+            def respond(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in fake.routes:
+                    self.respond(404, {"error": "not found"})
+                    return
+                route = fake.routes[self.path.split("?")[0]]
+                time.sleep(fake.delay)
+                self.respond(200, route(self) if callable(route) else route)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                time.sleep(fake.delay)
+                route = fake.routes.get(self.path.split("?")[0])
+                if callable(route):
+                    self.respond(200, route(self, body))
+                    return
+                fake.requests.append(json.loads(body) if body.startswith(b"{") else body.decode())
+                self.respond(fake.status, {"status": "accepted" if fake.status < 400 else "error"})
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _BacklogHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+
+class FakeOAuthProvider(FakeHTTPServer):
+    """Local Google stand-in: /token trades any code for an RS256-signed ID token, /jwks serves the key.
+
+    `token_url` and `jwks_url` point at it; `jwks_fetches` counts key downloads.
+    """
+
+    def __init__(self, client_id, email="google.user@example.com", name="Google User", delay=0.0,
+                 issuer="https://accounts.google.com"):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from jose import jwk
+
+        self.client_id = client_id
+        self.email = email
+        self.name = name
+        self.issuer = issuer
+        self.kid = "fake-key-1"
+        self.jwks_fetches = 0
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        # Parsed once: loading the PEM costs more than signing
+        self.signing_key = jwk.construct(private_pem, "RS256")
+        public_jwk = self.signing_key.public_key().to_dict()
+        self.public_jwk = dict({k: v.decode() if isinstance(v, bytes) else v for k, v in public_jwk.items()},
+                               kid=self.kid, use="sig")
+        super().__init__(delay=delay, routes={"/token": self._token, "/jwks": self._jwks})
+
+    def id_token(self, access_token, **overrides):
+        from jose import jwt
+        now = int(time.time())
+        claims = dict({
+            "iss": self.issuer, "aud": self.client_id, "sub": "1234567890", "iat": now, "exp": now + 3600,
+            "email": self.email, "email_verified": True, "name": self.name,
+        }, **overrides)
+        return jwt.encode(claims, self.signing_key, algorithm="RS256", headers={"kid": self.kid},
+                          access_token=access_token)
+
+    def _token(self, handler, body):
+        access_token = f"access-{time.monotonic_ns()}"
+        return {"access_token": access_token, "token_type": "Bearer", "expires_in": 3600,
+                "id_token": self.id_token(access_token)}
+
+    def _jwks(self, handler):
+        self.jwks_fetches += 1
+        return {"keys": [self.public_jwk]}
+
+    @property
+    def token_url(self):
+        return self.url + "/token"
+
+    @property
+    def jwks_url(self):
+        return self.url + "/jwks"
@@ -0,0 +1,117 @@
+import json
+import pytest
+from app.db.models import User
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def admin_headers(auth_headers):
+    db = TestingSessionLocal()
+    db.query(User).update({User.is_admin: True})
+    db.commit()
+    db.close()
+    return auth_headers
+
+
+class TestBulkUserProvisioning:
+    def test_bulk_create_reports_each_row(self, client, admin_headers):
+        """Test that new, existing, repeated and invalid rows each get their own status, ignoring email case."""
+        client.post('/api/v1/auth/register',
+                    json={"email": "taken@example.com", "password": "pw123456", "name": "Taken"})
+        users = [
+            {"email": "new1@example.com", "password": "pw123456", "name": "New One"},
+            {"email": "Taken@Example.com", "password": "pw123456", "name": "Again"},
+            {"email": "new2@example.com", "password": "pw123456", "name": "New Two"},
+            {"email": "NEW1@example.com", "password": "pw123456", "name": "Repeat"},
+            {"email": "not-an-email", "password": "pw123456", "name": "Bad"},
+            {"email": "nopass@example.com", "name": "No Password"},
+        ]
+        response = client.post('/api/v1/admin/users/bulk', json={"users": users}, headers=admin_headers)
+
+        assert response.status_code == 200
+        body = json.loads(response.data)
+        assert [r['status'] for r in body['results']] == [
+            'created', 'exists', 'created', 'duplicate', 'invalid', 'invalid'
+        ]
+        assert body['summary'] == {'created': 2, 'exists': 1, 'duplicate': 1, 'invalid': 2}
+        assert all('id' in r for r in body['results'] if r['status'] == 'created')
+
+        login = client.post('/api/v1/auth/login', json={"email": "new2@example.com", "password": "pw123456"})
+        assert login.status_code == 200
+
+    def test_bulk_create_requires_admin(self, client, auth_headers):
+        """Test that regular users cannot provision accounts."""
+        response = client.post('/api/v1/admin/users/bulk', json={"users": []}, headers=auth_headers)
+        assert response.status_code == 403
+
+
+class TestOrganizations:
+    def test_create_organization_and_move_user_with_pending_reminders(self, client, admin_headers):
+        """Test that an admin creates an organization and a user's unsent reminders follow them into it."""
+        from datetime import timedelta
+        from app.crud.reminder import create_appointment, utcnow
+        from app.db.models import Reminder
+
+        response = client.post('/api/v1/admin/organizations', json={"name": "Clinic", "reminders_per_minute": 60},
+                               headers=admin_headers)
+        assert response.status_code == 201
+        organization = json.loads(response.data)
+        assert organization['reminders_per_minute'] == 60
+
+        db = TestingSessionLocal()
+        user = db.query(User).one()
+        create_appointment(db, user.id, "Checkup", utcnow() + timedelta(days=2), "Client", "c@example.com")
+        response = client.put(f'/api/v1/admin/users/{user.id}/organization',
+                              json={"organization_id": organization['id']}, headers=admin_headers)
+        assert response.status_code == 200
+        db.expire_all()
+        assert user.organization_id == organization['id']
+        assert [r.tenant_id for r in db.query(Reminder)] == [organization['id']]
+        db.close()
+
+    def test_rejects_unknown_organization_and_bad_quota(self, client, admin_headers):
+        """Test that invalid quotas and unknown organizations are refused."""
+        response = client.post('/api/v1/admin/organizations', json={"name": "X", "reminders_per_minute": -1},
+                               headers=admin_headers)
+        assert response.status_code == 400
+        response = client.put('/api/v1/admin/users/1/organization', json={"organization_id": 999},
+                              headers=admin_headers)
+        assert response.status_code == 404
+
+
+class TestDeliveryStats:
+    def test_stats_come_from_the_rollups(self, client, admin_headers):
+        """Test that an organization's stats are read from its rollups, zero-filled, for admins and members."""
+        from app.crud.organization import assign_organization, create_organization
+        from app.crud.reminder import utcnow
+        from app.crud.stats import add_delivery_counts
+
+        db = TestingSessionLocal()
+        clinic = create_organization(db, "Clinic")
+        today = utcnow().date()
+        add_delivery_counts(db, {(clinic.id, today, "email"): {"sent": 3, "retried": 1},
+                                 (clinic.id, today, "sms"): {"failed": 1}})
+        db.commit()
+
+        response = client.get(f'/api/v1/admin/organizations/{clinic.id}/delivery-stats?days=7',
+                              headers=admin_headers)
+        assert response.status_code == 200
+        stats = response.get_json()
+        assert stats['totals'] == {"sent": 3, "failed": 1, "retried": 1}
+        assert stats['channels']['sms'] == {"sent": 0, "failed": 1, "retried": 0}
+        assert len(stats['days']) == 7 and stats['days'][-1]['day'] == today.isoformat()
+        assert stats['days'][0]['sent'] == 0 and stats['days'][-1]['sent'] == 3
+
+        assert client.get('/api/v1/users/me/delivery-stats', headers=admin_headers).status_code == 404
+        assign_organization(db, db.query(User).one(), clinic.id)
+        db.close()
+        response = client.get('/api/v1/users/me/delivery-stats', headers=admin_headers)
+        assert response.get_json()['totals'] == stats['totals']
+
+    def test_rejects_unknown_organization_and_bad_range(self, client, admin_headers):
+        """Test that unknown organizations and out-of-range day counts are refused."""
+        assert client.get('/api/v1/admin/organizations/999/delivery-stats', headers=admin_headers).status_code == 404
+        client.post('/api/v1/admin/organizations', json={"name": "Clinic"}, headers=admin_headers)
+        for days in ("0", "x", "100000"):
+            response = client.get(f'/api/v1/admin/organizations/1/delivery-stats?days={days}', headers=admin_headers)
+            assert response.status_code == 400
@@ -0,0 +1,136 @@
+import json
+import pytest
+from app.db.models import Appointment, ImportJob, Reminder
+from tests.conftest import TestingSessionLocal
+
+CSV_UPLOAD = (
+    "title,starts_at,client_name,client_email,client_phone\n"
+    "Checkup,2030-01-10T09:00:00Z,Ada,ada@example.com,\n"
+    "Cleaning,2030-01-11T10:30:00+02:00,Grace,,+15550100\n"
+    "\"Follow-up, extended\",2030-01-12T08:00:00,Linus,linus@example.com,+15550101\n"
+    "Broken,not-a-date,Ken,ken@example.com,\n"
+    "No contact,2030-01-13T08:00:00Z,Dennis,,\n"
+)
+
+
+class TestAppointmentImport:
+    def test_csv_import_in_chunks(self, client, auth_headers, monkeypatch):
+        """Test that valid CSV rows are imported with reminders and bad rows are reported."""
+        monkeypatch.setattr('app.core.config.IMPORT_CHUNK_SIZE', 2)
+        response = client.post('/api/v1/appointments/import', data=CSV_UPLOAD,
+                               headers=dict(auth_headers, **{'Content-Type': 'text/csv'}))
+
+        assert response.status_code == 201
+        job = json.loads(response.data)
+        assert job['status'] == 'completed'
+        assert (job['rows_total'], job['rows_imported'], job['rows_failed']) == (5, 3, 2)
+        assert [error['row'] for error in job['errors']] == [4, 5]
+
+        db = TestingSessionLocal()
+        titles = sorted(a.title for a in db.query(Appointment).all())
+        assert titles == ['Checkup', 'Cleaning', 'Follow-up, extended']
+        assert db.query(Reminder).count() == 4
+        db.close()
+
+        status = client.get(response.headers['Location'], headers=auth_headers)
+        assert status.status_code == 200
+        assert json.loads(status.data)['rows_imported'] == 3
+
+    def test_ndjson_import(self, client, auth_headers):
+        """Test that NDJSON uploads are parsed line by line and malformed lines are reported."""
+        upload = "\n".join([
+            json.dumps({"title": "Checkup", "starts_at": "2030-01-10T09:00:00Z",
+                        "client_name": "Ada", "client_email": "ada@example.com"}),
+            "{not json",
+            "",
+            json.dumps(["not", "an", "object"]),
+        ])
+        response = client.post('/api/v1/appointments/import', data=upload,
+                               headers=dict(auth_headers, **{'Content-Type': 'application/x-ndjson'}))
+
+        job = json.loads(response.data)
+        assert (job['rows_total'], job['rows_imported'], job['rows_failed']) == (3, 1, 2)
+
+    def test_import_rejects_unknown_format_and_anonymous_users(self, client, auth_headers):
+        """Test the Content-Type check and that imports need a token."""
+        response = client.post('/api/v1/appointments/import', data='{}',
+                               headers=dict(auth_headers, **{'Content-Type': 'application/json'}))
+        assert response.status_code == 415
+        response = client.post('/api/v1/appointments/import', data='', headers={'Content-Type': 'text/csv'})
+        assert response.status_code == 401
+
+
+    def test_database_error_marks_the_job_failed(self, db, monkeypatch):
+        """Test that a database error mid-import fails the job, keeps committed chunks, and is re-raised."""
+        import io
+        from sqlalchemy.exc import OperationalError
+        from app.crud import imports
+
+        write = imports.write_appointments
+        calls = []
+
+        def write_then_fail(*args):
+            calls.append(1)
+            if len(calls) > 1:
+                raise OperationalError("INSERT", {}, Exception("server closed the connection unexpectedly"))
+            write(*args)
+
+        monkeypatch.setattr(imports, 'write_appointments', write_then_fail)
+        job = ImportJob(user_id=1, format='csv')
+        db.add(job)
+        db.commit()
+        rows = imports.iter_csv_rows(io.BytesIO(CSV_UPLOAD.encode()))
+        with pytest.raises(OperationalError):
+            imports.run_import(db, job, rows, chunk_size=2)
+
+        fresh = TestingSessionLocal()
+        stored = fresh.get(ImportJob, job.id)
+        assert stored.status == ImportJob.FAILED and stored.finished_at is not None
+        assert stored.rows_imported == 2
+        assert 'server closed the connection' in json.loads(stored.errors)[-1]['error']
+        fresh.close()
+
+
+class TestAppointmentListing:
+    def test_lists_own_appointments_newest_first(self, client, auth_headers):
+        """Test that the listing returns the caller's appointments with reminders, honouring limit."""
+        client.post('/api/v1/appointments/import', data=CSV_UPLOAD,
+                    headers=dict(auth_headers, **{'Content-Type': 'text/csv'}))
+
+        response = client.get('/api/v1/appointments?limit=2', headers=auth_headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['appointments']) == 2
+        assert all(a['reminders'] for a in page['appointments'])
+
+        rest = client.get(f"/api/v1/appointments?limit=2&cursor={page['next_cursor']}", headers=auth_headers)
+        assert len(rest.get_json()['appointments']) == 1 and rest.get_json()['next_cursor'] is None
+        everything = client.get('/api/v1/appointments', headers=auth_headers).get_json()['appointments']
+        assert len(everything) == 3
+        assert [a['id'] for a in everything] == [a['id'] for a in page['appointments'] + rest.get_json()['appointments']]
+        assert client.get('/api/v1/appointments?limit=x', headers=auth_headers).status_code == 400
+        assert client.get('/api/v1/appointments').status_code == 401
+
+
+class TestReminderHistory:
+    def test_streams_pages_newest_first(self, client, auth_headers):
+        """Test that history is streamed newest first and `next` pages through the rest."""
+        client.post('/api/v1/appointments/import', data=CSV_UPLOAD,
+                    headers=dict(auth_headers, **{'Content-Type': 'text/csv'}))
+
+        first = client.get('/api/v1/appointments/reminders?limit=3', headers=auth_headers)
+        assert first.status_code == 200 and first.is_streamed
+        page = first.get_json()
+        ids = [r['id'] for r in page['reminders']]
+        assert ids == sorted(ids, reverse=True) and len(ids) == 3
+
+        rest = client.get(f"/api/v1/appointments/reminders?cursor={page['next_cursor']}",
+                          headers=auth_headers).get_json()
+        assert len(rest['reminders']) == 1 and rest['next_cursor'] is None
+        assert rest['reminders'][0]['id'] < ids[-1]
+        assert client.get('/api/v1/appointments/reminders?cursor=x', headers=auth_headers).status_code == 400
+
+    def test_empty_history(self, client, auth_headers):
+        """Test that a user without reminders gets an empty array."""
+        response = client.get('/api/v1/appointments/reminders', headers=auth_headers)
+        assert response.get_json() == {'reminders': [], 'next_cursor': None}
@@ -0,0 +1,24 @@
+from benchmarks.loadgen import percentile
+from benchmarks.run import compare
+
+
+def result(revision, rps, p99):
+    return {"revision": revision, "benchmarks": {"api": {"results": [
+        {"concurrency": 8, "login": {"requests_per_second": rps, "p99_ms": p99, "errors": 0}},
+    ]}}}
+
+
+class TestBenchmarkTools:
+    def test_percentile(self):
+        """Test nearest-rank percentiles over a known sample."""
+        samples = list(range(1, 101))
+        assert percentile(samples, 50) == 50
+        assert percentile(samples, 99) == 99
+        assert percentile([], 99) == 0.0
+
+    def test_compare_flags_regressions_past_threshold(self):
+        """Test that lower throughput or higher latency beyond the threshold is flagged, and noise is not."""
+        rows = {row[0]: row for row in compare(result("a", 100, 50), result("b", 80, 52), threshold=10)}
+        assert rows["api.results.concurrency=8.login.requests_per_second"][4] is True
+        assert rows["api.results.concurrency=8.login.p99_ms"][4] is False
+        assert "api.results.concurrency=8.login.errors" not in rows
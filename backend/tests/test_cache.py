@@ -0,0 +1,97 @@
+import time
+import pytest
+from sqlalchemy import event
+from app.core.cache import CachedResponse, ResponseCache
+from tests.conftest import engine
+from tests.fakes import DownRedis, FakeRedis
+
+CSV_UPLOAD = "title,starts_at,client_name,client_email,client_phone\nCheckup,2030-01-10T09:00:00Z,Ada,ada@example.com,\n"
+
+
+class TestResponseCache:
+    @pytest.mark.parametrize('redis_client', [None, FakeRedis(), DownRedis()])
+    def test_entries_are_per_user_and_invalidated_together(self, redis_client):
+        """Test that entries are kept per user and a user's invalidation drops only theirs."""
+        cache = ResponseCache('test', ttl=30, max_entries=10, redis_client=redis_client)
+        entry = CachedResponse('etag', 'application/json', b'{"a": 1}')
+        cache.set(1, '/a?', entry)
+        cache.set('1', '/b?', entry)
+        cache.set(2, '/a?', entry)
+
+        assert cache.get('1', '/a?') == entry
+        cache.invalidate(1)
+        assert cache.get(1, '/a?') is None and cache.get(1, '/b?') is None
+        assert cache.get(2, '/a?') == entry
+
+    @pytest.mark.parametrize('redis_client', [None, FakeRedis()])
+    def test_entry_rendered_before_an_invalidation_is_not_served(self, redis_client):
+        """Test that an entry stored under the generation read before an invalidation is never served."""
+        cache = ResponseCache('test', ttl=30, max_entries=10, redis_client=redis_client)
+        entry = CachedResponse('etag', 'application/json', b'{}')
+        generation = cache.generation(1)
+        cache.invalidate(1)
+        cache.set(1, '/a?', entry, generation=generation)
+        assert cache.get(1, '/a?') is None
+
+        cache.set(1, '/a?', entry, generation=cache.generation(1))
+        assert cache.get(1, '/a?') == entry
+
+    @pytest.mark.parametrize('redis_client', [None, FakeRedis()])
+    def test_entries_expire(self, redis_client):
+        """Test that an entry is not served past its TTL."""
+        cache = ResponseCache('test', ttl=30, max_entries=10, redis_client=redis_client)
+        cache.set(1, '/a?', CachedResponse('etag', 'application/json', b'{}'), ttl=0.05)
+        time.sleep(0.06)
+        assert cache.get(1, '/a?') is None
+
+    def test_local_cache_is_bounded(self):
+        """Test that the in-process cache evicts the least recently used entry."""
+        cache = ResponseCache('test', ttl=30, max_entries=2)
+        entry = CachedResponse('etag', 'application/json', b'{}')
+        cache.set(1, '/a?', entry)
+        cache.set(1, '/b?', entry)
+        cache.get(1, '/a?')
+        cache.set(1, '/c?', entry)
+        assert cache.get(1, '/b?') is None and cache.get(1, '/a?') == entry
+
+
+@pytest.fixture
+def statements():
+    """SQL statements run on the test database while the test runs."""
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        seen.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    yield seen
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+class TestConditionalGet:
+    def test_repeated_polls_hit_the_cache_and_revalidate_with_304(self, client, auth_headers, statements):
+        """Test that a repeated poll runs no queries and a matching If-None-Match gets an empty 304."""
+        first = client.get('/api/v1/appointments', headers=auth_headers)
+        assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+        etag = first.headers['ETag']
+
+        statements.clear()
+        second = client.get('/api/v1/appointments', headers=auth_headers)
+        assert second.headers['ETag'] == etag and second.data == first.data
+        not_modified = client.get('/api/v1/appointments', headers=dict(auth_headers, **{'If-None-Match': etag}))
+        assert not_modified.status_code == 304 and not_modified.data == b''
+        assert statements == []
+
+    def test_writes_invalidate_the_users_entries(self, client, auth_headers):
+        """Test that an import changes the listing's ETag straight away."""
+        etag = client.get('/api/v1/appointments', headers=auth_headers).headers['ETag']
+        client.post('/api/v1/appointments/import', data=CSV_UPLOAD,
+                    headers=dict(auth_headers, **{'Content-Type': 'text/csv'}))
+
+        response = client.get('/api/v1/appointments', headers=dict(auth_headers, **{'If-None-Match': etag}))
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+        assert [a['title'] for a in response.get_json()['appointments']] == ['Checkup']
+
+    def test_errors_are_not_cached(self, client, auth_headers):
+        """Test that only successful responses are cached."""
+        response = client.get('/api/v1/appointments?limit=x', headers=auth_headers)
+        assert response.status_code == 400 and 'ETag' not in response.headers
@@ -0,0 +1,129 @@
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+import pytest
+import redis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core import config
+from app.crud.reminder import create_appointment, utcnow
+from app.db.changefeed import Change, change_feed, notify
+from app.db.models import User
+from app.db.session import Base
+from app.workers.scheduler import Scheduler
+
+
+def add_appointment(db, starts_in, user_id=1):
+    return create_appointment(
+        db, user_id=user_id, title="Checkup", starts_at=utcnow() + starts_in, client_name="Client",
+        client_email="client@example.com", remind_before=(timedelta(hours=1),)
+    )
+
+
+class TestNotify:
+    def test_changes_are_announced_once_committed(self, db):
+        """Test that a transaction's changes go out as one event on commit and not at all on rollback."""
+        subscription = change_feed.subscribe()
+        try:
+            due_at = utcnow()
+            notify(db, [1], due_at + timedelta(minutes=5))
+            notify(db, [2], due_at)
+            assert subscription.wait(0) == []
+            db.commit()
+            assert subscription.wait(0) == [Change(frozenset({1, 2}), due_at)]
+
+            notify(db, [1])
+            db.rollback()
+            db.commit()
+            assert subscription.wait(0) == []
+        finally:
+            subscription.close()
+
+    def test_user_subscriptions_only_hear_of_their_changes(self):
+        """Test that a user's subscription skips other users' changes but not a catch-all."""
+        subscription = change_feed.subscribe(1)
+        try:
+            change_feed.deliver(Change(frozenset({2}), None))
+            assert subscription.wait(0) == []
+            change_feed.deliver(Change(None, None))
+            assert subscription.wait(0) == [Change(None, None)]
+        finally:
+            subscription.close()
+
+
+class TestSchedulerWakeUp:
+    def test_idle_scheduler_waits_for_a_due_change(self, tmp_path):
+        """Test that an idle scheduler does not poll, yet claims a new due reminder as soon as it is written."""
+        # A file database, which the scheduler's thread shares
+        engine = create_engine(f"sqlite:///{tmp_path / 'scheduler.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        db.add(User(email="owner@example.com", name="Owner", hashed_password="x"))
+        db.commit()
+        batches = []
+        scheduler = Scheduler(batches.append, owner="test", batch_size=10, poll_interval=0.01, feed=change_feed)
+        passes = []
+        run_once = scheduler.run_once
+        scheduler.run_once = lambda: passes.append(1) or run_once()
+
+        with patch('app.db.session.SessionLocal', new=Session):
+            thread = threading.Thread(target=scheduler.run)
+            thread.start()
+            try:
+                time.sleep(0.3)
+                add_appointment(db, timedelta(hours=2))  # Due in an hour: nothing to wake for
+                time.sleep(0.3)
+                assert len(passes) == 1
+
+                add_appointment(db, timedelta(hours=1))
+                deadline = time.monotonic() + 5
+                while not batches and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                assert len(passes) == 2 and len(batches[0]) == 1
+            finally:
+                scheduler.stop()
+                thread.join(5)
+        assert not thread.is_alive()
+        db.close()
+        engine.dispose()
+
+
+class TestChangeStream:
+    def test_stream_announces_the_users_changes(self, client, auth_headers):
+        """Test that the event stream sends a retry delay, heartbeats and an event per change."""
+        with patch.object(config, 'SSE_HEARTBEAT_SECONDS', 0.05), patch.object(config, 'SSE_MAX_SECONDS', 2):
+            response = client.get('/api/v1/appointments/changes', headers=auth_headers, buffered=False)
+            assert response.status_code == 200
+            assert response.mimetype == 'text/event-stream'
+            assert response.headers['Cache-Control'] == 'no-cache'
+            events = response.response
+            assert next(events) == b'retry: 3000\n\n'
+            assert next(events) == b': keep-alive\n\n'
+
+            change_feed.deliver(Change(None, None))
+            assert next(events).startswith(b'event: changed\ndata: ')
+            response.close()
+
+    def test_streams_beyond_the_cap_are_refused(self, client, auth_headers):
+        """Test that a worker holding SSE_MAX_STREAMS streams answers 503 with Retry-After until one closes."""
+        with patch.object(config, 'SSE_MAX_STREAMS', 1):
+            first = client.get('/api/v1/appointments/changes', headers=auth_headers, buffered=False)
+            assert first.status_code == 200
+            refused = client.get('/api/v1/appointments/changes', headers=auth_headers)
+            assert refused.status_code == 503 and refused.headers['Retry-After'] == '3'
+            first.close()
+            response = client.get('/api/v1/appointments/changes', headers=auth_headers, buffered=False)
+            assert response.status_code == 200
+            response.close()
+
+    def test_failed_subscription_gives_back_its_slot(self, client, auth_headers):
+        """Test that a stream whose subscription fails does not keep its place under SSE_MAX_STREAMS."""
+        with patch.object(config, 'SSE_MAX_STREAMS', 1):
+            with patch.object(change_feed, 'subscribe', side_effect=redis.ConnectionError("Redis is down")):
+                with pytest.raises(redis.ConnectionError):
+                    client.get('/api/v1/appointments/changes', headers=auth_headers)
+            response = client.get('/api/v1/appointments/changes', headers=auth_headers, buffered=False)
+            assert response.status_code == 200
+            response.close()
@@ -0,0 +1,106 @@
+import pytest
+from sqlalchemy import create_engine, exc, inspect, text
+from app.db.migrations import MIGRATIONS, upgrade
+from app.db.pool import InstrumentedQueuePool, pool_metrics
+from app.db.session import Base, engine_options
+
+
+class TestConnectionPool:
+    def test_engine_options_for_postgres(self):
+        """Test that pool sizing, pre-ping and statement timeout are applied to Postgres."""
+        options = engine_options('postgresql://user:password@db:5432/app_db')
+        assert options['poolclass'] is InstrumentedQueuePool
+        assert options['pool_pre_ping'] is True
+        assert 'statement_timeout' in options['connect_args']['options']
+        assert engine_options('sqlite://') == {}
+
+    def test_checkout_metrics(self):
+        """Test that checkouts, overflow and timeouts are counted."""
+        test_engine = create_engine(
+            'sqlite://', poolclass=InstrumentedQueuePool,
+            pool_size=1, max_overflow=1, pool_timeout=0.05,
+        )
+        pool_metrics.reset()
+        observed = []
+        pool_metrics.add_listener(lambda *args: observed.append(args))
+        try:
+            first = test_engine.connect()
+            second = test_engine.connect()
+            with pytest.raises(exc.TimeoutError):
+                test_engine.connect()
+            second.close()
+            first.close()
+        finally:
+            pool_metrics._listeners.clear()
+
+        stats = pool_metrics.stats()
+        assert stats['checkouts'] == 2
+        assert stats['overflows'] == 1
+        assert stats['timeouts'] == 1
+        assert len(observed) == 2
+
+
+class TestMigrations:
+    def test_upgrade_applies_each_migration_once(self):
+        """Test that upgrade creates the schema and is a no-op the second time."""
+        test_engine = create_engine('sqlite://')
+        applied = upgrade(test_engine)
+        assert applied == sorted(version for version, _, _ in MIGRATIONS)
+        assert 'users' in inspect(test_engine).get_table_names()
+        assert upgrade(test_engine) == []
+
+    def test_upgrade_builds_the_schema_of_the_models(self):
+        """Test that a fresh database migrated from 0001 has the columns and indexes the models create."""
+        migrated, created = create_engine('sqlite://'), create_engine('sqlite://')
+        upgrade(migrated)
+        Base.metadata.create_all(bind=created)
+
+        def schema(test_engine):
+            inspector = inspect(test_engine)
+            return {
+                table: ({c['name'] for c in inspector.get_columns(table)},
+                        {i['name'] for i in inspector.get_indexes(table)})
+                for table in Base.metadata.tables
+            }
+
+        assert schema(migrated) == schema(created)
+
+    def test_upgrade_adds_columns_to_existing_tables(self):
+        """Test that a database created before a column existed gets it added."""
+        test_engine = create_engine('sqlite://')
+        with test_engine.begin() as conn:
+            conn.execute(text(
+                'CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, name VARCHAR NOT NULL,'
+                ' hashed_password VARCHAR NOT NULL, is_active BOOLEAN, created_at DATETIME, updated_at DATETIME)'
+            ))
+        upgrade(test_engine)
+        assert 'is_admin' in {c['name'] for c in inspect(test_engine).get_columns('users')}
+
+    def test_email_index_replaced_with_case_insensitive_one(self):
+        """Test that an existing case-sensitive email index is swapped for the lower(email) one."""
+        test_engine = create_engine('sqlite://')
+        with test_engine.begin() as conn:
+            conn.execute(text(
+                'CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, name VARCHAR NOT NULL,'
+                ' hashed_password VARCHAR NOT NULL, is_active BOOLEAN, created_at DATETIME, updated_at DATETIME)'
+            ))
+            conn.execute(text('CREATE UNIQUE INDEX ix_users_email ON users (email)'))
+        upgrade(test_engine)
+        with test_engine.connect() as conn:
+            names = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+            assert 'ix_users_email' not in names and 'uq_users_email_lower' in names
+            conn.execute(text("INSERT INTO users (email, name, hashed_password) VALUES ('A@x.com', 'A', 'x')"))
+            with pytest.raises(exc.IntegrityError):
+                conn.execute(text("INSERT INTO users (email, name, hashed_password) VALUES ('a@X.com', 'A', 'x')"))
+
+    def test_case_duplicates_block_the_email_index(self):
+        """Test that accounts differing only in email case stop the migration instead of being dropped."""
+        test_engine = create_engine('sqlite://')
+        with test_engine.begin() as conn:
+            conn.execute(text(
+                'CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, name VARCHAR NOT NULL,'
+                ' hashed_password VARCHAR NOT NULL, is_active BOOLEAN, created_at DATETIME, updated_at DATETIME)'
+            ))
+            conn.execute(text("INSERT INTO users (email, name, hashed_password) VALUES ('A@x.com', 'A', 'x'), ('a@x.com', 'a', 'x')"))
+        with pytest.raises(RuntimeError, match='a@x.com'):
+            upgrade(test_engine)
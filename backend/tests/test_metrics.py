@@ -0,0 +1,75 @@
+import os
+import time
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics:
+    def test_route_latency_and_spans_are_recorded(self, client, auth_headers):
+        """Test that a login observes the route histogram and the password, query and JSON spans."""
+        route = {'method': 'POST', 'route': '/api/v1/auth/login', 'status': '200'}
+        before = {
+            'route': sample('http_request_duration_seconds_count', **route),
+            'verify': sample('app_span_duration_seconds_count', span='verify_password'),
+            'query': sample('app_span_duration_seconds_count', span='db_query'),
+            'json': sample('app_span_duration_seconds_count', span='json_dumps'),
+        }
+        credentials = {"email": "metrics@example.com", "password": "metricspassword"}
+        client.post('/api/v1/auth/register', json=dict(credentials, name="Metrics"))
+        assert client.post('/api/v1/auth/login', json=credentials).status_code == 200
+
+        assert sample('http_request_duration_seconds_count', **route) == before['route'] + 1
+        assert sample('app_span_duration_seconds_count', span='verify_password') == before['verify'] + 1
+        assert sample('app_span_duration_seconds_count', span='db_query') > before['query']
+        assert sample('app_span_duration_seconds_count', span='json_dumps') > before['json']
+
+    def test_unmatched_routes_share_one_label(self, client):
+        """Test that unknown paths do not create a label per path."""
+        before = sample('http_request_duration_seconds_count', method='GET', route='unmatched', status='404')
+        client.get('/no/such/path/1')
+        client.get('/no/such/path/2')
+        assert sample('http_request_duration_seconds_count', method='GET', route='unmatched', status='404') == before + 2
+
+    def test_metrics_endpoint(self, client):
+        """Test that /metrics serves the Prometheus text format with the pool gauges."""
+        client.get('/')
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        body = response.get_data(as_text=True)
+        assert 'http_request_duration_seconds_bucket{' in body
+        assert 'hashing_pool_queue_depth' in body
+        assert 'db_pool_checkouts_total' in body
+
+
+class TestRequestProfiler:
+    def test_profile_on_request(self, client, tmp_path):
+        """Test that a request with the profile token is profiled and gets a Server-Timing breakdown."""
+        with patch.multiple('app.core.profiling.request_profiler', token='secret', output_dir=str(tmp_path)):
+            plain = client.post('/api/v1/auth/login', json={"email": "nobody@example.com", "password": "x"})
+            profiled = client.post('/api/v1/auth/login', json={"email": "nobody2@example.com", "password": "x"},
+                                   headers={'X-Profile': 'secret'})
+
+        assert 'Server-Timing' not in plain.headers
+        assert 'db_query;dur=' in profiled.headers['Server-Timing']
+        assert os.listdir(tmp_path) == [profiled.headers['X-Profile-File']]
+
+    def test_only_the_newest_profiles_are_kept(self, client, tmp_path):
+        """Test that sampled profiles beyond max_files replace the oldest ones."""
+        with patch.multiple('app.core.profiling.request_profiler', sample_rate=1.0, output_dir=str(tmp_path),
+                            max_files=2):
+            for _ in range(4):
+                client.get('/')
+                time.sleep(0.01)  # Distinct modification times
+        assert len(os.listdir(tmp_path)) == 2
+
+    def test_wrong_token_is_not_profiled(self, client, tmp_path):
+        """Test that a request with a wrong token runs unprofiled."""
+        with patch.multiple('app.core.profiling.request_profiler', token='secret', output_dir=str(tmp_path)):
+            response = client.get('/', headers={'X-Profile': 'guess'})
+        assert 'Server-Timing' not in response.headers
+        assert os.listdir(tmp_path) == []
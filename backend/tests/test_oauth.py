@@ -0,0 +1,76 @@
+import time
+import pytest
+import requests
+from app.core.http import CircuitBreaker, CircuitOpen, HTTPClient
+from app.core.oauth import GoogleOAuth, JWKSCache, OAuthError
+from tests.fakes import FakeHTTPServer, FakeOAuthProvider
+
+
+def google_for(provider, client_id='client-id', client=None):
+    client = client or HTTPClient(pool_size=2, connect_timeout=1, read_timeout=1)
+    jwks = JWKSCache(provider.jwks_url, client, ttl=60)
+    return GoogleOAuth(client_id, 'secret', 'http://localhost/callback', provider.token_url, jwks, client)
+
+
+class TestCircuitBreaker:
+    def test_opens_after_failures_and_recovers_after_a_good_trial(self):
+        """Test that the breaker opens at the threshold, allows one trial call, and closes on success."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.state == 'closed'
+        breaker.record_failure()
+        assert breaker.state == 'open'
+        assert breaker.before_call() > 0
+        time.sleep(0.06)
+        assert breaker.state == 'half-open'
+        assert breaker.before_call() == 0
+        # A second caller waits while the trial call is in flight
+        assert breaker.before_call() > 0
+        breaker.record_success()
+        assert breaker.state == 'closed'
+
+    def test_client_fails_fast_while_open(self):
+        """Test that 5xx responses open the circuit and later calls are refused without a request."""
+        client = HTTPClient(pool_size=1, connect_timeout=1, read_timeout=1, failure_threshold=2, reset_timeout=60)
+        with FakeHTTPServer(status=503) as server:
+            for _ in range(2):
+                assert client.post(server.url, json={}).status_code == 503
+            with pytest.raises(CircuitOpen):
+                client.post(server.url, json={})
+            assert len(server.requests) == 2
+
+    def test_read_timeout_counts_as_failure(self):
+        """Test that a slow host trips the read timeout and is recorded against its breaker."""
+        client = HTTPClient(pool_size=1, connect_timeout=1, read_timeout=0.05, failure_threshold=1)
+        with FakeHTTPServer(delay=0.3) as server:
+            with pytest.raises(requests.Timeout):
+                client.post(server.url, json={})
+            assert client.breaker(server.url).state == 'open'
+
+
+class TestGoogleOAuth:
+    def test_sign_in_verifies_id_token_locally(self):
+        """Test that sign-in returns the ID token claims and caches the signing keys."""
+        with FakeOAuthProvider('client-id', email='someone@example.com') as provider:
+            google = google_for(provider)
+            claims = google.sign_in('code-1')
+            google.sign_in('code-2')
+        assert claims['email'] == 'someone@example.com'
+        assert provider.jwks_fetches == 1
+
+    def test_rejects_token_for_another_client(self):
+        """Test that an ID token minted for a different audience is refused."""
+        with FakeOAuthProvider('other-client') as provider:
+            with pytest.raises(OAuthError):
+                google_for(provider).sign_in('code')
+
+    def test_unknown_key_refetch_is_rate_limited(self):
+        """Test that tokens signed with an unknown kid refetch the keys at most once per interval."""
+        with FakeOAuthProvider('client-id') as provider:
+            google = google_for(provider)
+            google.sign_in('code')
+            provider.kid = 'rotated-key'
+            for _ in range(3):
+                with pytest.raises(OAuthError):
+                    google.sign_in('code')
+        assert provider.jwks_fetches == 1
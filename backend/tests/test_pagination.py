@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from app.crud.export import export, users_export_query
+from app.crud.pagination import decode_cursor, encode_cursor
+from app.crud.user import USER_ORDER, list_users
+from app.db.models import User
+from tests.conftest import TestingSessionLocal
+
+
+def add_users(db, count, start=datetime(2030, 1, 1)):
+    # Three accounts per timestamp, so pages split ties on created_at
+    db.add_all([
+        User(email=f"user{i}@example.com", name=f"User {i}", hashed_password="x",
+             created_at=start + timedelta(minutes=i // 3))
+        for i in range(count)
+    ])
+    db.commit()
+
+
+class TestKeysetPagination:
+    def test_pages_cover_every_row_once_in_order(self, db):
+        """Test that following cursors visits every account once, newest first, across created_at ties."""
+        add_users(db, 10)
+        seen, cursor = [], None
+        while True:
+            page = list_users(db, limit=4, cursor=cursor)
+            seen.extend(page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        keys = [(u.created_at, u.id) for u in seen]
+        assert len(seen) == 11 and len(set(keys)) == 11
+        assert keys == sorted(keys, reverse=True)
+
+    def test_exact_last_page_has_no_cursor(self, db):
+        """Test that a page ending on the last row does not offer another page."""
+        add_users(db, 3)
+        assert list_users(db, limit=4).next_cursor is None
+        assert list_users(db, limit=2).next_cursor is not None
+
+    @pytest.mark.parametrize('cursor', ['x', encode_cursor([1]), encode_cursor(['not-a-date', 1]),
+                                        encode_cursor(['2030-01-01T00:00:00', 'one'])])
+    def test_malformed_cursors_are_rejected(self, cursor):
+        """Test that cursors that do not decode to the sort key raise ValueError."""
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, USER_ORDER)
+
+
+class TestStreamingExport:
+    def test_csv_and_ndjson_chunks_per_batch(self, db):
+        """Test that exports come out one chunk per batch and parse back to every row."""
+        add_users(db, 5)
+        csv_chunks = list(export(db, users_export_query(), 'csv', batch_size=2))
+        ndjson_chunks = list(export(db, users_export_query(), 'ndjson', batch_size=2))
+
+        assert len(csv_chunks) == 3 and len(ndjson_chunks) == 3
+        rows = list(csv.DictReader(io.StringIO(b''.join(csv_chunks).decode())))
+        lines = [json.loads(line) for line in b''.join(ndjson_chunks).splitlines()]
+        assert [r['email'] for r in rows] == [line['email'] for line in lines]
+        assert len(rows) == 6 and rows[0]['created_at'] == lines[0]['created_at']
+
+    def test_admin_export_and_listing(self, client, auth_headers):
+        """Test that administrators can page through and download accounts; others cannot."""
+        assert client.get('/api/v1/admin/users/export', headers=auth_headers).status_code == 403
+        db = TestingSessionLocal()
+        db.query(User).update({User.is_admin: True})
+        db.commit()
+        add_users(db, 3)
+        db.close()
+
+        response = client.get('/api/v1/admin/users/export?format=ndjson', headers=auth_headers)
+        assert response.mimetype == 'application/x-ndjson'
+        assert 'users.ndjson' in response.headers['Content-Disposition']
+        assert len(response.data.splitlines()) == 4
+
+        page = client.get('/api/v1/admin/users?limit=3', headers=auth_headers).get_json()
+        assert len(page['users']) == 3 and page['next_cursor']
+        assert client.get('/api/v1/admin/users/export?format=xml', headers=auth_headers).status_code == 400
+
+    def test_user_reminder_export(self, client, auth_headers):
+        """Test that a user downloads their own reminders as CSV."""
+        from tests.test_appointments import CSV_UPLOAD
+        client.post('/api/v1/appointments/import', data=CSV_UPLOAD,
+                    headers=dict(auth_headers, **{'Content-Type': 'text/csv'}))
+        response = client.get('/api/v1/appointments/reminders/export', headers=auth_headers)
+        rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+        assert response.mimetype == 'text/csv' and len(rows) == 4
+        assert {r['title'] for r in rows} == {'Checkup', 'Cleaning', 'Follow-up, extended'}
@@ -0,0 +1,178 @@
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from app.core.recurrence import occurrences, parse_rrule, to_utc, window_table
+from app.crud.series import create_series, expand_due_series, update_series
+from app.db.models import Appointment, Reminder
+
+# Clocks in New York go back on 2030-11-03
+NOW = datetime(2030, 10, 28, 12, tzinfo=timezone.utc)
+
+
+def series_values(**overrides):
+    values = {
+        "title": "Therapy", "client_name": "Client", "client_email": "client@example.com", "client_phone": None,
+        "starts_at_local": datetime(2030, 10, 1, 9), "timezone": "America/New_York", "rrule": "FREQ=WEEKLY",
+    }
+    values.update(overrides)
+    return values
+
+
+def starts(db, series):
+    return sorted(
+        starts_at.replace(tzinfo=timezone.utc) for (starts_at,) in
+        db.query(Appointment.starts_at).filter(Appointment.series_id == series.id)
+    )
+
+
+class TestRules:
+    def test_weekly_and_monthly_rules(self):
+        """Test that BYDAY, INTERVAL, COUNT and out-of-range month days expand as RFC 5545 says."""
+        rule = parse_rrule("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;COUNT=4")
+        assert list(occurrences(rule, datetime(2030, 1, 3, 9), datetime(2030, 1, 1), datetime(2031, 1, 1))) == [
+            datetime(2030, 1, 3, 9), datetime(2030, 1, 14, 9), datetime(2030, 1, 17, 9), datetime(2030, 1, 28, 9),
+        ]
+        rule = parse_rrule("FREQ=MONTHLY;BYMONTHDAY=31")
+        assert list(occurrences(rule, datetime(2030, 1, 31, 9), datetime(2030, 2, 1), datetime(2030, 6, 1))) == [
+            datetime(2030, 3, 31, 9), datetime(2030, 5, 31, 9),
+        ]
+
+    def test_expansion_starts_at_the_window(self):
+        """Test that a long-running rule is not walked from its first occurrence."""
+        rule = parse_rrule("FREQ=DAILY")
+        window = list(occurrences(rule, datetime(2000, 1, 1, 9), datetime(2030, 1, 1), datetime(2030, 1, 3)))
+        assert window == [datetime(2030, 1, 1, 9), datetime(2030, 1, 2, 9)]
+
+    @pytest.mark.parametrize("text", [
+        "FREQ=YEARLY", "FREQ=DAILY;BYDAY=MO", "FREQ=WEEKLY;INTERVAL=0", "FREQ=WEEKLY;BYDAY=XX",
+        "FREQ=DAILY;COUNT=2;UNTIL=20300101", "FREQ=DAILY;BYHOUR=9", "FREQ=MONTHLY;BYMONTHDAY=32",
+    ])
+    def test_rejects_unsupported_rules(self, text):
+        """Test that rules outside the supported subset are refused."""
+        with pytest.raises(ValueError):
+            parse_rrule(text)
+
+    @pytest.mark.parametrize("zone", ["America/New_York", "Europe/London", "Australia/Lord_Howe", "Asia/Kolkata"])
+    @pytest.mark.parametrize("day", [date(2030, 3, 5), date(2030, 3, 28), date(2030, 9, 25), date(2030, 10, 22)])
+    def test_offset_table_matches_zoneinfo(self, zone, day):
+        """Test that conversions through a window's offset table agree with zoneinfo, gaps and folds included."""
+        table = window_table(zone, day, 14)
+        local = datetime.combine(day, datetime.min.time())
+        while local < datetime.combine(day, datetime.min.time()) + timedelta(days=14):
+            assert to_utc(local, table) == local.replace(tzinfo=ZoneInfo(zone)).astimezone(timezone.utc)
+            local += timedelta(minutes=15)
+
+
+class TestSeriesExpansion:
+    def test_materializes_a_window_in_local_time(self, db):
+        """Test that occurrences within the window become appointments at 09:00 local across a DST change."""
+        series = create_series(db, 1, series_values(), now=NOW)
+
+        # 2030-10-29 and 2030-11-05 fall in the 14-day window; 09:00 is 13:00 UTC before the change, 14:00 after
+        assert starts(db, series) == [
+            datetime(2030, 10, 29, 13, tzinfo=timezone.utc), datetime(2030, 11, 5, 14, tzinfo=timezone.utc),
+        ]
+        assert db.query(Reminder).count() == 2
+        assert series.expanded_until.replace(tzinfo=timezone.utc) == NOW + timedelta(days=14)
+
+    def test_background_step_tops_up_the_window_once(self, db):
+        """Test that the expander adds only new occurrences and leaves series with time left alone."""
+        series = create_series(db, 1, series_values(), now=NOW)
+        assert expand_due_series(db, now=NOW + timedelta(hours=1)) == set()
+
+        later = NOW + timedelta(days=7)
+        assert expand_due_series(db, now=later) == {1}
+        assert starts(db, series)[-1] == datetime(2030, 11, 12, 14, tzinfo=timezone.utc)
+        assert len(starts(db, series)) == 3
+        assert expand_due_series(db, now=later) == set()
+
+    def test_backlog_beyond_one_batch_is_expanded_in_one_run(self, db):
+        """Test that the expander keeps taking batches while they come back full."""
+        series = [create_series(db, 1, series_values(), now=NOW) for _ in range(5)]
+        later = NOW + timedelta(days=7)
+        assert expand_due_series(db, now=later, batch_size=2) == {1}
+        for one in series:
+            db.refresh(one)
+            assert one.expanded_until.replace(tzinfo=timezone.utc) == later + timedelta(days=14)
+
+    def test_finished_series_are_not_expanded_again(self, db):
+        """Test that a series whose COUNT is used up drops out of the expander's scan."""
+        series = create_series(db, 1, series_values(rrule="FREQ=WEEKLY;COUNT=3"), now=NOW)
+        assert series.finished
+        assert expand_due_series(db, now=NOW + timedelta(days=30)) == set()
+
+    def test_change_replaces_only_future_unreminded_occurrences(self, db):
+        """Test that editing a series keeps reminded occurrences and re-expands the rest from the new rule."""
+        series = create_series(db, 1, series_values(), now=NOW)
+        first = db.query(Appointment).filter(Appointment.series_id == series.id).order_by(Appointment.starts_at)[0]
+        first.reminders[0].status = Reminder.SENT
+        db.commit()
+
+        update_series(db, series, {"starts_at_local": datetime(2030, 10, 1, 15)}, now=NOW)
+
+        assert series.version == 2
+        assert starts(db, series) == [
+            datetime(2030, 10, 29, 13, tzinfo=timezone.utc),  # Already reminded of, kept
+            datetime(2030, 10, 29, 19, tzinfo=timezone.utc), datetime(2030, 11, 5, 20, tzinfo=timezone.utc),
+        ]
+
+
+class TestSeriesAPI:
+    def test_series_lifecycle(self, client, auth_headers):
+        """Test creating, reading, changing and deleting a recurring appointment."""
+        payload = {"title": "Check-up", "starts_at": "2030-01-06T10:00:00", "timezone": "Europe/Paris",
+                   "rrule": "FREQ=MONTHLY", "client_name": "Client", "client_email": "client@example.com"}
+        response = client.post('/api/v1/appointments/series', json=payload, headers=auth_headers)
+        assert response.status_code == 201
+        series = response.get_json()
+        assert series["starts_at"] == "2030-01-06T10:00:00" and series["timezone"] == "Europe/Paris"
+        location = response.headers["Location"]
+
+        response = client.patch(location, json={"title": "Follow-up"}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.get_json()["title"] == "Follow-up" and response.get_json()["version"] == 2
+        assert client.get(location, headers=auth_headers).get_json()["title"] == "Follow-up"
+
+        assert client.delete(location, headers=auth_headers).status_code == 204
+        assert client.get(location, headers=auth_headers).status_code == 404
+
+    def test_daily_series_shows_upcoming_appointments(self, client, auth_headers):
+        """Test that a new series' first window shows up in the appointment listing straight away."""
+        client.get('/api/v1/appointments', headers=auth_headers)  # Cached until the series is added
+        tomorrow = (datetime.now() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+        payload = {"title": "Daily", "starts_at": tomorrow.isoformat(), "rrule": "FREQ=DAILY;COUNT=3",
+                   "client_name": "Client", "client_phone": "+15550100"}
+        response = client.post('/api/v1/appointments/series', json=payload, headers=auth_headers)
+        assert response.get_json()["timezone"] == "UTC"
+        assert len(response.get_json()["upcoming"]) == 3
+
+        listing = client.get('/api/v1/appointments', headers=auth_headers).get_json()["appointments"]
+        assert len(listing) == 3
+
+    @pytest.mark.parametrize("changes, message", [
+        ({"rrule": "FREQ=HOURLY"}, "FREQ must be one of"),
+        ({"timezone": "Mars/Olympus"}, "Unknown time zone"),
+        ({"starts_at": "2030-01-06T10:00:00+01:00"}, "takes no offset"),
+        ({"client_email": None}, "Either client_email or client_phone"),
+    ])
+    def test_rejects_invalid_series(self, client, auth_headers, changes, message):
+        """Test that invalid rules, zones and start times are refused."""
+        payload = {"title": "Check-up", "starts_at": "2030-01-06T10:00:00", "rrule": "FREQ=WEEKLY",
+                   "client_name": "Client", "client_email": "client@example.com"}
+        response = client.post('/api/v1/appointments/series', json=dict(payload, **changes), headers=auth_headers)
+        assert response.status_code == 400
+        assert message in response.get_json()["error"]
+
+    def test_other_users_series_are_not_found(self, client, auth_headers):
+        """Test that a series is only visible to its owner."""
+        credentials = {"email": "other@example.com", "password": "otherpassword"}
+        client.post('/api/v1/auth/register', json=dict(credentials, name="Other"))
+        token = client.post('/api/v1/auth/login', json=credentials).get_json()["access_token"]
+        payload = {"title": "Check-up", "starts_at": "2030-01-06T10:00:00", "rrule": "FREQ=WEEKLY",
+                   "client_name": "Client", "client_email": "client@example.com"}
+        location = client.post('/api/v1/appointments/series', json=payload,
+                               headers={"Authorization": f"Bearer {token}"}).headers["Location"]
+
+        assert client.get(location, headers=auth_headers).status_code == 404
+        assert client.delete(location, headers=auth_headers).status_code == 404
+        assert client.get(location, headers={"Authorization": f"Bearer {token}"}).status_code == 200
@@ -0,0 +1,339 @@
+import pytest
+import redis
+from datetime import timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy import exc
+from app.core import config
+from app.core.idempotency import DONE, PENDING, IdempotencyStore
+from app.db.models import OutboxEvent, Reminder, User
+from app.crud.organization import create_organization
+from app.crud.outbox import relay_outbox, reminder_message
+from app.crud.reminder import (
+    claim_due_reminders, claim_due_reminders_fairly, create_appointment, release_expired_leases, utcnow
+)
+from app.crud.stats import backfill_delivery_rollups, delivery_stats
+from app.workers.delivery import DeliveryWorker, record_outcomes, reminder_relay
+from app.workers.queue import DeliveryQueue
+from app.workers.scheduler import Scheduler, TenantQuota
+from app.workers.transports import HTTPTransport, SMTPTransport, TransportError
+from tests.fakes import DownRedis, FakeHTTPServer, FakeRedis, FakeSMTPServer
+
+
+def add_appointment(db, starts_in, user_id=1, **contacts):
+    contacts.setdefault("client_email", "client@example.com")
+    return create_appointment(
+        db, user_id=user_id, title="Checkup", starts_at=utcnow() + starts_in, client_name="Client",
+        remind_before=(timedelta(hours=1),), **contacts
+    )
+
+
+class TestReminderClaims:
+    def test_create_appointment_schedules_reminder_per_channel(self, db):
+        """Test that every contact channel gets a reminder at the lead time."""
+        appointment = add_appointment(db, timedelta(hours=3), client_phone="+15550100")
+        assert sorted(r.channel for r in appointment.reminders) == ["email", "sms"]
+        assert all(r.due_at == appointment.starts_at - timedelta(hours=1) for r in appointment.reminders)
+        assert all(r.status == Reminder.PENDING for r in appointment.reminders)
+
+    def test_claims_only_due_reminders_in_disjoint_batches(self, db):
+        """Test that claims take the earliest due reminders and never hand one out twice."""
+        for minutes in (10, 20, 30):
+            add_appointment(db, timedelta(minutes=minutes))
+        add_appointment(db, timedelta(hours=5))  # Not due yet
+
+        first = claim_due_reminders(db, "scheduler-a", batch_size=2, lease_seconds=60)
+        second = claim_due_reminders(db, "scheduler-b", batch_size=2, lease_seconds=60)
+
+        assert len(first) == 2 and len(second) == 1
+        assert first[0].due_at <= first[1].due_at <= second[0].due_at
+        assert {r.lease_owner for r in first} == {"scheduler-a"}
+        assert claim_due_reminders(db, "scheduler-c", batch_size=2, lease_seconds=60) == []
+
+    def test_expired_leases_are_released(self, db):
+        """Test that a claim abandoned past its lease becomes claimable again."""
+        add_appointment(db, timedelta(minutes=10))
+        claimed = claim_due_reminders(db, "crashed", batch_size=10, lease_seconds=30)
+        assert release_expired_leases(db) == 0
+        assert release_expired_leases(db, now=utcnow() + timedelta(seconds=31)) == 1
+
+        reclaimed = claim_due_reminders(db, "survivor", batch_size=10, lease_seconds=30)
+        assert [r.id for r in reclaimed] == [r.id for r in claimed]
+
+
+class TestTenantFairness:
+    def add_tenant(self, db, due, reminders_per_minute=None):
+        """An organization with one member who has `due` reminders due."""
+        organization = create_organization(db, "Tenant", reminders_per_minute)
+        user = User(email=f"member{organization.id}@example.com", name="Member", hashed_password="x",
+                    organization_id=organization.id)
+        db.add(user)
+        db.commit()
+        for minutes in range(due):
+            add_appointment(db, timedelta(minutes=minutes + 1), user_id=user.id)
+        return organization
+
+    def test_reminders_are_filed_under_the_owners_organization(self, db):
+        """Test that reminders carry their owner's organization, and 0 outside any."""
+        organization = self.add_tenant(db, due=1)
+        add_appointment(db, timedelta(minutes=10))
+        assert sorted(r.tenant_id for r in db.query(Reminder)) == [0, organization.id]
+
+    def test_large_backlog_does_not_starve_other_tenants(self, db):
+        """Test that a batch is shared across tenants and small tenants' spare share goes to the big one."""
+        big = self.add_tenant(db, due=30)
+        small = self.add_tenant(db, due=2)
+        for minutes in (40, 50, 60):
+            add_appointment(db, timedelta(minutes=minutes))  # Latest due, outside any organization
+
+        claimed = claim_due_reminders_fairly(db, "scheduler", batch_size=12, lease_seconds=60)
+
+        per_tenant = {}
+        for reminder in {r.id: r for r in claimed}.values():
+            per_tenant[reminder.tenant_id] = per_tenant.get(reminder.tenant_id, 0) + 1
+        # Later rounds for the big tenant must not hand back the rows its first round locked
+        assert len(claimed) == 12
+        assert per_tenant == {big.id: 7, small.id: 2, 0: 3}
+        db.expire_all()
+        assert db.query(Reminder).filter(Reminder.status == Reminder.CLAIMED).count() == 12
+
+    def test_quota_caps_claims_per_tenant(self, db):
+        """Test that a tenant over its quota keeps its reminders pending while others proceed."""
+        limited = self.add_tenant(db, due=5, reminders_per_minute=2)
+        unlimited = self.add_tenant(db, due=5)
+        quota = TenantQuota(default_per_minute=0)
+
+        first = claim_due_reminders_fairly(db, "scheduler", batch_size=20, lease_seconds=60, quota=quota)
+        second = claim_due_reminders_fairly(db, "scheduler", batch_size=20, lease_seconds=60, quota=quota)
+
+        assert sorted(r.tenant_id for r in first) == [limited.id] * 2 + [unlimited.id] * 5
+        assert second == []
+        assert db.query(Reminder).filter(Reminder.status == Reminder.PENDING).count() == 3
+
+    def test_unclaimed_quota_is_given_back(self, db):
+        """Test that quota granted for rows that could not be claimed stays available to the tenant."""
+        organization = self.add_tenant(db, due=2, reminders_per_minute=5)
+        quota = TenantQuota(default_per_minute=0)
+
+        claimed = claim_due_reminders_fairly(db, "scheduler", batch_size=20, lease_seconds=60, quota=quota)
+
+        assert len(claimed) == 2
+        assert quota(organization.id, 5, 5) == 3
+
+    def test_default_quota_applies_to_organizations_only(self):
+        """Test that the default quota throttles organizations but not tenant 0 or opted-out tenants."""
+        quota = TenantQuota(default_per_minute=3)
+        assert quota(7, None, 5) == 3
+        assert quota(7, None, 5) == 0
+        assert quota(8, 0, 5) == 5
+        assert quota(0, None, 50) == 50
+
+
+class TestScheduler:
+    def test_run_once_dispatches_claimed_batch(self, db):
+        """Test that a scheduler pass hands claimed reminders with their appointment to dispatch."""
+        add_appointment(db, timedelta(minutes=10), client_phone="+15550100")
+        batches = []
+        scheduler = Scheduler(batches.append, owner="test", batch_size=10)
+
+        assert scheduler.run_once() == 2
+        assert scheduler.run_once() == 0
+        assert len(batches) == 1
+        assert {r.appointment.title for r in batches[0]} == {"Checkup"}
+
+
+class TestDelivery:
+    def deliver_due(self, db, transports, max_attempts=3):
+        queue, dead_letters = DeliveryQueue("test"), DeliveryQueue("test-dead")
+        Scheduler(owner="test", relay=reminder_relay(queue)).run_once()
+        worker = DeliveryWorker(queue, transports, dead_letters, max_attempts=max_attempts)
+        try:
+            worker.run_once(timeout=0)
+        finally:
+            worker.close()
+        db.expire_all()
+        return dead_letters
+
+    def test_sends_over_pooled_connections(self, db):
+        """Test that a batch goes out over the fake SMTP server and HTTP stub and is marked sent."""
+        for minutes in (10, 20, 30):
+            add_appointment(db, timedelta(minutes=minutes), client_phone="+15550100")
+
+        with FakeSMTPServer() as smtp, FakeHTTPServer() as sms:
+            transports = {
+                "email": SMTPTransport("127.0.0.1", smtp.port, "noreply@example.com", concurrency=1),
+                "sms": HTTPTransport(sms.url, concurrency=1),
+            }
+            self.deliver_due(db, transports)
+
+            assert len(smtp.messages) == 3 and smtp.connections == 1
+            assert len(sms.requests) == 3 and sms.connections == 1
+            assert "Checkup" in sms.requests[0]["body"]
+
+        reminders = db.query(Reminder).all()
+        assert {r.status for r in reminders} == {Reminder.SENT}
+        assert all(r.attempts == 1 and r.sent_at is not None for r in reminders)
+
+    def test_retries_with_backoff_then_dead_letters(self, db):
+        """Test that provider errors reschedule the reminder and the last attempt dead-letters it."""
+        add_appointment(db, timedelta(minutes=10), client_email=None, client_phone="+15550100")
+
+        with FakeHTTPServer(status=503) as sms:
+            self.deliver_due(db, {"sms": HTTPTransport(sms.url)})
+            reminder = db.query(Reminder).one()
+            assert reminder.status == Reminder.PENDING and reminder.attempts == 1
+            # SQLite hands datetimes back without their UTC offset
+            assert reminder.due_at.replace(tzinfo=timezone.utc) > utcnow() - timedelta(seconds=1)
+            assert "503" in reminder.last_error
+
+            reminder.due_at = utcnow() - timedelta(seconds=1)
+            db.commit()
+            dead_letters = self.deliver_due(db, {"sms": HTTPTransport(sms.url)}, max_attempts=2)
+
+        reminder = db.query(Reminder).one()
+        assert reminder.status == Reminder.FAILED and reminder.attempts == 2
+        [dead] = dead_letters.pop_batch(10, timeout=0)
+        assert dead["id"] == reminder.id and dead["attempts"] == 2
+
+
+    def test_worker_keeps_running_through_redis_errors(self):
+        """Test that a Redis error in the loop is logged and waited out instead of ending the worker."""
+        worker = DeliveryWorker(DeliveryQueue("test"), {}, idempotency=IdempotencyStore("test"))
+        calls = []
+
+        def pop_batch(max_items, timeout):
+            calls.append(1)
+            if len(calls) == 1:
+                raise redis.TimeoutError("Timeout reading from socket")
+            worker.stop()
+            return []
+
+        worker.queue.pop_batch = pop_batch
+        with patch.object(config, "WORKER_ERROR_BACKOFF_MAX_SECONDS", 0):
+            worker.run()
+        worker.close()
+        assert len(calls) == 2
+
+    @pytest.mark.parametrize("make_loop", [
+        lambda: DeliveryWorker(DeliveryQueue("test"), {}, idempotency=IdempotencyStore("test")),
+        lambda: Scheduler(lambda reminders: None, owner="test"),
+    ])
+    def test_loops_keep_running_through_database_errors(self, make_loop):
+        """Test that a database outage in a pass is logged and waited out instead of ending the process."""
+        loop = make_loop()
+        calls = []
+
+        def run_once():
+            calls.append(1)
+            if len(calls) == 1:
+                raise exc.OperationalError("SELECT 1", {}, Exception("server closed the connection unexpectedly"))
+            loop.stop()
+            return 0
+
+        loop.run_once = run_once
+        with patch.object(config, "WORKER_ERROR_BACKOFF_MAX_SECONDS", 0):
+            loop.run()
+        assert len(calls) == 2
+
+
+class TestOutbox:
+    def test_claim_and_outbox_commit_together(self, db):
+        """Test that a claim stages one keyed message per reminder, relayed to the queue and then removed."""
+        add_appointment(db, timedelta(minutes=10), client_phone="+15550100")
+        claimed = claim_due_reminders(db, "scheduler", batch_size=10, lease_seconds=60, outbox=True)
+        assert db.query(OutboxEvent).count() == 2
+
+        queue = DeliveryQueue("test")
+        assert reminder_relay(queue).drain() == 2
+        messages = queue.pop_batch(10, timeout=0)
+        assert sorted(m["idempotency_key"] for m in messages) == sorted(f"reminder:{r.id}" for r in claimed)
+        assert db.query(OutboxEvent).count() == 0
+
+    def test_relay_crash_duplicates_are_sent_once(self, db):
+        """Test that a batch published twice, by a relay dying before its commit, reaches the provider once."""
+        add_appointment(db, timedelta(minutes=10), client_email=None, client_phone="+15550100")
+        claim_due_reminders(db, "scheduler", batch_size=10, lease_seconds=60, outbox=True)
+        queue = DeliveryQueue("test")
+
+        def publish_then_crash(topic, messages):
+            queue.push(messages)
+            raise ConnectionError("relay died")
+
+        with pytest.raises(ConnectionError):
+            relay_outbox(db, publish_then_crash)
+        db.rollback()
+        relay_outbox(db, lambda topic, messages: queue.push(messages))
+        assert len(queue) == 2
+
+        with FakeHTTPServer() as sms:
+            worker = DeliveryWorker(queue, {"sms": HTTPTransport(sms.url)}, idempotency=IdempotencyStore("test"))
+            try:
+                [message, _] = queue.pop_batch(10, timeout=0)
+                queue.push([message, message])
+                worker.run_once(timeout=0)
+                # Queued once more after it was recorded, e.g. by a re-claim: reported, not sent again
+                queue.push([message])
+                worker.run_once(timeout=0)
+            finally:
+                worker.close()
+            assert len(sms.requests) == 1
+
+        db.expire_all()
+        reminder = db.query(Reminder).one()
+        assert reminder.status == Reminder.SENT and reminder.attempts == 1
+
+
+class TestDeliveryRollups:
+    def test_outcomes_are_counted_once_and_backfilled_alike(self, db):
+        """Test that recorded outcomes bump the day's rollups, duplicates count once, and a backfill agrees."""
+        add_appointment(db, timedelta(minutes=10), client_phone="+15550100")
+        email, sms = sorted(claim_due_reminders(db, "scheduler", batch_size=10, lease_seconds=60),
+                            key=lambda r: r.channel)
+        email, sms = reminder_message(email), reminder_message(sms)
+        record_outcomes([(email, None), (sms, TransportError("busy", retryable=True))], max_attempts=2)
+        record_outcomes([(email, None), (dict(sms, attempts=1), TransportError("busy", retryable=True))],
+                        max_attempts=2)
+
+        # A backfill counts the failure on its last due day, which may already be tomorrow
+        tomorrow = utcnow().date() + timedelta(days=1)
+        live = delivery_stats(db, 0, 3, tomorrow)
+        assert live['channels'] == {"email": {"sent": 1, "failed": 0, "retried": 0},
+                                    "sms": {"sent": 0, "failed": 1, "retried": 1}}
+        assert backfill_delivery_rollups(db) == 2
+        assert delivery_stats(db, 0, 3, tomorrow)['channels'] == live['channels']
+
+
+    def test_failed_duplicate_of_a_sent_reminder_changes_nothing(self, db):
+        """Test that a failure reported for an already sent reminder neither unsends it nor is counted."""
+        add_appointment(db, timedelta(minutes=10))
+        [message] = [reminder_message(r) for r in claim_due_reminders(db, "scheduler", batch_size=10,
+                                                                       lease_seconds=60)]
+        dead_letters = DeliveryQueue("test-dead")
+        record_outcomes([(message, None)], max_attempts=2)
+        record_outcomes([(message, TransportError("bounced", retryable=True))], max_attempts=2,
+                        dead_letters=dead_letters)
+        record_outcomes([(message, TransportError("bounced", retryable=False))], max_attempts=2,
+                        dead_letters=dead_letters)
+
+        db.expire_all()
+        reminder = db.query(Reminder).one()
+        assert reminder.status == Reminder.SENT and reminder.attempts == 1
+        assert len(dead_letters) == 0
+        assert delivery_stats(db, 0, 1, utcnow().date())['totals'] == {"sent": 1, "failed": 0, "retried": 0}
+
+
+class TestIdempotencyStore:
+    @pytest.mark.parametrize("redis_client", [FakeRedis(), DownRedis(), None], ids=["redis", "down", "local"])
+    def test_keys_are_claimed_once_and_released_on_failure(self, redis_client):
+        """Test that a key is claimed once, reports its state to later claims, and can be retried once abandoned."""
+        store = IdempotencyStore("test", redis_client)
+        assert store.begin(["a", "b", "a"]) == [None, None, PENDING]
+        store.finish(["a"])
+        store.abandon(["b"])
+        assert store.begin(["a", "b"]) == [DONE, None]
+
+    def test_pending_claims_expire(self):
+        """Test that a claim held by a worker that died is released after the pending TTL."""
+        store = IdempotencyStore("test", pending_seconds=1)
+        assert store.begin(["a"]) == [None]
+        store._local.set("a", PENDING, 0)  # As if the TTL had run out
+        assert store.begin(["a"]) == [None]
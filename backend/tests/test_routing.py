@@ -0,0 +1,79 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, exc
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.crud.user import get_user_by_email
+from app.db.models import User
+from app.db.routing import ReplicaSet, RoutingSession, read_from_replica
+from app.db.session import Base
+
+
+@pytest.fixture
+def databases():
+    """A primary and a replica as two separate SQLite databases, deliberately out of sync."""
+    primary, replica = (
+        create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        for _ in range(2)
+    )
+    for engine, email in ((primary, "primary@example.com"), (replica, "replica@example.com")):
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            conn.execute(User.__table__.insert(), {"email": email, "name": "Seed", "hashed_password": "x"})
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def routing_sessions(primary, replica, lag=0.0):
+    probe = lag if callable(lag) else (lambda engine: lag)
+    replicas = ReplicaSet([replica], max_lag=5, check_interval=60, probe=probe)
+    return sessionmaker(class_=RoutingSession, replicas=replicas, bind=primary, autoflush=False)
+
+
+class TestReadReplicaRouting:
+    def test_reads_use_replica_until_the_session_writes(self, databases):
+        """Test that reads go to the replica, writes to the primary, and reads stay there afterwards."""
+        primary, replica = databases
+        db = routing_sessions(primary, replica)()
+        assert get_user_by_email(db, "replica@example.com") is not None
+        assert read_from_replica(db)
+
+        db.add(User(email="new@example.com", name="N", hashed_password="x"))
+        db.commit()
+        # Read-your-writes: the new row is only on the primary
+        assert get_user_by_email(db, "new@example.com") is not None
+        assert get_user_by_email(db, "replica@example.com") is None
+        db.close()
+
+    def test_lagging_replica_is_skipped(self, databases):
+        """Test that a replica over the lag threshold is not used."""
+        primary, replica = databases
+        db = routing_sessions(primary, replica, lag=30.0)()
+        assert get_user_by_email(db, "primary@example.com") is not None
+        assert not read_from_replica(db)
+        db.close()
+
+    def test_unreachable_replica_falls_back_to_primary(self, databases):
+        """Test that a replica whose lag probe fails is treated as unavailable."""
+        primary, replica = databases
+
+        def probe(engine):
+            raise exc.OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+        db = routing_sessions(primary, replica, lag=probe)()
+        assert get_user_by_email(db, "primary@example.com") is not None
+        db.close()
+
+    def test_login_checks_primary_when_replica_misses(self, client, databases):
+        """Test that an account not yet replicated can still log in."""
+        primary, replica = databases
+        credentials = {"email": "fresh@example.com", "password": "freshpassword"}
+        with patch('app.db.session.SessionLocal', new=routing_sessions(primary, replica)):
+            assert client.post('/api/v1/auth/register', json=dict(credentials, name="Fresh")).status_code == 201
+            response = client.post('/api/v1/auth/login', json=credentials)
+            assert response.status_code == 200
+            token = response.get_json()['access_token']
+            me = client.get('/api/v1/users/me', headers={'Authorization': f'Bearer {token}'})
+        assert me.status_code == 200
+        assert me.get_json()['email'] == "fresh@example.com"
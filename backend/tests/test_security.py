@@ -0,0 +1,194 @@
+import threading
+import time
+from unittest.mock import patch
+import pytest
+from app.core import config
+from app.core.hashing import HashingPool, HashingPoolFull
+from app.core.ratelimit import NegativeCache, RateLimiter
+from app.core.tokens import RevocationList
+from app.core.security import (
+    calibrate_bcrypt_rounds, check_password_hash, configure_password_context,
+    get_password_hash, pwd_context, verify_password,
+)
+from app.crud.user import schedule_password_rehash
+from tests.fakes import DownRedis, FakeRedis
+
+
+class TestHashingPool:
+    def test_hash_and_verify_round_trip(self):
+        """Test that hashing through the pool produces verifiable hashes."""
+        hashed = get_password_hash("roundtrip-password")
+        assert verify_password("roundtrip-password", hashed)
+        assert not verify_password("other-password", hashed)
+
+    def test_rejects_when_queue_is_full(self):
+        """Test that a call is rejected with a retry hint once all slots are taken."""
+        pool = HashingPool(workers=0, max_pending=1, retry_after=3)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "done"
+
+        worker = threading.Thread(target=pool.run, args=(slow,))
+        worker.start()
+        started.wait(5)
+        try:
+            with pytest.raises(HashingPoolFull) as exc_info:
+                pool.run(lambda: None)
+            assert exc_info.value.retry_after == 3
+            assert pool.stats()["queue_depth"] == 1
+        finally:
+            release.set()
+            worker.join()
+
+        stats = pool.stats()
+        assert stats["calls"] == 1
+        assert stats["rejected"] == 1
+        assert stats["queue_depth"] == 0
+
+    def test_batch_leaves_slots_for_interactive_calls(self):
+        """Test that map counts its items as queued and leaves free slots for calls made meanwhile."""
+        pool = HashingPool(workers=0, max_pending=2)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow(item):
+            started.set()
+            release.wait(5)
+            return item * 2
+
+        results = []
+        batch = threading.Thread(target=lambda: results.extend(pool.map(slow, [1, 2, 3])))
+        batch.start()
+        started.wait(5)
+        try:
+            assert pool.stats()["queue_depth"] == 1
+            assert pool.run(lambda: "login") == "login"
+        finally:
+            release.set()
+            batch.join()
+
+        assert results == [2, 4, 6]
+        stats = pool.stats()
+        assert stats["calls"] == 4 and stats["rejected"] == 0 and stats["queue_depth"] == 0
+
+
+class TestPasswordCost:
+    def test_calibration_stays_within_bounds(self):
+        """Test that calibration never leaves the configured rounds range."""
+        assert calibrate_bcrypt_rounds(1, min_rounds=4, max_rounds=6) == 4
+        assert 4 <= calibrate_bcrypt_rounds(10_000, min_rounds=4, max_rounds=6) <= 6
+
+    def test_check_reports_needs_update_after_cost_change(self):
+        """Test that hashes made with an old cost still verify but are flagged for rehash."""
+        original_rounds = pwd_context.handler("bcrypt").default_rounds
+        try:
+            configure_password_context(4)
+            old_hash = get_password_hash("rehash-password")
+            assert check_password_hash("rehash-password", old_hash) == (True, False)
+
+            configure_password_context(5)
+            result = check_password_hash("rehash-password", old_hash)
+            assert result and result.needs_update
+            assert not check_password_hash("wrong-password", old_hash)
+            assert not check_password_hash("rehash-password", get_password_hash("rehash-password")).needs_update
+        finally:
+            configure_password_context(original_rounds)
+
+    def test_rehash_queue_is_deduplicated_and_bounded(self):
+        """Test that a user is queued for rehash once and new jobs are dropped past REHASH_QUEUE_MAX."""
+        release = threading.Event()
+
+        def slow_hash(password):
+            release.wait(5)
+            return "rehashed"
+
+        with patch("app.crud.user.get_password_hash", slow_hash), patch("app.crud.user.update_password_hash"), \
+                patch.object(config, "REHASH_QUEUE_MAX", 2):
+            try:
+                first = schedule_password_rehash(1, "password")
+                assert first is not None
+                assert schedule_password_rehash(1, "password") is None
+                second = schedule_password_rehash(2, "password")
+                assert second is not None
+                assert schedule_password_rehash(3, "password") is None
+            finally:
+                release.set()
+            first.result(5)
+            second.result(5)
+            assert schedule_password_rehash(3, "password").result(5) is None
+
+
+class TestLoginThrottling:
+    def test_bucket_allows_burst_then_throttles(self):
+        """Test that the in-process bucket allows a burst and then reports a wait."""
+        limiter = RateLimiter('test', capacity=2, per_second=1)
+        assert limiter.hit('a@example.com') == 0
+        assert limiter.hit('a@example.com') == 0
+        assert 0 < limiter.hit('a@example.com') <= 1
+        assert limiter.hit('b@example.com') == 0
+
+    def test_take_grants_what_the_bucket_holds(self):
+        """Test that take grants whole tokens up to the bucket's level, with per-call limits."""
+        limiter = RateLimiter('test', capacity=10, per_second=1)
+        assert limiter.take('tenant', 4) == 4
+        assert limiter.take('tenant', 10) == 6
+        assert limiter.take('tenant', 10) == 0
+        assert limiter.take('other', 10, capacity=3, per_second=0.05) == 3
+
+    def test_bucket_falls_back_when_redis_is_down(self):
+        """Test that an unreachable Redis degrades to in-process limits."""
+        limiter = RateLimiter('test', capacity=1, per_second=1, redis_client=DownRedis())
+        assert limiter.hit('key') == 0
+        assert limiter.hit('key') > 0
+
+    @pytest.mark.parametrize('redis_client', [None, FakeRedis(), DownRedis()])
+    def test_negative_cache(self, redis_client):
+        """Test that absent keys are remembered until discarded or expired."""
+        cache = NegativeCache('test', ttl=30, redis_client=redis_client)
+        assert 'ghost@example.com' not in cache
+        cache.add('ghost@example.com')
+        assert 'ghost@example.com' in cache
+        cache.discard('ghost@example.com')
+        assert 'ghost@example.com' not in cache
+
+        expiring = NegativeCache('test-expiry', ttl=0, redis_client=redis_client)
+        expiring.add('ghost@example.com')
+        assert 'ghost@example.com' not in expiring
+
+
+class TestRevocationList:
+    def test_revocations_reach_other_processes_on_sync(self):
+        """Test that a revocation stored in Redis shows up in another process after a sync."""
+        shared = FakeRedis()
+        here, elsewhere = RevocationList(shared), RevocationList(shared)
+        here.revoke('live-jti', time.time() + 60)
+        here.revoke('stale-jti', time.time() - 1)
+        assert 'live-jti' in here._revoked
+
+        elsewhere.sync()
+        assert 'live-jti' in elsewhere._revoked
+        assert 'stale-jti' not in elsewhere._revoked
+
+    def test_revocation_survives_a_redis_outage(self):
+        """Test that a revocation made while Redis is down applies locally and reaches Redis on a later sync."""
+        revocations = RevocationList(DownRedis())
+        revocations.revoke('jti', time.time() + 60)
+        assert 'jti' in revocations._revoked
+
+        shared = FakeRedis()
+        revocations._redis = shared
+        revocations.sync()
+        elsewhere = RevocationList(shared)
+        elsewhere.sync()
+        assert 'jti' in elsewhere._revoked
+
+    def test_local_list_without_redis(self):
+        """Test that revocation works in-process when Redis is not configured."""
+        revocations = RevocationList()
+        assert not revocations.is_revoked('jti')
+        revocations.revoke('jti', time.time() + 60)
+        assert revocations.is_revoked('jti')
@@ -0,0 +1,90 @@
+import gzip
+import json
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+import brotli
+import pytest
+from app.core.compression import compress_stream
+from app.core.metrics import TimedJSONProvider
+from app.core.serialization import OrjsonProvider
+from app.main import app
+from tests.test_appointments import CSV_UPLOAD
+
+SAMPLE = {
+    "zeta": [1, 2.5, None, True], "alpha": "plain", "when": datetime(2030, 1, 10, 9, tzinfo=timezone.utc),
+    "price": Decimal("9.90"), "counts": {2: "two", 1: "one"}, "nested": {"b": 1, "a": [{"y": 2, "x": 1}]},
+}
+
+
+class TestJSONProvider:
+    def test_orjson_output_matches_stdlib(self):
+        """Test that the orjson provider produces byte-identical compact JSON to Flask's default for ASCII data."""
+        stdlib, fast = TimedJSONProvider(app), OrjsonProvider(app)
+        assert fast.dumps(SAMPLE) == stdlib.dumps(SAMPLE, separators=(",", ":"))
+        assert fast.loads(fast.dumps(SAMPLE)) == json.loads(stdlib.dumps(SAMPLE))
+
+    def test_orjson_output_where_it_differs_from_stdlib(self):
+        """Test the exact bytes for non-ASCII text, datetimes and large floats, which decode to the same values."""
+        stdlib, fast = TimedJSONProvider(app), OrjsonProvider(app)
+        obj = {"name": "Zoë ☃", "when": datetime(2030, 1, 10, 9, tzinfo=timezone.utc), "big": 1e20}
+        assert fast.dumpb(obj) == '{"big":1e20,"name":"Zoë ☃","when":"Thu, 10 Jan 2030 09:00:00 GMT"}'.encode()
+        assert stdlib.dumps(obj, separators=(",", ":")) == (
+            '{"big":1e+20,"name":"Zo\\u00eb \\u2603","when":"Thu, 10 Jan 2030 09:00:00 GMT"}'
+        )
+        assert fast.loads(fast.dumpb(obj)) == json.loads(stdlib.dumps(obj))
+
+    def test_app_uses_orjson(self, client):
+        """Test that jsonify goes through the orjson provider and ends with a newline like Flask's."""
+        assert isinstance(app.json, OrjsonProvider)
+        response = client.get('/')
+        assert response.data == b'{"Hello":"World"}\n'
+
+
+class TestCompression:
+    @pytest.fixture
+    def imported(self, client, auth_headers):
+        client.post('/api/v1/appointments/import', data=CSV_UPLOAD,
+                    headers=dict(auth_headers, **{'Content-Type': 'text/csv'}))
+        return auth_headers
+
+    @pytest.mark.parametrize('encoding, decompress', [('gzip', gzip.decompress), ('br', brotli.decompress)])
+    def test_large_responses_are_compressed(self, client, imported, monkeypatch, encoding, decompress):
+        """Test that bodies over the threshold are compressed with the negotiated encoding."""
+        monkeypatch.setattr('app.core.config.COMPRESS_MIN_BYTES', 100)
+        plain = client.get('/api/v1/appointments', headers=imported)
+        compressed = client.get('/api/v1/appointments', headers=dict(imported, **{'Accept-Encoding': encoding}))
+
+        assert 'Content-Encoding' not in plain.headers
+        assert compressed.headers['Content-Encoding'] == encoding
+        assert compressed.headers['Vary'] == 'Accept-Encoding'
+        assert decompress(compressed.data) == plain.data
+        assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + f'-{encoding}"'
+
+    def test_small_responses_are_sent_as_is(self, client):
+        """Test that bodies under the threshold are not compressed."""
+        response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_compressed_etag_revalidates(self, client, imported, monkeypatch):
+        """Test that the ETag of a compressed copy is honoured by If-None-Match."""
+        monkeypatch.setattr('app.core.config.COMPRESS_MIN_BYTES', 100)
+        headers = dict(imported, **{'Accept-Encoding': 'gzip'})
+        etag = client.get('/api/v1/appointments', headers=headers).headers['ETag']
+        response = client.get('/api/v1/appointments', headers=dict(headers, **{'If-None-Match': etag}))
+        assert response.status_code == 304 and response.headers['ETag'] == etag
+
+    def test_streamed_responses_are_compressed_chunk_by_chunk(self, client, imported):
+        """Test that a streamed listing is gzip-compressed as it goes."""
+        # Read each streamed body before the next request: it holds its request context until then
+        plain = client.get('/api/v1/appointments/reminders', headers=imported).data
+        compressed = client.get('/api/v1/appointments/reminders', headers=dict(imported, **{'Accept-Encoding': 'gzip'}))
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(compressed.data) == plain
+
+    def test_stream_chunks_decompress_incrementally(self):
+        """Test that every chunk is flushed, so a client can decode what it has received so far."""
+        decoder = zlib.decompressobj(31)
+        chunks = compress_stream(iter([b'{"a":[', b'1,2', b']}']), 'gzip')
+        assert decoder.decompress(next(chunks)) == b'{"a":['
+        assert decoder.decompress(next(chunks)) == b'1,2'